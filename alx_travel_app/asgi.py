@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Payment status streams are served before Django's middleware stack so an
+# idle stream costs a coroutine, not a thread (listings/payment_events.py).
+from listings.payment_events import PaymentEventsApp  # noqa: E402
+
+application = PaymentEventsApp(django_application)
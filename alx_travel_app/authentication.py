@@ -0,0 +1,118 @@
+"""
+Signed bearer tokens for API clients.
+
+``POST /api/auth/token/`` exchanges a username and password for a token:
+the user id and a fingerprint of the password hash, signed with
+``SECRET_KEY`` and timestamped. ``SignedTokenAuthentication`` checks the
+signature and age (``API_TOKEN_MAX_AGE``) without touching the database.
+Changing the password changes the fingerprint and revokes every token
+issued before it.
+
+The user behind a token is a cached principal, so an authenticated API call
+usually makes no database query for authentication:
+
+- each process keeps it for ``API_TOKEN_LOCAL_CACHE_SECONDS``;
+- ``CACHES['default']`` (Redis in production) keeps it for
+  ``API_TOKEN_PRINCIPAL_CACHE_SECONDS``;
+- saving or deleting a user drops the shared entry once the change commits
+  (``listings/signals.py``), so deactivation or a password change takes
+  effect everywhere within the local TTL. ``User`` queryset updates send no
+  signal and need an explicit ``forget_principal``.
+
+``request.user`` is a ``User`` with the password and timestamps deferred:
+they load on first access, and ``save()`` only writes the loaded fields.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+KEYWORD = 'Bearer'
+SALT = 'alx_travel_app.authentication'
+# Everything permission checks and serializers commonly read; the password
+# and timestamps are left deferred.
+PRINCIPAL_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email', 'is_staff', 'is_active', 'is_superuser')
+LOCAL_CACHE_MAX_ENTRIES = 10000
+
+_local = {}
+
+
+def password_fingerprint(password_hash):
+    return salted_hmac(SALT, password_hash, algorithm='sha256').hexdigest()[:16]
+
+
+def make_token(user):
+    return signing.dumps({'u': user.pk, 'p': password_fingerprint(user.password)}, salt=SALT)
+
+
+def principal_key(user_id):
+    return f'auth:principal:{user_id}'
+
+
+def load_principal(user_id):
+    """
+    The cached principal of ``user_id`` (a dict of ``PRINCIPAL_FIELDS`` plus
+    the password fingerprint), or None if there is no such user.
+    """
+    now = time.monotonic()
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    principal = cache.get(principal_key(user_id))
+    if principal is None:
+        row = User.objects.filter(pk=user_id).values(*PRINCIPAL_FIELDS, 'password').first()
+        if row is None:
+            return None
+        principal = {name: row[name] for name in PRINCIPAL_FIELDS}
+        principal['fingerprint'] = password_fingerprint(row['password'])
+        cache.set(principal_key(user_id), principal, settings.API_TOKEN_PRINCIPAL_CACHE_SECONDS)
+    if len(_local) >= LOCAL_CACHE_MAX_ENTRIES:
+        _local.clear()
+    _local[user_id] = (now + settings.API_TOKEN_LOCAL_CACHE_SECONDS, principal)
+    return principal
+
+
+def forget_principal(user_id):
+    cache.delete(principal_key(user_id))
+    _local.pop(user_id, None)
+
+
+def principal_user(principal):
+    """
+    A ``User`` built from a principal, as if loaded with ``.only(*PRINCIPAL_FIELDS)``.
+    """
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in principal]
+    return User.from_db('default', names, [principal[name] for name in names])
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Bearer <token>`` with a token from ``make_token``.
+    """
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid bearer header: expected "Bearer <token>".')
+        token = header[1].decode(errors='replace')
+        try:
+            payload = signing.loads(token, salt=SALT, max_age=settings.API_TOKEN_MAX_AGE)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        principal = load_principal(payload.get('u'))
+        if principal is None or not principal['is_active'] or principal['fingerprint'] != payload.get('p'):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return principal_user(principal), token
+
+    def authenticate_header(self, request):
+        return KEYWORD
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_init, worker_process_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
 
@@ -7,6 +8,46 @@ app = Celery('alx_travel_app')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
+
+@worker_init.connect
+def close_db_pools_before_fork(**kwargs):
+    # The prefork parent must not hand pooled connections to its children.
+    from alx_travel_app.db_backend.base import close_connection_pools
+
+    close_connection_pools()
+
+
+@worker_process_init.connect
+def reset_db_pools_after_fork(**kwargs):
+    from alx_travel_app.db_backend.base import forget_connection_pools
+
+    forget_connection_pools()
+
+
+@before_task_publish.connect
+def propagate_profiling(headers=None, **kwargs):
+    # Tasks queued by a profiled request are profiled too.
+    from alx_travel_app.profiling import propagate_to_task
+
+    propagate_to_task(headers)
+
+
+@task_prerun.connect
+def start_task_profile(task_id=None, task=None, **kwargs):
+    if task.request.headers and 'profile_token' in task.request.headers:
+        from alx_travel_app.profiling import start_task_profile
+
+        start_task_profile(task_id, task)
+
+
+@task_postrun.connect
+def finish_task_profile(task_id=None, task=None, state=None, **kwargs):
+    if task.request.headers and 'profile_token' in task.request.headers:
+        from alx_travel_app.profiling import finish_task_profile
+
+        finish_task_profile(task_id, state)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -0,0 +1,120 @@
+"""
+Circuit breaker with its state in the shared cache.
+
+Every gunicorn worker and Celery process sees the same state (use Redis for
+``CACHES['default']`` in production), so once a dependency is marked down no
+process waits on it until it has recovered.
+
+- closed: calls go through; ``failure_threshold`` failures within
+  ``failure_window`` seconds open the circuit.
+- open: calls fail immediately with ``CircuitOpenError`` for
+  ``reset_timeout`` seconds.
+- half-open: after that, exactly one process (whichever wins ``cache.add`` on
+  the probe key) lets a call through. Success closes the circuit, failure
+  re-opens it for another ``reset_timeout``.
+
+If the cache itself is unreachable the breaker stays out of the way and
+allows every call.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+# Gauge values for alx_travel_app.metrics.CIRCUIT_STATE.
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, failure_window=30, reset_timeout=30, probe_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        # How long a probe may take before another process may probe instead.
+        self.probe_timeout = probe_timeout
+        self.state_key = f"circuit:{name}:state"
+        self.failures_key = f"circuit:{name}:failures"
+        self.probe_key = f"circuit:{name}:probe"
+
+    def state(self):
+        """
+        The current (state, opened_at) pair.
+        """
+        return cache.get(self.state_key, (CLOSED, 0.0))
+
+    def before_call(self):
+        """
+        Raise ``CircuitOpenError`` if the call must not be made.
+
+        Returns True if this call is the half-open probe; pass that on to
+        ``record_success`` / ``record_failure``.
+        """
+        try:
+            state, opened_at = self.state()
+            if state == CLOSED:
+                return False
+            remaining = opened_at + self.reset_timeout - time.time()
+            if state == OPEN and remaining > 0:
+                self._reject(remaining)
+            if cache.add(self.probe_key, 1, self.probe_timeout):
+                self._set_state(HALF_OPEN, opened_at)
+                return True
+        except CircuitOpenError:
+            raise
+        except Exception:
+            logger.warning("Circuit breaker %s: cache unavailable, allowing call", self.name, exc_info=True)
+            return False
+        self._reject(self.reset_timeout)
+
+    def record_success(self, probe=False):
+        try:
+            if probe or self.state()[0] != CLOSED:
+                self._set_state(CLOSED, 0.0)
+                cache.delete_many([self.failures_key, self.probe_key])
+        except Exception:
+            logger.warning("Circuit breaker %s: could not record success", self.name, exc_info=True)
+
+    def record_failure(self, probe=False):
+        try:
+            if probe:
+                self._set_state(OPEN, time.time())
+                cache.delete(self.probe_key)
+                return
+            cache.add(self.failures_key, 0, self.failure_window)
+            try:
+                failures = cache.incr(self.failures_key)
+            except ValueError:  # the window expired between add() and incr()
+                cache.add(self.failures_key, 1, self.failure_window)
+                failures = 1
+            if failures >= self.failure_threshold and self.state()[0] == CLOSED:
+                self._set_state(OPEN, time.time())
+        except Exception:
+            logger.warning("Circuit breaker %s: could not record failure", self.name, exc_info=True)
+
+    def _set_state(self, state, opened_at):
+        from alx_travel_app.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+        cache.set(self.state_key, (state, opened_at), None)
+        CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+        log = logger.info if state == CLOSED else logger.warning
+        log("Circuit breaker %s is now %s", self.name, state)
+
+    def _reject(self, retry_after):
+        from alx_travel_app.metrics import CIRCUIT_REJECTIONS
+
+        CIRCUIT_REJECTIONS.labels(self.name).inc()
+        raise CircuitOpenError(self.name, max(1, round(retry_after)))
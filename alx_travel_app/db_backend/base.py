@@ -0,0 +1,57 @@
+"""
+PostgreSQL backend that instruments psycopg connection pool waits.
+
+Use as ``ENGINE: 'alx_travel_app.db_backend'``; it behaves exactly like
+``django.db.backends.postgresql`` otherwise.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.postgresql import base
+
+from alx_travel_app.metrics import DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        if not self.pool:
+            return super().get_new_connection(conn_params)
+        start = time.perf_counter()
+        try:
+            return super().get_new_connection(conn_params)
+        except Exception as e:
+            from psycopg_pool import PoolTimeout
+
+            if isinstance(e, PoolTimeout):
+                DB_POOL_TIMEOUTS.labels(self.alias).inc()
+            raise
+        finally:
+            DB_POOL_WAIT.labels(self.alias).observe(time.perf_counter() - start)
+
+
+def close_connection_pools():
+    """
+    Return this thread's connections and close every pool in the process.
+
+    Call in a parent process before it forks workers, so no pooled
+    connection is shared with a child.
+    """
+    if settings.configured:
+        connections.close_all()
+    for alias, pool in list(DatabaseWrapper._connection_pools.items()):
+        pool.close()
+        DatabaseWrapper._connection_pools.pop(alias, None)
+
+
+def forget_connection_pools():
+    """
+    Drop pools inherited through ``fork()`` without closing them.
+
+    Their sockets belong to the parent and their worker threads did not
+    survive the fork; psycopg does not close connections garbage-collected
+    in a child, so simply dropping the references is safe. New pools are
+    created lazily on first use.
+    """
+    DatabaseWrapper._connection_pools.clear()
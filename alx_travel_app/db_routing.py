@@ -0,0 +1,114 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Reads go to the primary unless a view opts in with ``ReplicaReadMixin``;
+then safe requests for its ``replica_actions`` read from a random replica
+from ``settings.DATABASE_REPLICAS``. After a successful write,
+``PrimaryPinMiddleware`` pins the client (cookie) and the user (cache key)
+to the primary for ``DATABASE_REPLICA_PIN_SECONDS`` so people see their own
+changes while the replicas catch up.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'db_pin'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Route ORM reads in this block to a replica (or back to the primary).
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads to a replica only inside ``replica_reads()``; everything else
+    (writes, and reads following a replica-loaded instance) uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+def _user_pin_key(user_id):
+    return f'db-pin:user:{user_id}'
+
+
+def is_pinned(request):
+    if PIN_COOKIE in request.COOKIES:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and cache.get(_user_pin_key(user.pk)))
+
+
+def pin_to_primary(request, response):
+    seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+    response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user and user.is_authenticated:
+        # Token clients may not keep cookies; pin the account as well.
+        cache.set(_user_pin_key(user.pk), 1, seconds)
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin clients to the primary for a while after any successful write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request, response)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    DRF view mixin: serve safe requests for ``replica_actions`` from a replica
+    unless the client is pinned to the primary.
+
+    Authentication runs first, on the primary.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and getattr(self, 'action', None) in self.replica_actions
+            and not is_pinned(request)
+        ):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
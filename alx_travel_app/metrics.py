@@ -0,0 +1,84 @@
+"""
+Prometheus metrics for the web and Celery processes.
+
+With several gunicorn workers, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty,
+writable directory so every worker's samples are aggregated by ``/metrics/``.
+"""
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+DB_POOL_WAIT = Histogram(
+    'db_pool_wait_seconds',
+    'Time spent acquiring a connection from the psycopg pool.',
+    ['alias'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Connection requests that gave up waiting for the psycopg pool.',
+    ['alias'],
+)
+
+OUTBOX_PUBLISHED = Counter(
+    'outbox_published_total',
+    'Outbox messages handed to the Celery broker.',
+    ['task'],
+)
+OUTBOX_PUBLISH_ERRORS = Counter(
+    'outbox_publish_errors_total',
+    'Outbox messages the relay failed to publish (retried on the next pass).',
+    ['task'],
+)
+OUTBOX_DELIVERY_LAG = Histogram(
+    'outbox_delivery_lag_seconds',
+    'Time from an outbox row being committed to it being published.',
+    ['task'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+OUTBOX_PENDING = Gauge(
+    'outbox_pending_messages',
+    'Outbox messages not yet published.',
+    multiprocess_mode='livemax',
+)
+OUTBOX_OLDEST_PENDING_AGE = Gauge(
+    'outbox_oldest_pending_age_seconds',
+    'Age of the oldest unpublished outbox message (0 when the outbox is empty).',
+    multiprocess_mode='livemax',
+)
+
+CIRCUIT_STATE = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state as last seen by this process: 0 closed, 1 half-open, 2 open.',
+    ['name'],
+    multiprocess_mode='mostrecent',
+)
+CIRCUIT_TRANSITIONS = Counter(
+    'circuit_breaker_transitions_total',
+    'Circuit breaker state changes, by the state entered.',
+    ['name', 'state'],
+)
+CIRCUIT_REJECTIONS = Counter(
+    'circuit_breaker_rejections_total',
+    'Calls refused without being attempted because the circuit was open.',
+    ['name'],
+)
+
+
+def metrics_view(request):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
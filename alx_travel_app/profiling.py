@@ -0,0 +1,312 @@
+"""
+On-demand profiling of a single request or Celery task in production.
+
+A staff member gets a signed token from ``manage.py profiling_token`` and
+sends it in the ``X-Profile`` header (or ``?_profile=``). ``ProfilingMiddleware``
+then runs that one request under a profiler and records every SQL query:
+
+- ``X-Profile-Mode: sample`` (default) samples the request thread's stack every
+  ``PROFILING_SAMPLE_INTERVAL`` seconds and writes collapsed stacks
+  (``.folded``), the input of flamegraph.pl and speedscope;
+- ``X-Profile-Mode: cprofile`` traces every call with cProfile and writes a
+  pstats file (``.prof``) for snakeviz or ``python -m pstats``. On Python
+  3.12+ cProfile is process-wide: it also records the other threads of the
+  worker, and only one can run at a time. A second cprofile request while
+  one runs gets 409; a task falls back to sampling.
+
+The profile and a ``.json`` summary with the SQL breakdown go to
+``PROFILING_DIR``, and the response carries ``X-Profile-Id``. With
+``X-Profile-Output: inline`` the response is the summary itself.
+
+Celery tasks queued while a request is profiled carry the token in a
+``profile_token`` message header and are profiled on the worker too; any
+task can be sent with ``apply_async(headers={'profile_token': token})``.
+
+Requests and tasks without a token only pay for a header lookup.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+PARAM = '_profile'
+TASK_HEADER = 'profile_token'
+MODES = ('sample', 'cprofile')
+SALT = 'alx_travel_app.profiling'
+# SQL statements in a summary and functions in an inline cProfile report.
+TOP_STATEMENTS = 50
+TOP_FUNCTIONS = 50
+
+# The profile running in this context, if any.
+_active = ContextVar('profile', default=None)
+# Held while a cprofile profile runs; there can only be one per process.
+_cprofile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def make_token(user):
+    return signing.dumps({'user': user.pk}, salt=SALT, compress=True)
+
+
+def check_token(token):
+    """
+    The staff user a valid, unexpired token was issued to, or None.
+    """
+    from django.contrib.auth.models import User
+
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=payload.get('user'), is_staff=True, is_active=True).first()
+
+
+def short_path(filename):
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        return filename[len(base):]
+    _, sep, rest = filename.rpartition('site-packages' + os.sep)
+    return rest if sep else filename
+
+
+class Sampler:
+    """
+    Collapsed stacks of one thread, sampled from a background thread.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def output(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """
+    Profile the code run in a ``with`` block and record its SQL queries.
+    """
+
+    def __init__(self, label, mode='sample', token=None):
+        self.label = label
+        self.mode = mode
+        self.token = token
+        self.started_at = timezone.now()
+        self.id = f"{self.started_at:%Y%m%dT%H%M%S}-{slugify(label)[:60]}-{uuid.uuid4().hex[:6]}"
+        self.queries = defaultdict(lambda: [0, 0.0])
+        self.duration = None
+
+    def __enter__(self):
+        if self.mode == 'cprofile':
+            self.start_cprofile()
+        self.stack = ExitStack()
+        for alias in connections:
+            self.stack.enter_context(connections[alias].execute_wrapper(self.record_query))
+        self.context = _active.set(self)
+        if self.mode != 'cprofile':
+            self.profiler = Sampler(settings.PROFILING_SAMPLE_INTERVAL)
+            self.profiler.start()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.started
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+            _cprofile_lock.release()
+        else:
+            self.profiler.stop()
+        _active.reset(self.context)
+        self.stack.close()
+
+    def start_cprofile(self):
+        """
+        Raises ``ProfilerBusy`` if another cprofile profile (or another
+        profiling tool) is running in this process.
+        """
+        if not _cprofile_lock.acquire(blocking=False):
+            raise ProfilerBusy("Another cprofile profile is running in this process.")
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError as e:
+            # "Another profiling tool is already active" (Python 3.12+).
+            _cprofile_lock.release()
+            raise ProfilerBusy(str(e)) from e
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            entry = self.queries[(context['connection'].alias, sql)]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+
+    def summary(self, **extra):
+        statements = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            'id': self.id,
+            'label': self.label,
+            'mode': self.mode,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 3),
+            **extra,
+            'sql': {
+                'queries': sum(count for count, _ in self.queries.values()),
+                'total_ms': round(sum(seconds for _, seconds in self.queries.values()) * 1000, 3),
+                'statements': [
+                    {'database': alias, 'sql': sql, 'count': count, 'total_ms': round(seconds * 1000, 3)}
+                    for (alias, sql), (count, seconds) in statements[:TOP_STATEMENTS]
+                ],
+            },
+        }
+
+    def text(self):
+        """
+        The profile as text: collapsed stacks, or the top of the pstats report.
+        """
+        if self.mode != 'cprofile':
+            return self.profiler.output()
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        return out.getvalue()
+
+    def save(self, **extra):
+        """
+        Write the profile and its summary to ``PROFILING_DIR``; returns the
+        summary's path.
+        """
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.mode == 'cprofile':
+            profile_path = directory / f"{self.id}.prof"
+            self.profiler.dump_stats(profile_path)
+        else:
+            profile_path = directory / f"{self.id}.folded"
+            profile_path.write_text(self.profiler.output())
+        summary_path = directory / f"{self.id}.json"
+        summary_path.write_text(json.dumps(self.summary(profile=profile_path.name, **extra), indent=2))
+        return summary_path
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests that carry a valid staff profiling token.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.META.get(HEADER)
+        if token is None and PARAM in request.META.get('QUERY_STRING', ''):
+            token = request.GET.get(PARAM)
+        if not token or not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+
+        if check_token(token) is None:
+            return JsonResponse({'detail': 'Invalid or expired profiling token.'}, status=403)
+        mode = request.META.get('HTTP_X_PROFILE_MODE') or request.GET.get(f'{PARAM}_mode') or 'sample'
+        if mode not in MODES:
+            return JsonResponse({'detail': f"Profile mode must be one of: {', '.join(MODES)}."}, status=400)
+        inline = (request.META.get('HTTP_X_PROFILE_OUTPUT') or request.GET.get(f'{PARAM}_output')) == 'inline'
+
+        try:
+            with Profile(f"{request.method} {request.path}", mode, token) as profile:
+                response = self.get_response(request)
+        except ProfilerBusy:
+            return JsonResponse(
+                {'detail': 'Another cprofile profile is running in this worker; retry, or use sample mode.'},
+                status=409,
+            )
+        if inline:
+            return JsonResponse({**profile.summary(status=response.status_code), 'profile': profile.text()})
+        profile.save(status=response.status_code)
+        response['X-Profile-Id'] = profile.id
+        return response
+
+
+# Celery hooks, connected in alx_travel_app/celery.py.
+
+_task_profiles = {}
+
+
+def propagate_to_task(headers):
+    profile = _active.get()
+    if profile is not None and profile.token:
+        headers[TASK_HEADER] = profile.token
+        headers['profile_mode'] = profile.mode
+
+
+def start_task_profile(task_id, task):
+    headers = task.request.headers or {}
+    token = headers.get(TASK_HEADER)
+    # Eager tasks run inside the caller's profile.
+    if not token or not settings.PROFILING_ENABLED or _active.get() is not None:
+        return
+    if check_token(token) is None:
+        logger.warning("Ignoring invalid or expired profiling token on task %s[%s]", task.name, task_id)
+        return
+    mode = headers.get('profile_mode')
+    profile = Profile(task.name, mode if mode in MODES else 'sample', token)
+    try:
+        profile.__enter__()
+    except ProfilerBusy:
+        logger.info("cProfile is busy; sampling task %s[%s] instead", task.name, task_id)
+        profile = Profile(task.name, 'sample', token)
+        profile.__enter__()
+    _task_profiles[task_id] = profile
+
+
+def finish_task_profile(task_id, state):
+    profile = _task_profiles.pop(task_id, None)
+    if profile is None:
+        return
+    profile.__exit__(None, None, None)
+    path = profile.save(status=state)
+    logger.info("Profiled task %s: %s", profile.label, path)
@@ -0,0 +1,185 @@
+"""
+Precomputed OpenAPI schema.
+
+drf_yasg introspects every view to build the schema, which is far too slow
+to do per request. ``manage.py generate_schema`` writes it once to
+``settings.OPENAPI_SCHEMA_PATH`` (plus a gzipped copy); ``schema_json_view``
+serves those bytes with an ETag, and the Swagger/ReDoc pages load them via
+``SPEC_URL``.
+
+drf_yasg is only imported when the schema is generated or a docs page is
+first requested; it is a heavy import that most processes never need.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from functools import cache
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_safe
+
+logger = logging.getLogger(__name__)
+
+
+@cache
+def api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Travel App API",
+        default_version='v1',
+        description="API for Travel App",
+    )
+
+
+@cache
+def schema_view():
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    return get_schema_view(api_info(), public=True, permission_classes=(permissions.AllowAny,))
+
+
+@cache
+def ui_view(renderer):
+    """
+    Swagger UI / ReDoc page. Only the UI renderer is enabled, so the page
+    cannot be asked for a freshly generated spec (``?format=openapi``).
+    """
+    from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+
+    renderer_class = {'swagger': SwaggerUIRenderer, 'redoc': ReDocRenderer}[renderer]
+    return schema_view().as_cached_view(renderer_classes=[renderer_class])
+
+
+def swagger_ui_view(request, *args, **kwargs):
+    return ui_view('swagger')(request, *args, **kwargs)
+
+
+def redoc_view(request, *args, **kwargs):
+    return ui_view('redoc')(request, *args, **kwargs)
+
+
+def generate_schema():
+    """
+    Build the full OpenAPI document and return it as JSON bytes.
+    """
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    schema = OpenAPISchemaGenerator(api_info()).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def write_schema(path=None):
+    """
+    Write the schema and a gzipped copy next to it, each atomically.
+
+    Returns the uncompressed size in bytes.
+    """
+    path = str(path or settings.OPENAPI_SCHEMA_PATH)
+    body = generate_schema()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for target, data in ((path, body), (f"{path}.gz", gzip.compress(body, compresslevel=9, mtime=0))):
+        tmp = f"{target}.tmp-{os.getpid()}"
+        with open(tmp, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, target)
+    return len(body)
+
+
+@dataclass(frozen=True)
+class SchemaArtifact:
+    body: bytes
+    gzipped: bytes
+    etag: str
+    mtime: float
+
+
+_artifact = None
+_lock = threading.Lock()
+
+
+def load_schema():
+    """
+    The schema artifact, reloaded only when the file on disk changes.
+
+    If the file has not been generated, the schema is built once in-process
+    (and kept for the life of the process) so development still works.
+    """
+    global _artifact
+    path = str(settings.OPENAPI_SCHEMA_PATH)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        mtime = None
+    if _artifact is not None and _artifact.mtime == mtime:
+        return _artifact
+
+    with _lock:
+        if _artifact is not None and _artifact.mtime == mtime:
+            return _artifact
+        if mtime is None:
+            logger.warning("%s not found; generating the OpenAPI schema in-process. "
+                           "Run `manage.py generate_schema` at deploy time.", path)
+            body = generate_schema()
+            gzipped = gzip.compress(body, mtime=0)
+        else:
+            with open(path, 'rb') as fh:
+                body = fh.read()
+            try:
+                with open(f"{path}.gz", 'rb') as fh:
+                    gzipped = fh.read()
+            except FileNotFoundError:
+                gzipped = gzip.compress(body, mtime=0)
+        _artifact = SchemaArtifact(body, gzipped, f'"{hashlib.sha256(body).hexdigest()[:32]}"', mtime)
+        return _artifact
+
+
+def accepts_gzip(request):
+    """
+    Whether ``Accept-Encoding`` allows gzip, honouring q-values
+    (``gzip;q=0`` refuses it, ``*`` covers it unless gzip is listed).
+    """
+    qualities = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    quality = qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0)))
+    return quality > 0
+
+
+def schema_etag(request):
+    # Each representation is different bytes, so each has its own strong ETag.
+    etag = load_schema().etag
+    return f'{etag[:-1]}-gz"' if accepts_gzip(request) else etag
+
+
+@require_safe
+@condition(etag_func=schema_etag)
+def schema_json_view(request):
+    artifact = load_schema()
+    if accepts_gzip(request):
+        response = HttpResponse(artifact.gzipped, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(artifact.body, content_type='application/json')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, public=True, max_age=300)
+    return response
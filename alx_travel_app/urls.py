@@ -14,30 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
-
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Travel App API",
-        default_version='v1',
-        description="API for Travel App",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from alx_travel_app.metrics import metrics_view
+from alx_travel_app.schema import redoc_view, schema_json_view, swagger_ui_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    path('api/schema/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
+    # UI pages only: the spec is loaded from the precomputed /api/schema/ (SPEC_URL).
+    path('swagger/', swagger_ui_view, name='schema-swagger-ui'),
+    path('redoc/', redoc_view, name='schema-redoc'),
+    path('api/schema/', schema_json_view, name='schema-json'),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('listings.urls'))
 ]
 
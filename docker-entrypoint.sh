@@ -8,11 +8,21 @@ python manage.py migrate
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# Build the OpenAPI schema once instead of on every /api/schema/ request
+echo "Generating OpenAPI schema..."
+python manage.py generate_schema
+
 # Ensure the staticfiles and media directories have proper permissions
 echo "Fixing permissions..."
 chmod -R 755 /app/staticfiles
 chmod -R 755 /app/media
 
-# Start the application
+# Prometheus multiprocess samples must not survive a restart
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+# Start the application (workers, threads and fork hooks in gunicorn.conf.py)
 echo "Starting Gunicorn..."
-exec gunicorn alx_travel_app.wsgi:application --bind 0.0.0.0:8000 --workers 3
+exec gunicorn alx_travel_app.wsgi:application -c gunicorn.conf.py
@@ -0,0 +1,45 @@
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# Keep in step with settings.py, which sizes the database pool from these.
+workers = int(os.environ.get('WEB_CONCURRENCY', '3'))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+
+# Load Django, the URLconf and every view once in the master and fork
+# ready workers from it, instead of each worker importing everything on boot
+# and again on its first request. Code changes then need a full restart
+# (not HUP). Set GUNICORN_PRELOAD=0 to disable.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns  # import every view and serializer now
+    # Move everything loaded so far out of the collector's reach: the cyclic
+    # GC would otherwise write to these objects' headers in each worker and
+    # un-share their copy-on-write memory pages.
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Never let a worker inherit the master's pooled database connections.
+    from alx_travel_app.db_backend.base import close_connection_pools
+
+    close_connection_pools()
+
+
+def post_fork(server, worker):
+    from alx_travel_app.db_backend.base import forget_connection_pools
+
+    forget_connection_pools()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,3 +1,206 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
 
-# Register your models here.
+from . import availability, payment_events
+from .models import Booking, Listing, ListingImage, ListingImportJob, OutboxMessage, Payment, Review
+from .signals import dispatch
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that never runs an unbounded ``COUNT(*)``.
+
+    Unfiltered changelists use the planner's row estimate (``pg_class.reltuples``)
+    once the table is larger than ``threshold``; filtered ones count at most
+    ``threshold`` matching rows. Past the threshold the page count is
+    approximate, which is fine for paging through a huge table.
+    """
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            estimate = self.estimated_rows(self.object_list.model._meta.db_table)
+            if estimate > self.threshold:
+                return estimate
+        return self.object_list.order_by()[:self.threshold].count()
+
+    @staticmethod
+    def estimated_rows(table):
+        # A partitioned table has no rows of its own (its reltuples stays -1),
+        # so sum its partitions. reltuples is -1 until a table has been
+        # vacuumed or analyzed; the result is -1 only if no partition has been.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT CASE WHEN c.relkind = 'p' THEN (
+                    SELECT sum(greatest(p.reltuples, 0))::bigint
+                           - CASE WHEN bool_and(p.reltuples < 0) THEN 1 ELSE 0 END
+                    FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+                    WHERE i.inhparent = c.oid
+                ) ELSE c.reltuples::bigint END
+                FROM pg_class c WHERE c.oid = %s::regclass
+                """,
+                [table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] is not None else -1
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search the way the indexes allow: ``=field`` is an exact,
+        case-sensitive match (Django's own ``=`` compares ``UPPER()`` values,
+        which a plain btree index can't serve) and ``^field`` a
+        case-insensitive prefix match backed by an ``upper(field)
+        text_pattern_ops`` index. The whole term is matched, not word by word.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        query = Q()
+        for name in self.get_search_fields(request):
+            if name.startswith('='):
+                query |= Q(**{name[1:]: term})
+            elif name.startswith('^'):
+                query |= Q(**{f'{name[1:]}__istartswith': term})
+            else:
+                raise ImproperlyConfigured(f"{type(self).__name__}.search_fields entries must start with = or ^.")
+        return queryset.filter(query), False
+
+
+@admin.register(Listing)
+class ListingAdmin(LargeTableAdmin):
+    list_display = ('id', 'title', 'host', 'location', 'price', 'is_available', 'created_at')
+    list_select_related = ('host',)
+    list_filter = ('created_at',)
+    search_fields = ('=external_id', '^title')
+    raw_id_fields = ('host',)
+    actions = ('mark_available', 'mark_unavailable')
+
+    @admin.action(description="Mark selected listings as available")
+    def mark_available(self, request, queryset):
+        updated = queryset.update(is_available=True)
+        self.message_user(request, f"{updated} listings marked available.", messages.SUCCESS)
+
+    @admin.action(description="Mark selected listings as unavailable")
+    def mark_unavailable(self, request, queryset):
+        updated = queryset.update(is_available=False)
+        self.message_user(request, f"{updated} listings marked unavailable.", messages.SUCCESS)
+
+
+@admin.register(ListingImage)
+class ListingImageAdmin(LargeTableAdmin):
+    list_display = ('id', 'listing', 'is_primary', 'blob')
+    list_select_related = ('listing', 'blob')
+    autocomplete_fields = ('listing',)
+    raw_id_fields = ('blob',)
+    readonly_fields = ('variants',)
+
+
+@admin.register(Booking)
+class BookingAdmin(LargeTableAdmin):
+    list_display = ('id', 'listing', 'guest', 'start_date', 'end_date', 'total_price', 'status', 'created_at')
+    list_select_related = ('listing', 'guest')
+    list_filter = ('status', 'created_at')
+    autocomplete_fields = ('listing',)
+    raw_id_fields = ('guest',)
+    actions = ('confirm_bookings', 'cancel_bookings')
+
+    def set_status(self, request, queryset, status):
+        # Single UPDATE; queryset.update() skips the save signals, so the
+        # affected rollup ranges are queued and the cached calendars
+        # invalidated here instead.
+        with transaction.atomic():
+            stays = list(
+                queryset.exclude(status=status)
+                .order_by()
+                .values('listing_id')
+                .annotate(start=Min('start_date'), end=Max('end_date'))
+            )
+            updated = queryset.exclude(status=status).update(status=status)
+            availability.invalidate(*(stay['listing_id'] for stay in stays))
+
+        from .tasks import refresh_listing_rollups
+
+        for stay in stays:
+            dispatch(refresh_listing_rollups, stay['listing_id'], stay['start'].isoformat(), stay['end'].isoformat())
+        self.message_user(request, f"{updated} bookings marked {status}.", messages.SUCCESS)
+
+    @admin.action(description="Confirm selected bookings")
+    def confirm_bookings(self, request, queryset):
+        self.set_status(request, queryset, 'confirmed')
+
+    @admin.action(description="Cancel selected bookings")
+    def cancel_bookings(self, request, queryset):
+        self.set_status(request, queryset, 'cancelled')
+
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ('tx_ref', 'booking', 'amount', 'currency', 'status', 'created_at')
+    list_select_related = ('booking__listing',)
+    list_filter = ('status', 'created_at')
+    search_fields = ('=tx_ref',)
+    raw_id_fields = ('booking',)
+    actions = ('fail_pending_payments',)
+
+    @admin.action(description="Mark selected pending payments as failed")
+    def fail_pending_payments(self, request, queryset):
+        # Pending -> Failed leaves revenue unchanged, so no rollups to refresh,
+        # but open payment event streams still need the new status.
+        with transaction.atomic():
+            pending = queryset.filter(status=Payment.STATUS_PENDING)
+            tx_refs = list(pending.select_for_update().values_list('tx_ref', flat=True))
+            updated = Payment.objects.filter(tx_ref__in=tx_refs, status=Payment.STATUS_PENDING).update(
+                status=Payment.STATUS_FAILED
+            )
+
+            def publish():
+                for tx_ref in tx_refs:
+                    payment_events.publish(tx_ref, Payment.STATUS_FAILED)
+
+            transaction.on_commit(publish)
+        self.message_user(request, f"{updated} payments marked failed.", messages.SUCCESS)
+
+
+@admin.register(Review)
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ('id', 'listing', 'user', 'rating', 'created_at')
+    list_select_related = ('listing', 'user')
+    autocomplete_fields = ('listing',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(ListingImportJob)
+class ListingImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'host', 'format', 'status', 'rows_imported', 'rows_failed', 'created_at')
+    list_select_related = ('host',)
+    list_filter = ('status',)
+    raw_id_fields = ('host',)
+    readonly_fields = ('checkpoint', 'rows_imported', 'rows_failed', 'errors', 'detail')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(LargeTableAdmin):
+    list_display = ('id', 'task_name', 'idempotency_key', 'attempts', 'created_at', 'published_at', 'processed_at')
+    list_filter = ('task_name',)
+    search_fields = ('=idempotency_key',)
+    readonly_fields = ('idempotency_key', 'task_name', 'kwargs', 'attempts', 'last_error', 'created_at',
+                       'published_at', 'processed_at')
+    actions = ('republish',)
+
+    @admin.action(description="Publish selected messages again")
+    def republish(self, request, queryset):
+        updated = queryset.update(published_at=None, processed_at=None)
+        self.message_user(request, f"{updated} messages queued for the relay.", messages.SUCCESS)
@@ -0,0 +1,121 @@
+"""
+Availability calendars as compact bitmaps.
+
+A calendar covers the nights ``from`` to ``to`` inclusive. Bit ``i`` (most
+significant bit of each byte first) is set when night ``from + i`` is taken
+by a booking that is not cancelled; the bitmap is padded with zero bits to
+whole bytes and sent base64 encoded, so a year is 46 bytes (64 characters).
+
+The bits are computed in Postgres: each overlapping booking's nights come
+from ``generate_series`` and are OR-ed into one bit string per listing, so a
+calendar is one indexed query however many bookings it covers.
+
+Calendars are cached per listing under a version number that booking writes
+bump (``listings/signals.py``). Old entries are never deleted, they just stop
+being read and expire.
+"""
+from base64 import b64encode
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Booking
+
+
+def version_key(listing_id):
+    return f"calendar:version:{listing_id}"
+
+
+def invalidate(*listing_ids):
+    """
+    Make cached calendars of these listings stale once the current
+    transaction commits.
+    """
+    def bump():
+        for listing_id in set(listing_ids):
+            key = version_key(listing_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 1, None)
+
+    transaction.on_commit(bump)
+
+
+def night_count(start, end):
+    return (end - start).days + 1
+
+
+def encode(bits):
+    """
+    A '0'/'1' string as base64 bytes, most significant bit first.
+    """
+    padded = bits + '0' * (-len(bits) % 8)
+    return b64encode(int(padded, 2).to_bytes(len(padded) // 8, 'big')).decode('ascii') if padded else ''
+
+
+def compute(listing_ids, start, end):
+    """
+    Bitmaps for the listings over ``[start, end]``, straight from bookings.
+    """
+    nights = night_count(start, end)
+    empty = '0' * nights
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT b.listing_id, bit_or(set_bit(%s::varbit, night::date - %s::date, 1))
+            FROM {Booking._meta.db_table} AS b
+            CROSS JOIN LATERAL generate_series(
+                GREATEST(b.start_date, %s::date), LEAST(b.end_date - 1, %s::date), interval '1 day'
+            ) AS night
+            WHERE b.listing_id = ANY(%s) AND b.status <> 'cancelled'
+                AND b.start_date <= %s AND b.end_date > %s
+            GROUP BY b.listing_id
+            """,
+            [empty, start, start, end, list(listing_ids), end, start],
+        )
+        taken = dict(cursor.fetchall())
+    return {listing_id: encode(taken.get(listing_id, empty)) for listing_id in listing_ids}
+
+
+def calendars(listing_ids, start, end):
+    """
+    Bitmaps for the listings over ``[start, end]``, from the cache where
+    possible; the misses are computed together in one query.
+    """
+    listing_ids = list(dict.fromkeys(listing_ids))
+    versions = cache.get_many([version_key(listing_id) for listing_id in listing_ids])
+    keys = {
+        listing_id: f"calendar:{listing_id}:{versions.get(version_key(listing_id), 0)}:{start}:{end}"
+        for listing_id in listing_ids
+    }
+    cached = cache.get_many(list(keys.values()))
+    result = {listing_id: cached[key] for listing_id, key in keys.items() if key in cached}
+    missing = [listing_id for listing_id in listing_ids if listing_id not in result]
+    if missing:
+        computed = compute(missing, start, end)
+        cache.set_many(
+            {keys[listing_id]: bitmap for listing_id, bitmap in computed.items()},
+            settings.CALENDAR_CACHE_SECONDS,
+        )
+        result.update(computed)
+    return result
+
+
+def parse_range(params, today):
+    """
+    The ``from``/``to`` query parameters (YYYY-MM-DD) as dates; a year from
+    today by default. Raises ``ValueError`` with a message for the client.
+    """
+    try:
+        start = date.fromisoformat(params['from']) if params.get('from') else today
+        end = date.fromisoformat(params['to']) if params.get('to') else start + timedelta(days=364)
+    except ValueError:
+        raise ValueError("from/to must be dates formatted as YYYY-MM-DD.") from None
+    if end < start:
+        raise ValueError("from must not be after to.")
+    if night_count(start, end) > settings.CALENDAR_MAX_NIGHTS:
+        raise ValueError(f"A calendar covers at most {settings.CALENDAR_MAX_NIGHTS} nights.")
+    return start, end
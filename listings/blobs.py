@@ -0,0 +1,94 @@
+from django.db import connection, transaction
+from django.db.models import ProtectedError
+
+from .models import ImageBlob, ListingImage
+
+
+# Maximum Hamming distance between two perceptual hashes for the images to be
+# flagged as near-duplicates. Four 16-bit bands guarantee (by pigeonhole) that
+# any pair within 3 bits shares at least one band, so the GIN lookup is exact.
+NEAR_DUPLICATE_DISTANCE = 3
+
+
+def acquire_blob(digest, name, size, count=1):
+    """
+    Add ``count`` references to the blob for ``digest``, creating it if needed.
+
+    A single ``INSERT ... ON CONFLICT DO UPDATE`` so concurrent uploads of the
+    same bytes cannot lose an increment. Returns ``True`` if the blob is new.
+    """
+    table = ImageBlob._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (sha256, name, size, ref_count, created_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (sha256) DO UPDATE SET ref_count = {table}.ref_count + EXCLUDED.ref_count
+            RETURNING xmax = 0
+            """,
+            [digest, name, size, count],
+        )
+        return cursor.fetchone()[0]
+
+
+def release_blob(digest):
+    """
+    Drop one reference to a blob; at zero, delete the blob, its file and its variants.
+    """
+    from .images import delete_variants
+
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(pk=digest).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            ImageBlob.objects.filter(pk=digest).update(ref_count=blob.ref_count - 1)
+            return
+        try:
+            blob.delete()
+        except ProtectedError:
+            # The stored count drifted; trust the rows that still point here.
+            ImageBlob.objects.filter(pk=digest).update(ref_count=blob.images.count())
+            return
+
+        def delete_files():
+            if ImageBlob.objects.filter(pk=digest).exists():
+                return  # re-uploaded since; the file is live again
+            storage = ListingImage._meta.get_field('image').storage
+            storage.delete(blob.name)
+            delete_variants(blob.name, storage)
+
+        transaction.on_commit(delete_files)
+
+
+def phash_bands(phash):
+    unsigned = phash & 0xFFFFFFFFFFFFFFFF
+    return [(band << 16) | ((unsigned >> (16 * band)) & 0xFFFF) for band in range(4)]
+
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+def record_phash(digest, phash):
+    """
+    Store a blob's perceptual hash and link it to the closest existing blob
+    within ``NEAR_DUPLICATE_DISTANCE`` bits. Returns that blob's digest, or ``None``.
+    """
+    bands = phash_bands(phash)
+    candidates = (
+        ImageBlob.objects.filter(phash_bands__overlap=bands)
+        .exclude(pk=digest)
+        .values_list('sha256', 'phash')
+    )
+    closest = None
+    for sha256, other in candidates:
+        distance = hamming(phash, other)
+        if distance <= NEAR_DUPLICATE_DISTANCE and (closest is None or distance < closest[1]):
+            closest = (sha256, distance)
+
+    near_duplicate_of = closest[0] if closest else None
+    ImageBlob.objects.filter(pk=digest).update(
+        phash=phash, phash_bands=bands, near_duplicate_of=near_duplicate_of
+    )
+    return near_duplicate_of
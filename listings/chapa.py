@@ -0,0 +1,91 @@
+"""
+Minimal client for the Chapa payment API.
+
+``requests`` is imported on first call rather than at module import, so
+processes that never talk to the gateway do not load it at boot.
+
+Every call goes through a shared circuit breaker: once Chapa has failed
+repeatedly, calls raise ``GatewayUnavailable`` immediately instead of tying
+up a worker for the full timeout.
+"""
+from functools import cache
+
+from django.conf import settings
+
+from alx_travel_app.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+CONNECT_TIMEOUT = 3.05
+TIMEOUT = 20
+
+
+class ChapaError(Exception):
+    """The Chapa API could not be reached or returned an unreadable response."""
+
+
+class GatewayUnavailable(ChapaError):
+    """The circuit breaker is open; Chapa was not called."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Payment gateway temporarily unavailable; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+@cache
+def breaker():
+    return CircuitBreaker(
+        'chapa',
+        failure_threshold=settings.CHAPA_BREAKER_FAILURE_THRESHOLD,
+        failure_window=settings.CHAPA_BREAKER_FAILURE_WINDOW,
+        reset_timeout=settings.CHAPA_BREAKER_RESET_SECONDS,
+        probe_timeout=CONNECT_TIMEOUT + TIMEOUT,
+    )
+
+
+def is_configured():
+    return bool(getattr(settings, 'CHAPA_SECRET_KEY', '').strip())
+
+
+def _request(method, path, **kwargs):
+    import requests
+
+    headers = {
+        "Authorization": f"Bearer {getattr(settings, 'CHAPA_SECRET_KEY', '')}",
+        "Content-Type": "application/json",
+    }
+    try:
+        probe = breaker().before_call()
+    except CircuitOpenError as e:
+        raise GatewayUnavailable(e.retry_after) from e
+    try:
+        response = requests.request(
+            method, f"{settings.CHAPA_BASE_URL.rstrip('/')}{path}", headers=headers, timeout=(CONNECT_TIMEOUT, TIMEOUT), **kwargs
+        )
+    except requests.RequestException as e:
+        breaker().record_failure(probe)
+        raise ChapaError(str(e)) from e
+    # A 4xx is Chapa rejecting this request, not Chapa being unhealthy. A 5xx
+    # says nothing about the transaction, so it must not read as "failed".
+    if response.status_code >= 500:
+        breaker().record_failure(probe)
+        raise ChapaError(f"Chapa returned HTTP {response.status_code}")
+    breaker().record_success(probe)
+    if not response.headers.get("Content-Type", "").startswith("application/json"):
+        return {"status": "failed"}
+    try:
+        return response.json()
+    except ValueError as e:
+        raise ChapaError(f"Unreadable response: {e}") from e
+
+
+def initialize_transaction(payload):
+    """
+    Start a hosted checkout. Returns Chapa's JSON body (``status``, ``data.checkout_url``).
+    """
+    return _request("POST", "/transaction/initialize", json=payload)
+
+
+def verify_transaction(tx_ref):
+    """
+    Look up a transaction by reference. Returns Chapa's JSON body.
+    """
+    return _request("GET", f"/transaction/verify/{tx_ref}")
@@ -0,0 +1,198 @@
+"""
+A local stand-in for the Chapa API, for load and latency testing.
+
+Implements ``POST /v1/transaction/initialize`` and
+``GET /v1/transaction/verify/<tx_ref>`` with Chapa's response shapes, plus
+configurable latency, error and timeout injection, and sends the payment
+webhook back to the app. Run it with ``manage.py run_chapa_simulator`` and
+point the app at it with ``CHAPA_BASE_URL=http://localhost:8090/v1``.
+
+Only the standard library is used; the server is threaded so slow responses
+do not hold up other requests.
+"""
+import json
+import logging
+import random
+import threading
+import time
+import urllib.request
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+def parse_distribution(spec):
+    """
+    Parse a latency spec into a zero-argument sampler returning milliseconds.
+
+    ``fixed:MS``, ``uniform:LOW,HIGH``, ``normal:MEAN,STDDEV``,
+    ``exponential:MEAN`` or ``lognormal:MEDIAN,SIGMA``. Samples never go
+    below zero.
+    """
+    kind, _, args = spec.partition(':')
+    try:
+        values = [float(v) for v in args.split(',')] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec {spec!r}") from None
+    samplers = {
+        'fixed': (1, lambda ms: ms),
+        'uniform': (2, lambda low, high: random.uniform(low, high)),
+        'normal': (2, lambda mean, std: random.gauss(mean, std)),
+        'exponential': (1, lambda mean: random.expovariate(1 / mean) if mean else 0),
+        'lognormal': (2, lambda median, sigma: random.lognormvariate(0, sigma) * median),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(
+            f"Invalid latency spec {spec!r}; use fixed:MS, uniform:LOW,HIGH, normal:MEAN,STDDEV, "
+            "exponential:MEAN or lognormal:MEDIAN,SIGMA"
+        )
+    sample = samplers[kind][1]
+    return lambda: max(0.0, sample(*values))
+
+
+@dataclass
+class SimulatorConfig:
+    latency: str = 'fixed:0'
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 30.0
+    decline_rate: float = 0.0
+    webhook_url: str = ''
+    webhook_delay: str = 'fixed:500'
+    public_url: str = 'http://localhost:8090'
+
+
+@dataclass
+class Simulator:
+    """
+    Transaction store and fault injection shared by all request threads.
+    """
+    config: SimulatorConfig
+    transactions: dict = field(default_factory=dict)
+    stats: Counter = field(default_factory=Counter)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __post_init__(self):
+        self.latency = parse_distribution(self.config.latency)
+        self.webhook_delay = parse_distribution(self.config.webhook_delay)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def inject_fault(self):
+        """
+        Sleep for the sampled latency, then return 'timeout', 'error' or None.
+        """
+        time.sleep(self.latency() / 1000)
+        roll = random.random()
+        if roll < self.config.timeout_rate:
+            time.sleep(self.config.timeout_seconds)
+            return 'timeout'
+        if roll < self.config.timeout_rate + self.config.error_rate:
+            return 'error'
+        return None
+
+    def initialize(self, payload):
+        tx_ref = payload.get('tx_ref')
+        if not tx_ref or not payload.get('amount') or not payload.get('email'):
+            return 400, {"message": "tx_ref, amount and email are required", "status": "failed", "data": None}
+        if random.random() < self.config.decline_rate:
+            return 400, {"message": "Transaction declined", "status": "failed", "data": None}
+        with self.lock:
+            if tx_ref in self.transactions:
+                return 400, {"message": "Transaction reference has been used before", "status": "failed", "data": None}
+            self.transactions[tx_ref] = {
+                "tx_ref": tx_ref,
+                "amount": str(payload['amount']),
+                "currency": payload.get('currency', 'ETB'),
+                "email": payload['email'],
+                "status": "success",
+                "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            }
+        if self.config.webhook_url:
+            timer = threading.Timer(self.webhook_delay() / 1000, self.send_webhook, args=(tx_ref,))
+            timer.daemon = True
+            timer.start()
+        return 200, {
+            "message": "Hosted Link",
+            "status": "success",
+            "data": {"checkout_url": f"{self.config.public_url}/checkout/{tx_ref}"},
+        }
+
+    def verify(self, tx_ref):
+        transaction = self.transactions.get(tx_ref)
+        if transaction is None:
+            return 404, {"message": "Invalid transaction or Transaction not found", "status": "failed", "data": None}
+        return 200, {"message": "Payment details", "status": "success", "data": transaction}
+
+    def send_webhook(self, tx_ref):
+        body = json.dumps({"tx_ref": tx_ref, "status": "success"}).encode()
+        request = urllib.request.Request(
+            self.config.webhook_url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                self.count(f"webhook {response.status}")
+        except Exception as e:
+            logger.warning("Webhook for %s failed: %s", tx_ref, e)
+            self.count("webhook failed")
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    simulator = None  # set by make_server()
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/v1/transaction/initialize':
+            return self.respond(404, {"message": "Not found", "status": "failed"})
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self.respond(400, {"message": "Invalid JSON", "status": "failed"})
+        self.handle_call('initialize', lambda: self.simulator.initialize(payload))
+
+    def do_GET(self):
+        prefix = '/v1/transaction/verify/'
+        if not self.path.startswith(prefix):
+            return self.respond(404, {"message": "Not found", "status": "failed"})
+        tx_ref = self.path[len(prefix):].strip('/')
+        self.handle_call('verify', lambda: self.simulator.verify(tx_ref))
+
+    def handle_call(self, name, call):
+        fault = self.simulator.inject_fault()
+        self.simulator.count(f"{name} {fault or 'ok'}")
+        if fault == 'timeout':
+            self.close_connection = True
+            return
+        if fault == 'error':
+            body = b"<html><body>502 Bad Gateway</body></html>"
+            self.send_response(502)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.respond(*call())
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def make_server(host, port, config):
+    simulator = Simulator(config)
+    handler = type('BoundSimulatorHandler', (SimulatorHandler,), {'simulator': simulator})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, simulator
@@ -0,0 +1,171 @@
+"""
+``Idempotency-Key`` support for unsafe endpoints.
+
+A client that times out and retries sends the same key again. The first
+request with a key claims it: a short transaction inserts the key row with
+no response yet, which marks it in progress, and commits. The view then runs
+outside that transaction, and its response is stored on the row when it
+returns. Repeats get the stored response back instead of creating another
+booking or Chapa transaction.
+
+A repeat that arrives while the original is still running gets ``409`` with
+``Retry-After``. If the original fails (an exception or a 5xx), its claim is
+released so a retry runs the view again. A claim left behind by a worker that
+died is taken over once it is ``IDEMPOTENCY_LEASE_SECONDS`` old.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status as drf_status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def request_fingerprint(request):
+    """
+    SHA-256 over the method, path and parsed body, so a key reused for a
+    different request can be told apart from a retry.
+    """
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def request_scope(request):
+    principal = f"user:{request.user.pk}" if request.user.is_authenticated else "anon"
+    return f"{principal} {request.method} {request.path}"[:255]
+
+
+def claim(scope, key, fingerprint):
+    """
+    Insert the key row in progress, or take over an expired one or an
+    abandoned claim, and commit.
+
+    Returns the claim's ``created_at`` if this request now owns the key, else
+    None. The claim is only ever held for this one statement.
+    """
+    now = timezone.now()
+    table = IdempotencyKey._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (scope, key, fingerprint, created_at, expires_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (scope, key) DO UPDATE SET
+                fingerprint = EXCLUDED.fingerprint,
+                response_status = NULL,
+                response_body = NULL,
+                created_at = EXCLUDED.created_at,
+                expires_at = EXCLUDED.expires_at
+            WHERE {table}.expires_at <= EXCLUDED.created_at
+               OR ({table}.response_status IS NULL AND {table}.created_at <= %s)
+            RETURNING id
+            """,
+            [
+                scope, key, fingerprint, now, now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                now - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS),
+            ],
+        )
+        claimed = cursor.fetchone() is not None
+    return now if claimed else None
+
+
+def release(scope, key, claimed_at):
+    IdempotencyKey.objects.filter(
+        scope=scope, key=key, created_at=claimed_at, response_status__isnull=True,
+    ).delete()
+
+
+def store(scope, key, claimed_at, response):
+    # Matching on created_at leaves alone a claim that was taken over after our lease ran out.
+    IdempotencyKey.objects.filter(scope=scope, key=key, created_at=claimed_at).update(
+        response_status=response.status_code,
+        response_body=response.data,
+    )
+
+
+def in_progress():
+    return Response(
+        {"detail": "A request with this Idempotency-Key is still in progress; retry."},
+        status=drf_status.HTTP_409_CONFLICT,
+        headers={"Retry-After": "1"},
+    )
+
+
+def replay(scope, key, fingerprint):
+    stored = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if stored is None:
+        # The original failed, or the row was swept, between our claim and this read.
+        return in_progress()
+    if stored.fingerprint != fingerprint:
+        return Response(
+            {"detail": "This Idempotency-Key was already used for a different request."},
+            status=drf_status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if stored.response_status is None:
+        return in_progress()
+    return Response(stored.response_body, status=stored.response_status, headers={REPLAYED_HEADER: "true"})
+
+
+def idempotent(handler):
+    """
+    Make a DRF handler (``create``, ``post``, ...) honour ``Idempotency-Key``.
+
+    Requests without the header are passed straight through.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > 255:
+            return Response(
+                {"detail": f"{HEADER} must be 1 to 255 characters."},
+                status=drf_status.HTTP_400_BAD_REQUEST,
+            )
+
+        scope = request_scope(request)
+        fingerprint = request_fingerprint(request)
+        claimed_at = claim(scope, key, fingerprint)
+        if claimed_at is None:
+            return replay(scope, key, fingerprint)
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except BaseException:
+            release(scope, key, claimed_at)
+            raise
+        if response.status_code >= 500:
+            # Don't pin a server error to the key, so a retry runs again.
+            release(scope, key, claimed_at)
+        else:
+            store(scope, key, claimed_at, response)
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size=5000):
+    """
+    Delete expired keys in batches. Returns the number deleted.
+    """
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        deleted, _ = IdempotencyKey.objects.filter(id__in=ids, expires_at__lte=timezone.now()).delete()
+        total += deleted
@@ -0,0 +1,152 @@
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import ListingImage
+
+
+# Widths generated for every uploaded listing image. Originals narrower than a
+# width are never upscaled; the original width is used as the largest variant.
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# Output formats, keyed by the name used in the variants map. Images are
+# re-encoded from pixel data only, so EXIF/GPS, ICC and XMP metadata is dropped.
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANTS_DIR = 'listing_images/variants'
+
+
+def variant_name(source_name, width, extension):
+    # Keyed by the whole source name: photo.jpg and photo.png, or two
+    # photo.jpg in different directories, must not share variants.
+    return f"{VARIANTS_DIR}/{source_name}/{width}.{extension}"
+
+
+def recorded_variants(variants):
+    """
+    ``(format, width, name)`` for every file in a ``ListingImage.variants`` map.
+    """
+    return [
+        (key, width, name)
+        for key in VARIANT_FORMATS
+        if isinstance(variants.get(key), dict)
+        for width, name in variants[key].items()
+    ]
+
+
+def render_variants(source_name, storage=None):
+    """
+    Generate resized, metadata-free variants of a stored image.
+
+    Returns the variants map stored on ``ListingImage.variants``::
+
+        {"source": <name>, "width": 2400, "webp": {"320": <name>, ...}, "jpeg": {...}}
+
+    Only touches storage, never the database, so it can run in worker processes.
+    """
+    storage = storage or default_storage
+    with storage.open(source_name, 'rb') as fh:
+        with Image.open(fh) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'L'):
+                original = original.convert('RGB')
+            source_width = original.width
+            widths = sorted({min(width, source_width) for width in VARIANT_WIDTHS})
+
+            variants = {'source': source_name, 'width': source_width}
+            for key, (pil_format, extension, options) in VARIANT_FORMATS.items():
+                variants[key] = {}
+                for width in widths:
+                    resized = original
+                    if width < source_width:
+                        height = max(1, round(original.height * width / source_width))
+                        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+                    buffer = io.BytesIO()
+                    resized.save(buffer, pil_format, **options)
+                    name = variant_name(source_name, width, extension)
+                    if storage.exists(name):
+                        storage.delete(name)
+                    variants[key][str(width)] = storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variants(source_name, storage=None, variants=None):
+    """
+    Delete every stored variant rendered from ``source_name``, plus the files
+    recorded in a ``variants`` map. Variants rendered before they were keyed
+    by the whole source name are only found through that map, and are kept
+    while another image still records them.
+    """
+    storage = storage or default_storage
+    directory = posixpath.dirname(variant_name(source_name, 0, ''))
+    if storage.exists(directory):
+        for filename in storage.listdir(directory)[1]:
+            storage.delete(f"{directory}/{filename}")
+    for key, width, name in recorded_variants(variants or {}):
+        if name.startswith(directory + '/'):
+            continue
+        # The old layout shared files between images with the same stem.
+        if not ListingImage.objects.filter(variants__contains={key: {width: name}}).exists():
+            storage.delete(name)
+
+
+def perceptual_hash(source_name, storage=None):
+    """
+    64-bit difference hash (dHash) of a stored image, as a signed integer.
+
+    Robust to re-encoding, resizing and small edits, so re-uploads of the same
+    photo land within a few bits of each other.
+    """
+    storage = storage or default_storage
+    with storage.open(source_name, 'rb') as fh:
+        with Image.open(fh) as img:
+            img.draft('L', (64, 64))
+            pixels = list(ImageOps.exif_transpose(img).convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def generate_variants(image_id):
+    """
+    Render variants for one ``ListingImage`` and store the map on the row.
+
+    Images sharing a content-addressed file reuse an existing variants map
+    instead of being re-rendered. Returns the variants map, or ``None`` if the
+    image no longer exists.
+    """
+    image = ListingImage.objects.filter(pk=image_id).only('image', 'variants', 'blob').first()
+    if image is None or not image.image:
+        return None
+    name = image.image.name
+    variants = None
+    if image.blob_id:
+        variants = (
+            ListingImage.objects.filter(image=name, variants__source=name)
+            .values_list('variants', flat=True)
+            .first()
+        )
+        if getattr(settings, 'LISTING_IMAGE_PHASH', False):
+            from .blobs import record_phash
+            from .models import ImageBlob
+
+            if ImageBlob.objects.filter(pk=image.blob_id, phash__isnull=True).exists():
+                record_phash(image.blob_id, perceptual_hash(name, image.image.storage))
+    if variants is None:
+        variants = render_variants(name)
+    # update() rather than save() so the post_save hook does not re-enqueue.
+    ListingImage.objects.filter(pk=image_id, image=name).update(variants=variants)
+    return variants
+
+
+def variants_needed(image):
+    return bool(image.image) and image.variants.get('source') != image.image.name
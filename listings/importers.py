@@ -0,0 +1,291 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from .models import Listing, ListingImportJob
+
+
+# Listing columns accepted from an import file, besides ``external_id`` and ``host``.
+IMPORT_FIELDS = [
+    'title',
+    'description',
+    'price',
+    'property_type',
+    'bedrooms',
+    'bathrooms',
+    'location',
+    'latitude',
+    'longitude',
+    'is_available',
+]
+# Columns rewritten when a row's external_id already exists. ``created_at`` and
+# ``host`` are left untouched so a re-import never moves a listing between hosts.
+UPDATE_FIELDS = IMPORT_FIELDS + ['updated_at']
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+
+def detect_format(filename):
+    """
+    Guess the import format from a file name, defaulting to CSV.
+    """
+    name = filename.lower()
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        return ListingImportJob.FORMAT_JSONL
+    return ListingImportJob.FORMAT_CSV
+
+
+def iter_rows(fileobj, fmt):
+    """
+    Stream ``(row_number, row)`` pairs from a binary file object.
+
+    Rows are numbered from 1 in file order (the CSV header is not counted), so
+    a row number can be used as a resume checkpoint. Nothing is buffered beyond
+    the current line.
+    """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    if fmt == ListingImportJob.FORMAT_JSONL:
+        row_number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield row_number, e
+                continue
+            yield row_number, row if isinstance(row, dict) else ValueError("Row must be a JSON object")
+    else:
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, row
+
+
+class ListingRowValidator:
+    """
+    Validate raw import rows against the ``Listing`` field definitions.
+
+    Uses the model fields' own ``clean()`` (type coercion, choices, blank/null
+    and validators) instead of a serializer per row, which keeps validation of
+    a chunk cheap enough for million-row files.
+
+    The ``host`` column is only read when ``host_column`` is true (the
+    ``import_listings`` command); otherwise every row gets ``default_host_id``.
+    """
+
+    def __init__(self, default_host_id=None, host_column=True):
+        self.default_host_id = default_host_id
+        self.host_column = host_column
+        self.fields = {name: Listing._meta.get_field(name) for name in IMPORT_FIELDS}
+        self.external_id_field = Listing._meta.get_field('external_id')
+
+    def coerce(self, field, value):
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                value = None
+            elif field.get_internal_type() == 'BooleanField':
+                lowered = value.lower()
+                if lowered in TRUE_VALUES:
+                    return True
+                if lowered in FALSE_VALUES:
+                    return False
+        if value is None and field.has_default():
+            return field.get_default()
+        if value is None and field.get_internal_type() in ('CharField', 'TextField') and not field.null:
+            return ''
+        return value
+
+    def clean_row(self, row):
+        """
+        Return a dict of cleaned Listing values or raise ``ValidationError``.
+        """
+        errors = {}
+        cleaned = {}
+
+        external_id = str(row.get('external_id') or '').strip()
+        if not external_id:
+            errors['external_id'] = ["This field is required."]
+        else:
+            try:
+                cleaned['external_id'] = self.external_id_field.clean(external_id, None)
+            except ValidationError as e:
+                errors['external_id'] = e.messages
+
+        for name, field in self.fields.items():
+            try:
+                cleaned[name] = field.clean(self.coerce(field, row.get(name)), None)
+            except ValidationError as e:
+                errors[name] = e.messages
+
+        host = (self.host_column and row.get('host')) or self.default_host_id
+        try:
+            cleaned['host_id'] = int(host)
+        except (TypeError, ValueError):
+            errors['host'] = ["A valid host id is required."]
+
+        if errors:
+            raise ValidationError(errors)
+        return cleaned
+
+
+class ListingImporter:
+    """
+    Stream an import file into ``Listing`` rows in validated, upserted chunks.
+
+    Each chunk is committed in its own transaction and followed by a call to
+    ``on_checkpoint(row_number, imported, errors)``, so an interrupted import
+    can be resumed by passing the last checkpoint back as ``start_after``.
+
+    Rows whose ``external_id`` belongs to another host's listing, and rows
+    replaced by a later row with the same ``external_id``, are reported as
+    errors.
+    """
+
+    def __init__(
+        self, fileobj, fmt, default_host_id=None, host_column=True, chunk_size=2000, start_after=0, on_checkpoint=None
+    ):
+        self.fileobj = fileobj
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.start_after = start_after
+        self.on_checkpoint = on_checkpoint
+        self.validator = ListingRowValidator(default_host_id, host_column)
+
+    def run(self):
+        """
+        Import the whole file; returns ``(imported, failed)`` counts for this run.
+        """
+        imported = failed = 0
+        chunk = []
+        for row_number, row in iter_rows(self.fileobj, self.fmt):
+            if row_number <= self.start_after:
+                continue
+            chunk.append((row_number, row))
+            if len(chunk) >= self.chunk_size:
+                ok, errors = self.import_chunk(chunk)
+                imported, failed = imported + ok, failed + len(errors)
+                chunk = []
+        if chunk:
+            ok, errors = self.import_chunk(chunk)
+            imported, failed = imported + ok, failed + len(errors)
+        return imported, failed
+
+    def import_chunk(self, chunk):
+        errors = []
+        rows = {}
+        for row_number, row in chunk:
+            if isinstance(row, Exception):
+                errors.append({"row": row_number, "errors": {"non_field_errors": [str(row)]}})
+                continue
+            try:
+                cleaned = self.validator.clean_row(row)
+            except ValidationError as e:
+                errors.append({"row": row_number, "errors": e.message_dict})
+                continue
+            # A later row with the same external_id wins; Postgres refuses to
+            # update the same row twice within one INSERT ... ON CONFLICT.
+            superseded = rows.get(cleaned['external_id'])
+            if superseded is not None:
+                message = f"Replaced by row {row_number}, which has the same external_id."
+                errors.append({"row": superseded[0], "errors": {"external_id": [message]}})
+            rows[cleaned['external_id']] = (row_number, cleaned)
+
+        host_ids = {cleaned['host_id'] for _, cleaned in rows.values()}
+        known_hosts = set(User.objects.filter(pk__in=host_ids).values_list('pk', flat=True))
+        listings = {}
+        for external_id, (row_number, cleaned) in rows.items():
+            if cleaned['host_id'] not in known_hosts:
+                errors.append({"row": row_number, "errors": {"host": ["Host does not exist."]}})
+                continue
+            listings[external_id] = (row_number, Listing(**cleaned))
+
+        with transaction.atomic():
+            written = upsert([listing for _, listing in listings.values()])
+        for external_id, (row_number, _) in listings.items():
+            if external_id not in written:
+                message = "A listing of another host has this external_id."
+                errors.append({"row": row_number, "errors": {"external_id": [message]}})
+        errors.sort(key=lambda error: error["row"])
+        if self.on_checkpoint:
+            self.on_checkpoint(chunk[-1][0], len(written), errors)
+        return len(written), errors
+
+
+def upsert(listings):
+    """
+    Insert ``listings``, or update the listing with the same ``external_id``
+    if the same host owns it. Returns the external_ids written.
+
+    ``bulk_create(update_conflicts=True)`` cannot make the update conditional.
+    The condition is checked against the latest committed row, so two hosts
+    importing the same new external_id at once cannot overwrite each other.
+    """
+    if not listings:
+        return set()
+    table = Listing._meta.db_table
+    fields = [field for field in Listing._meta.concrete_fields if not field.primary_key]
+    columns = ', '.join(field.column for field in fields)
+    updates = ', '.join(
+        f"{column} = EXCLUDED.{column}" for column in (Listing._meta.get_field(name).column for name in UPDATE_FIELDS)
+    )
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    written = set()
+    with connection.cursor() as cursor:
+        batch_size = connection.ops.bulk_batch_size(fields, listings)
+        for start in range(0, len(listings), batch_size):
+            batch = listings[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(field.pre_save(listing, add=True), connection)
+                for listing in batch
+                for field in fields
+            ]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT (external_id) DO UPDATE SET {updates} "
+                f"WHERE {table}.host_id = EXCLUDED.host_id "
+                f"RETURNING external_id",
+                params,
+            )
+            written.update(row[0] for row in cursor.fetchall())
+    return written
+
+
+def run_import_job(job):
+    """
+    Run (or resume) a ``ListingImportJob`` from its stored checkpoint.
+    """
+    def checkpoint(row_number, imported, errors):
+        job.checkpoint = row_number
+        job.rows_imported += imported
+        job.rows_failed += len(errors)
+        room = ListingImportJob.MAX_ERRORS - len(job.errors)
+        if room > 0:
+            job.errors.extend(errors[:room])
+        job.save(update_fields=['checkpoint', 'rows_imported', 'rows_failed', 'errors', 'updated_at'])
+
+    job.status = ListingImportJob.STATUS_RUNNING
+    job.save(update_fields=['status', 'updated_at'])
+    try:
+        with job.source.open('rb') as fileobj:
+            ListingImporter(
+                fileobj,
+                job.format,
+                default_host_id=job.host_id,
+                host_column=False,
+                start_after=job.checkpoint,
+                on_checkpoint=checkpoint,
+            ).run()
+    except Exception as e:
+        job.status = ListingImportJob.STATUS_FAILED
+        job.detail = str(e)
+        job.save(update_fields=['status', 'detail', 'updated_at'])
+        raise
+    job.status = ListingImportJob.STATUS_COMPLETED
+    job.save(update_fields=['status', 'updated_at'])
+    return job
@@ -0,0 +1,47 @@
+import argparse
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from listings.partitions import PARTITIONED, archive
+
+
+def month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a month (YYYY-MM).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Detach booking and payment partitions older than PARTITION_RETENTION_MONTHS, stream each to "
+        "a gzipped JSON Lines archive and drop it. Restore one with restore_partition."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=sorted(PARTITIONED),
+            action="append",
+            help="Archive only this model's partitions (repeatable; default: all).",
+        )
+        parser.add_argument(
+            "--before", type=month, help="Archive months before this one, YYYY-MM (default: the retention setting)."
+        )
+        parser.add_argument("--dir", help="Archive directory (default: PARTITION_ARCHIVE_DIR).")
+        parser.add_argument("--dry-run", action="store_true", help="List the partitions that would be archived.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for label in options["model"] or sorted(PARTITIONED):
+            for name, rows, path in archive(
+                label, before=options["before"], directory=options["dir"], dry_run=options["dry_run"]
+            ):
+                if rows is None:
+                    self.stdout.write(f"Would archive {name} to {path}")
+                else:
+                    self.stdout.write(f"Archived {rows} rows of {name} to {path}")
+                total += 1
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} partitions."))
@@ -0,0 +1,104 @@
+import statistics
+import time
+from importlib import import_module
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+
+from alx_travel_app import authentication
+from listings.management.commands.loadtest_payments import percentile
+
+SESSION_ENGINES = {
+    "session (db)": "django.contrib.sessions.backends.db",
+    "session (cached_db)": "django.contrib.sessions.backends.cached_db",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the authentication cost of one request: database sessions, cached-db sessions and bearer "
+        "tokens (principal not cached, cached in CACHES['default'] only, cached in process)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per scheme (default: 2000).")
+        parser.add_argument("--username", default="bench-auth", help="User to authenticate as (created if missing).")
+
+    def handle(self, *args, **options):
+        user, created = User.objects.get_or_create(username=options["username"])
+        if created:
+            user.set_unusable_password()
+            user.save()
+        factory = RequestFactory()
+
+        schemes, stores = {}, []
+        for label, engine in SESSION_ENGINES.items():
+            store = self.login(user, import_module(engine).SessionStore)
+            stores.append(store)
+            schemes[label] = self.session_scheme(factory, store)
+        token = authentication.make_token(user)
+        schemes["bearer (no cache)"] = self.bearer_scheme(factory, user, token, local=False, shared=False)
+        schemes["bearer (shared cache)"] = self.bearer_scheme(factory, user, token, local=False, shared=True)
+        schemes["bearer (in process)"] = self.bearer_scheme(factory, user, token, local=True, shared=True)
+
+        self.stdout.write(f"{'scheme':<24} {'queries':>8} {'p50 us':>8} {'p95 us':>8} {'mean us':>8}")
+        for label, (prepare, authenticate) in schemes.items():
+            authenticate(prepare())  # warm up
+            timings, queries = [], 0
+            for _ in range(options["requests"]):
+                request = prepare()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    authenticated = authenticate(request)
+                    timings.append(time.perf_counter() - started)
+                queries += len(captured)
+                if authenticated.pk != user.pk:
+                    raise CommandError(f"{label} did not authenticate {user.username}.")
+            self.stdout.write(
+                f"{label:<24} {queries / len(timings):>8.2f} {percentile(timings, 50) * 1e6:>8.0f} "
+                f"{percentile(timings, 95) * 1e6:>8.0f} {statistics.fmean(timings) * 1e6:>8.0f}"
+            )
+        for store in stores:
+            store.delete()
+
+    def login(self, user, store_class):
+        store = store_class()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.create()
+        return store
+
+    def session_scheme(self, factory, store):
+        """
+        What SessionMiddleware and AuthenticationMiddleware do to resolve request.user.
+        """
+        def prepare():
+            request = factory.get("/api/users/")
+            request.session = store.__class__(store.session_key)
+            return request
+
+        return prepare, get_user
+
+    def bearer_scheme(self, factory, user, token, local, shared):
+        """
+        DRF authentication with a bearer token, dropping the cached principal
+        from the caches the scheme does without.
+        """
+        def prepare():
+            if not local:
+                authentication._local.pop(user.pk, None)
+            if not shared:
+                cache.delete(authentication.principal_key(user.pk))
+            return Request(factory.get("/api/users/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+
+        def authenticate(request):
+            return authentication.SignedTokenAuthentication().authenticate(request)[0]
+
+        return prepare, authenticate
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings.similarity import refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Build or refresh the similar-listings vector index now "
+        "(the refresh_similar_listings task does this every few minutes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Re-encode every listing and re-fit the feature scaling instead of refreshing changed listings.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        manifest = refresh(full=options["full"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published index {manifest['version']} with {manifest['count']} listings "
+                f"in {time.perf_counter() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from listings.blobs import acquire_blob
+from listings.images import delete_variants
+from listings.models import ImageBlob, ListingImage
+from listings.storage import content_addressed_name
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class Command(BaseCommand):
+    help = "Move legacy listing images to content-addressed storage, sharing one file per distinct image."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be deduplicated without touching files or rows.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        storage = ListingImage._meta.get_field("image").storage
+        legacy = (
+            ListingImage.objects.filter(blob__isnull=True)
+            .exclude(image="")
+            .order_by("image")
+            .values_list("image", flat=True)
+            .distinct()
+        )
+
+        moved = duplicates = missing = 0
+        reclaimed = 0
+        seen = set()
+        # One file at a time: only the digest set is held in memory.
+        for name in legacy.iterator(chunk_size=500):
+            path = storage.path(name)
+            if not os.path.exists(path):
+                missing += 1
+                self.stderr.write(f"Missing file: {name}")
+                continue
+            size = os.path.getsize(path)
+            digest = file_digest(path)
+            cas_name = content_addressed_name(digest, posixpath.splitext(name)[1])
+            duplicate = digest in seen or storage.exists(cas_name)
+            seen.add(digest)
+            if duplicate:
+                duplicates += 1
+                reclaimed += size
+            else:
+                moved += 1
+            if dry_run:
+                continue
+
+            if not duplicate:
+                os.makedirs(os.path.dirname(storage.path(cas_name)), exist_ok=True)
+                os.replace(path, storage.path(cas_name))
+            with transaction.atomic():
+                images = list(ListingImage.objects.select_for_update().filter(image=name))
+                acquire_blob(digest, cas_name, size, len(images))
+                ListingImage.objects.filter(pk__in=[image.pk for image in images]).update(
+                    image=cas_name, blob_id=digest, variants={}
+                )
+            if duplicate and os.path.exists(path):
+                os.remove(path)
+            for image in images:
+                delete_variants(name, storage, image.variants)
+
+        if not dry_run:
+            # Reconcile stored reference counts with the rows that exist.
+            counts = (
+                ListingImage.objects.filter(blob=OuterRef("pk"))
+                .order_by()
+                .values("blob")
+                .annotate(total=Count("pk"))
+                .values("total")
+            )
+            ImageBlob.objects.update(ref_count=Coalesce(Subquery(counts), 0))
+
+        verb = "Would move" if dry_run else "Moved"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {moved} files to content-addressed storage; {duplicates} duplicates "
+            f"({reclaimed / (1024 * 1024):.1f} MiB) {'would be ' if dry_run else ''}removed; {missing} missing."
+        ))
+        if not dry_run and (moved or duplicates):
+            self.stdout.write("Run `python manage.py generate_image_variants` to rebuild the shared variants.")
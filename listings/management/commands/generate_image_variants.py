@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from listings.images import render_variants
+from listings.models import ListingImage
+
+
+def _init_worker():
+    # Needed when the pool spawns rather than forks its workers.
+    django.setup()
+
+
+def _render(source_name):
+    try:
+        return source_name, render_variants(source_name), None
+    except Exception as e:
+        return source_name, None, str(e)
+
+
+class Command(BaseCommand):
+    help = "Backfill resized WebP/JPEG variants for existing listing images, in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes used to resize images (default: number of CPUs).",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Regenerate variants for every image, not just those missing them.",
+        )
+
+    def handle(self, *args, **options):
+        queryset = ListingImage.objects.exclude(image="").order_by("pk")
+        # Images sharing a content-addressed file are rendered once.
+        pending = {
+            name
+            for name, variants in queryset.values_list("image", "variants").iterator()
+            if options["all"] or (variants or {}).get("source") != name
+        }
+        if not pending:
+            self.stdout.write(self.style.SUCCESS("All listing images already have variants."))
+            return
+
+        self.stdout.write(f"Generating variants for {len(pending)} images with {options['workers']} workers...")
+        # Forked workers must not inherit open database connections.
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_worker) as pool:
+            futures = [pool.submit(_render, name) for name in pending]
+            for future in as_completed(futures):
+                name, variants, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                    continue
+                ListingImage.objects.filter(image=name).update(variants=variants)
+                done += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Backfill complete. {done} generated, {failed} failed."))
@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from alx_travel_app.schema import write_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema once and write it (plus a gzipped copy) for /api/schema/ to serve."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Where to write the schema (default: settings.OPENAPI_SCHEMA_PATH).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"] or settings.OPENAPI_SCHEMA_PATH
+        start = time.perf_counter()
+        size = write_schema(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {path} ({size / 1024:.1f} KiB) in {time.perf_counter() - start:.2f}s."
+        ))
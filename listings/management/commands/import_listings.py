@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.importers import ListingImporter, detect_format
+from listings.models import ListingImportJob
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSONL file of listings into the database, upserting on external_id."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to a .csv or .jsonl file.")
+        parser.add_argument(
+            "--format",
+            choices=[ListingImportJob.FORMAT_CSV, ListingImportJob.FORMAT_JSONL],
+            help="File format (detected from the extension by default).",
+        )
+        parser.add_argument("--host", help="Username or id of the host for rows without a host column.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows validated and upserted per transaction.")
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint file; the import resumes after the row it records and updates it after every chunk.",
+        )
+        parser.add_argument("--errors", help="Write per-row errors to this JSONL file.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.is_file():
+            raise CommandError(f"{path} does not exist.")
+        fmt = options["format"] or detect_format(path.name)
+        host_id = self.resolve_host(options["host"]) if options["host"] else None
+
+        checkpoint_path = Path(options["checkpoint"]) if options["checkpoint"] else None
+        start_after = 0
+        if checkpoint_path and checkpoint_path.exists():
+            state = json.loads(checkpoint_path.read_text())
+            if state.get("source") == str(path.resolve()):
+                start_after = state.get("row", 0)
+                self.stdout.write(self.style.WARNING(f"Resuming after row {start_after}..."))
+
+        errors_file = open(options["errors"], "a") if options["errors"] else None
+        totals = {"imported": 0, "failed": 0}
+
+        def checkpoint(row_number, imported, errors):
+            totals["imported"] += imported
+            totals["failed"] += len(errors)
+            if errors_file:
+                for error in errors:
+                    errors_file.write(json.dumps(error) + "\n")
+                errors_file.flush()
+            elif errors:
+                for error in errors:
+                    self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+            if checkpoint_path:
+                checkpoint_path.write_text(json.dumps({"source": str(path.resolve()), "row": row_number}))
+            self.stdout.write(f"Row {row_number}: {totals['imported']} imported, {totals['failed']} failed")
+
+        try:
+            with path.open("rb") as fileobj:
+                ListingImporter(
+                    fileobj,
+                    fmt,
+                    default_host_id=host_id,
+                    chunk_size=options["chunk_size"],
+                    start_after=start_after,
+                    on_checkpoint=checkpoint,
+                ).run()
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Import complete. {totals['imported']} imported, {totals['failed']} failed.")
+        )
+
+    def resolve_host(self, value):
+        lookup = {"pk": value} if value.isdigit() else {"username": value}
+        try:
+            return User.objects.only("pk").get(**lookup).pk
+        except User.DoesNotExist:
+            raise CommandError(f"Host '{value}' does not exist.")
@@ -0,0 +1,187 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.models import Listing, Payment
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive booking -> payment initiation -> confirmation end to end against a running server "
+        "(with CHAPA_BASE_URL pointing at run_chapa_simulator) and report throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000", help="Server under test.")
+        parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users (default: 10).")
+        parser.add_argument("--flows", type=int, default=200, help="Booking-to-payment flows to run (default: 200).")
+        parser.add_argument(
+            "--confirm",
+            choices=["verify", "webhook", "none"],
+            default="verify",
+            help="How each payment is confirmed: call /api/payments/verify/, wait for the simulator's "
+            "webhook to mark it completed, or stop after initiation (default: verify).",
+        )
+        parser.add_argument("--webhook-timeout", type=float, default=30.0, help="Seconds to wait for a webhook.")
+        parser.add_argument("--listing", type=int, help="Listing to book (default: create a load-test listing).")
+        parser.add_argument("--guest", type=int, help="Guest user ID (default: create a load-test user).")
+        parser.add_argument("--timeout", type=float, default=60.0, help="HTTP timeout per request.")
+
+    def handle(self, *args, **options):
+        import requests
+
+        from django.db import connection
+
+        listing, guest = self.fixtures(options)
+        connection.close()
+        base_url = options["base_url"].rstrip("/")
+        local = threading.local()
+        lock = threading.Lock()
+        latencies = {"booking": [], "confirm": [], "flow": []}
+        outcomes = Counter()
+
+        def record(step, seconds=None, outcome=None):
+            with lock:
+                if seconds is not None:
+                    latencies[step].append(seconds)
+                if outcome:
+                    outcomes[outcome] += 1
+
+        def flow(n):
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            start_date = date.today() + timedelta(days=random.randint(30, 3000))
+            body = {
+                "listing": listing.pk,
+                "guest": guest.pk,
+                "guests": 1,
+                "start_date": start_date.isoformat(),
+                "end_date": (start_date + timedelta(days=2)).isoformat(),
+                "total_price": "200.00",
+                "email": guest.email,
+            }
+            started = time.perf_counter()
+            try:
+                response = session.post(
+                    f"{base_url}/api/bookings/",
+                    json=body,
+                    headers={"Idempotency-Key": str(uuid.uuid4())},
+                    timeout=options["timeout"],
+                )
+            except requests.RequestException as e:
+                record("booking", outcome=f"booking error: {type(e).__name__}")
+                return
+            record("booking", time.perf_counter() - started, f"booking {response.status_code}")
+            if response.status_code != 201:
+                return
+            initiation = response.json().get("payment_initiation", {})
+            record("booking", outcome=f"initiation {initiation.get('status')}")
+            if initiation.get("status") != "success":
+                return
+            if options["confirm"] == "none":
+                record("flow", time.perf_counter() - started, "flow completed")
+                return
+
+            confirm_started = time.perf_counter()
+            tx_ref = initiation["tx_ref"]
+            if options["confirm"] == "verify":
+                try:
+                    response = session.get(
+                        f"{base_url}/api/payments/verify/", params={"tx_ref": tx_ref}, timeout=options["timeout"]
+                    )
+                except requests.RequestException as e:
+                    record("confirm", outcome=f"verify error: {type(e).__name__}")
+                    return
+                record("confirm", time.perf_counter() - confirm_started, f"verify {response.status_code}")
+                if response.status_code != 200:
+                    return
+            else:
+                deadline = confirm_started + options["webhook_timeout"]
+                while True:
+                    completed = Payment.objects.filter(tx_ref=tx_ref, status=Payment.STATUS_COMPLETED).exists()
+                    # Hand the connection back between polls so waiting users don't starve the pool.
+                    connection.close()
+                    if completed:
+                        break
+                    if time.perf_counter() > deadline:
+                        record("confirm", outcome="webhook timed out")
+                        return
+                    time.sleep(0.05)
+                record("confirm", time.perf_counter() - confirm_started, "webhook completed")
+            record("flow", time.perf_counter() - started, "flow completed")
+
+        def run(n):
+            try:
+                flow(n)
+            finally:
+                connection.close()
+
+        self.stdout.write(
+            f"Running {options['flows']} flows with {options['users']} users against {base_url} "
+            f"(confirm: {options['confirm']})"
+        )
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["users"]) as pool:
+            list(pool.map(run, range(options["flows"])))
+        wall = time.perf_counter() - wall_started
+
+        completed = len(latencies["flow"])
+        self.stdout.write(f"\n{completed}/{options['flows']} flows completed in {wall:.1f}s: {completed / wall:.1f} flows/s")
+        self.stdout.write(f"{'step':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        for step, values in latencies.items():
+            if values:
+                self.stdout.write(
+                    f"{step:<10} {len(values):>6} {percentile(values, 50) * 1000:>8.0f} "
+                    f"{percentile(values, 95) * 1000:>8.0f} {percentile(values, 99) * 1000:>8.0f} "
+                    f"{statistics.fmean(values) * 1000:>8.0f}"
+                )
+        self.stdout.write("\nOutcomes:")
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f"  {outcome}: {count}")
+
+    def fixtures(self, options):
+        if options["guest"]:
+            guest = User.objects.filter(pk=options["guest"]).first()
+            if guest is None:
+                raise CommandError(f"User {options['guest']} does not exist.")
+        else:
+            guest, _ = User.objects.get_or_create(
+                username="loadtest-guest", defaults={"email": "loadtest-guest@example.com"}
+            )
+        if not guest.email:
+            raise CommandError(f"User {guest.pk} has no email; Chapa initialization needs one.")
+        if options["listing"]:
+            listing = Listing.objects.filter(pk=options["listing"]).first()
+            if listing is None:
+                raise CommandError(f"Listing {options['listing']} does not exist.")
+        else:
+            host, _ = User.objects.get_or_create(username="loadtest-host", defaults={"email": "loadtest-host@example.com"})
+            listing, _ = Listing.objects.get_or_create(
+                title="Load test listing",
+                host=host,
+                defaults={
+                    "description": "Created by manage.py loadtest_payments.",
+                    "price": 100,
+                    "property_type": "apartment",
+                    "bedrooms": 1,
+                    "bathrooms": 1,
+                    "location": "Addis Ababa",
+                },
+            )
+        return listing, guest
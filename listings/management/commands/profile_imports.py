@@ -0,0 +1,90 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# What a process does before it can serve: the web worker sets Django up and
+# loads the URLconf (importing every view); the Celery worker loads its app
+# and the task modules.
+BOOT_SCRIPTS = {
+    "web": (
+        "import time; t = time.perf_counter()\n"
+        "from django.core.wsgi import get_wsgi_application\n"
+        "get_wsgi_application()\n"
+        "from django.urls import get_resolver; get_resolver().url_patterns\n"
+        "print(f'BOOT_MS {1000 * (time.perf_counter() - t):.1f}')\n"
+    ),
+    "celery": (
+        "import time; t = time.perf_counter()\n"
+        "from alx_travel_app.celery import app\n"
+        "app.loader.import_default_modules()\n"
+        "print(f'BOOT_MS {1000 * (time.perf_counter() - t):.1f}')\n"
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``python -X importtime`` output into (module, self_us, cumulative_us, depth) rows.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Profile process start-up: total boot time and import time per module (python -X importtime)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=sorted(BOOT_SCRIPTS), default="web", help="Which process to boot.")
+        parser.add_argument("--top", type=int, default=30, help="Modules to list (default: 30).")
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Rank modules by time including (cumulative) or excluding (self) their imports.",
+        )
+        parser.add_argument(
+            "--top-level",
+            action="store_true",
+            help="Only list modules imported directly by the boot code, not their dependencies.",
+        )
+        parser.add_argument("--runs", type=int, default=5, help="Boots to time; the median is reported.")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "alx_travel_app.settings")}
+        script = BOOT_SCRIPTS[options["target"]]
+        cwd = str(settings.BASE_DIR)
+
+        boot_ms = []
+        for _ in range(max(options["runs"], 1)):
+            result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, cwd=cwd)
+            if result.returncode:
+                raise CommandError(f"Boot failed:\n{result.stderr}")
+            boot_ms.append(float(result.stdout.rsplit("BOOT_MS", 1)[1]))
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script], capture_output=True, text=True, env=env, cwd=cwd
+        )
+        rows = parse_importtime(result.stderr)
+        if options["top_level"]:
+            rows = [row for row in rows if row[3] == 0]
+        key = 1 if options["sort"] == "self" else 2
+        rows.sort(key=lambda row: row[key], reverse=True)
+
+        self.stdout.write(
+            f"{options['target']} boot: median {statistics.median(boot_ms):.0f} ms over {len(boot_ms)} runs "
+            f"(min {min(boot_ms):.0f}, max {max(boot_ms):.0f})"
+        )
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for name, self_us, cumulative_us, depth in rows[:options["top"]]:
+            self.stdout.write(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
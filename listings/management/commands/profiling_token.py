@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from alx_travel_app.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = "Issue a profiling token for a staff user (send it as the X-Profile header to profile one request)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Staff user the token is issued to.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+        if not (user.is_staff and user.is_active):
+            raise CommandError(f"User '{user.username}' is not an active staff member.")
+        self.stdout.write(make_token(user))
+        self.stderr.write(f"Valid for {settings.PROFILING_TOKEN_MAX_AGE} seconds.")
@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from listings.models import Booking, ListingDailyStat
+from listings.rollups import refresh_listing_stats
+
+
+def _init_worker():
+    # Needed when the pool spawns rather than forks its workers.
+    django.setup()
+
+
+def _refresh(listing_ids, start, end):
+    rows = 0
+    for listing_id in listing_ids:
+        rows += refresh_listing_stats(listing_id, start, end)
+    connections.close_all()
+    return len(listing_ids), rows
+
+
+class Command(BaseCommand):
+    help = "Recompute host analytics rollups for a date range, in parallel across listings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", required=True, help="First night, YYYY-MM-DD.")
+        parser.add_argument("--to", dest="end", required=True, help="Last night, YYYY-MM-DD.")
+        parser.add_argument("--listing", type=int, action="append", help="Only rebuild these listing ids.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: number of CPUs).",
+        )
+        parser.add_argument("--batch-size", type=int, default=200, help="Listings per worker task.")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"])
+            end = date.fromisoformat(options["end"])
+        except ValueError:
+            raise CommandError("--from and --to must be dates formatted as YYYY-MM-DD.")
+        if start > end:
+            raise CommandError("--from must not be after --to.")
+
+        if options["listing"]:
+            listing_ids = sorted(set(options["listing"]))
+        else:
+            # Listings without bookings in the range may still have stale rows.
+            listing_ids = sorted(
+                set(Booking.objects.filter(start_date__lte=end, end_date__gt=start).values_list("listing_id", flat=True))
+                | set(ListingDailyStat.objects.filter(date__range=(start, end)).values_list("listing_id", flat=True))
+            )
+        if not listing_ids:
+            self.stdout.write(self.style.SUCCESS("Nothing to rebuild."))
+            return
+
+        batch_size = options["batch_size"]
+        batches = [listing_ids[i:i + batch_size] for i in range(0, len(listing_ids), batch_size)]
+        self.stdout.write(
+            f"Rebuilding rollups {start}..{end} for {len(listing_ids)} listings with {options['workers']} workers..."
+        )
+        # Forked workers must open their own database connections.
+        connections.close_all()
+
+        listings_done = rows = 0
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_worker) as pool:
+            futures = [pool.submit(_refresh, batch, start, end) for batch in batches]
+            for future in as_completed(futures):
+                done, written = future.result()
+                listings_done += done
+                rows += written
+                self.stdout.write(f"{listings_done}/{len(listing_ids)} listings")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuild complete. {rows} daily rows written."))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings.popularity import recompute
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every listing's popularity score from its bookings and reviews now "
+        "(the recompute_popularity task does this every few hours)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Listing ids per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = recompute(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated {updated} popularity scores in {time.perf_counter() - started:.1f}s.")
+        )
@@ -0,0 +1,69 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from listings.outbox import purge_published, relay_batch, update_lag_metrics
+
+
+class Command(BaseCommand):
+    help = "Publish pending outbox messages to the Celery broker (runs until stopped)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Messages per transaction (default: 100).")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to sleep when the outbox is drained or the broker is down (default: 0.5).",
+        )
+        parser.add_argument("--once", action="store_true", help="Drain the outbox once and exit.")
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=7,
+            help="Delete published messages older than this (default: 7).",
+        )
+        parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port.")
+
+    def handle(self, *args, **options):
+        if options["metrics_port"]:
+            from prometheus_client import start_http_server
+
+            start_http_server(options["metrics_port"])
+
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        batch_size = options["batch_size"]
+        retention = timedelta(days=options["retention_days"])
+        last_metrics = last_purge = float("-inf")
+        total = 0
+        while not stopping:
+            close_old_connections()
+            published, failed = relay_batch(batch_size)
+            total += published
+
+            now = time.monotonic()
+            if now - last_metrics >= 5:
+                update_lag_metrics()
+                last_metrics = now
+            if now - last_purge >= 3600:
+                purge_published(retention)
+                last_purge = now
+
+            if options["once"] and (failed or published < batch_size):
+                break
+            if failed or published < batch_size:
+                time.sleep(options["interval"])
+
+        update_lag_metrics()
+        self.stdout.write(f"Published {total} outbox messages.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.partitions import restore
+
+
+class Command(BaseCommand):
+    help = "Load a partition archive written by archive_partitions back into the database and re-attach it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="Path to a <partition>.jsonl.gz file.")
+
+    def handle(self, *args, **options):
+        try:
+            name, rows = restore(options["archive"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Restored {rows} rows into {name}."))
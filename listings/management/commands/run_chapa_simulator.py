@@ -0,0 +1,75 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.chapa_simulator import SimulatorConfig, make_server, parse_distribution
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local Chapa API stand-in with latency, error and timeout injection. "
+        "Point the app at it with CHAPA_BASE_URL=http://<host>:<port>/v1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument(
+            "--latency",
+            default="fixed:0",
+            help="Response latency in ms: fixed:MS, uniform:LOW,HIGH, normal:MEAN,STDDEV, "
+            "exponential:MEAN or lognormal:MEDIAN,SIGMA (default: fixed:0).",
+        )
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with a 502.")
+        parser.add_argument(
+            "--timeout-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of calls that hang for --timeout-seconds and then drop the connection.",
+        )
+        parser.add_argument("--timeout-seconds", type=float, default=30.0)
+        parser.add_argument(
+            "--decline-rate", type=float, default=0.0, help="Fraction of initializations rejected with status=failed."
+        )
+        parser.add_argument(
+            "--webhook-url",
+            default="",
+            help="POST a success webhook here after each initialization, "
+            "e.g. http://localhost:8000/api/payments/chapa/webhook/.",
+        )
+        parser.add_argument("--webhook-delay", default="fixed:500", help="Webhook delay in ms (same syntax as --latency).")
+        parser.add_argument("--public-url", help="Base URL used in checkout links (default: http://<host>:<port>).")
+        parser.add_argument("--seed", type=int, help="Seed the random faults for a reproducible run.")
+
+    def handle(self, *args, **options):
+        for spec in (options["latency"], options["webhook_delay"]):
+            try:
+                parse_distribution(spec)
+            except ValueError as e:
+                raise CommandError(str(e))
+        if options["error_rate"] + options["timeout_rate"] > 1:
+            raise CommandError("--error-rate plus --timeout-rate cannot exceed 1.")
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+
+        config = SimulatorConfig(
+            latency=options["latency"],
+            error_rate=options["error_rate"],
+            timeout_rate=options["timeout_rate"],
+            timeout_seconds=options["timeout_seconds"],
+            decline_rate=options["decline_rate"],
+            webhook_url=options["webhook_url"],
+            webhook_delay=options["webhook_delay"],
+            public_url=options["public_url"] or f"http://{options['host']}:{options['port']}",
+        )
+        server, simulator = make_server(options["host"], options["port"], config)
+        self.stdout.write(f"Chapa simulator listening on http://{options['host']}:{options['port']}/v1")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {len(simulator.transactions)} transactions.")
+            for name, count in sorted(simulator.stats.items()):
+                self.stdout.write(f"  {name}: {count}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_listing_external_id_listingimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
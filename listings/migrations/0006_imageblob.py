@@ -0,0 +1,44 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:46
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import listings.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_listingimage_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listingimage',
+            name='image',
+            field=models.ImageField(storage=listings.storage.listing_image_storage, upload_to='listing_images/'),
+        ),
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('phash', models.BigIntegerField(blank=True, null=True)),
+                ('phash_bands', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, null=True, size=4)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('near_duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='listings.imageblob')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='images', to='listings.imageblob'),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phash_bands'], name='imageblob_phash_bands_gin'),
+        ),
+    ]
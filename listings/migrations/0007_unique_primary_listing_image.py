@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:48
+
+from django.db import migrations, models
+
+
+def demote_extra_primary_images(apps, schema_editor):
+    """
+    Keep only the oldest primary image per listing before the constraint lands.
+    """
+    ListingImage = apps.get_model('listings', 'ListingImage')
+    keep = (
+        ListingImage.objects.filter(is_primary=True)
+        .order_by('listing_id', 'id')
+        .distinct('listing_id')
+        .values('id')
+    )
+    ListingImage.objects.filter(is_primary=True).exclude(id__in=keep).update(is_primary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_imageblob'),
+    ]
+
+    operations = [
+        migrations.RunPython(demote_extra_primary_images, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='listingimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_primary', True)), fields=('listing',), name='unique_primary_image_per_listing'),
+        ),
+    ]
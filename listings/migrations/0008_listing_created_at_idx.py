@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_unique_primary_listing_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['-created_at'], name='listing_created_at_idx'),
+        ),
+    ]
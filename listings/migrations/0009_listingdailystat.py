@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:50
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_listing_created_at_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked_nights', models.PositiveSmallIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listing_daily_stats', to=settings.AUTH_USER_MODEL)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='listings.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['host', 'date'], name='listings_li_host_id_e15e49_idx')],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'date'), name='unique_listing_daily_stat')],
+            },
+        ),
+    ]
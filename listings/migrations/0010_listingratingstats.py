@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Review = apps.get_model('listings', 'Review')
+    ListingRatingStats = apps.get_model('listings', 'ListingRatingStats')
+    stats = {}
+    counts = Review.objects.order_by().values('listing_id', 'rating').annotate(n=models.Count('id'))
+    for row in counts.iterator():
+        stats.setdefault(row['listing_id'], {})[f"stars_{row['rating']}"] = row['n']
+    ListingRatingStats.objects.bulk_create(
+        [ListingRatingStats(listing_id=listing_id, **columns) for listing_id, columns in stats.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_listingdailystat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingRatingStats',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='listings.listing')),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['listing', '-created_at', '-id'], name='review_listing_keyset_idx'),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:56
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Bookings and payments are large: build the indexes without locking out writes.
+    atomic = False
+
+    dependencies = [
+        ('listings', '0010_listingratingstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['-created_at'], name='booking_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['status', '-created_at'], name='booking_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['-created_at'], name='payment_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['status', '-created_at'], name='payment_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.9 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+# Statement-level triggers with transition tables: a bulk import or a bulk
+# admin action costs one INSERT ... SELECT into the log, not one per row.
+# Updates that change nothing are not logged.
+LOG_FUNCTION = """
+CREATE FUNCTION listings_log_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'created', clock_timestamp()
+        FROM new_rows n;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'updated', clock_timestamp()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE o IS DISTINCT FROM n;
+    ELSE
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], o.id, 'deleted', clock_timestamp()
+        FROM old_rows o;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS = """
+CREATE TRIGGER {table}_log_insert AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION listings_log_changes('{model}');
+CREATE TRIGGER {table}_log_update AFTER UPDATE ON {table}
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION listings_log_changes('{model}');
+CREATE TRIGGER {table}_log_delete AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION listings_log_changes('{model}');
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS {table}_log_insert ON {table};
+DROP TRIGGER IF EXISTS {table}_log_update ON {table};
+DROP TRIGGER IF EXISTS {table}_log_delete ON {table};
+"""
+
+LOGGED_TABLES = [
+    ('listings_listing', 'listing'),
+    ('listings_booking', 'booking'),
+    ('listings_payment', 'payment'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.BigIntegerField()),
+                ('model', models.CharField(max_length=32)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=8)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['txid', 'id'], name='changelog_position_idx'), models.Index(fields=['changed_at'], name='changelog_changed_at_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            [LOG_FUNCTION] + [TRIGGERS.format(table=table, model=model) for table, model in LOGGED_TABLES],
+            [DROP_TRIGGERS.format(table=table) for table, model in LOGGED_TABLES]
+            + ["DROP FUNCTION IF EXISTS listings_log_changes();"],
+        ),
+    ]
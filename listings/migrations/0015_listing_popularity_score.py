@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-19 08:47
+
+import listings.popularity
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_changelogentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='popularity_score',
+            field=models.FloatField(default=listings.popularity.initial_score),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['-popularity_score', '-id'], name='listing_popularity_idx'),
+        ),
+    ]
@@ -0,0 +1,262 @@
+# Generated by Django 5.2.9 on 2026-10-19 09:05
+"""
+Monthly range partitions for bookings (by start_date) and payments (by
+created_at), converted online.
+
+Postgres cannot partition a table in place. Each table is copied into a new
+partitioned table while the application keeps writing to the old one:
+
+1. create the partitioned table with one partition per month that has data
+   (and MONTHS_AHEAD more) plus a default partition, and a row trigger on
+   the old table that records the id of every row written from then on;
+2. copy the rows COPY_BATCH ids at a time, each batch its own transaction;
+3. in one short transaction that blocks writes to the old table (reads go
+   on), re-copy the recorded ids, move the id sequence over, swap the names,
+   put the change log triggers (0014) on the new table and drop the old one.
+
+Partitioned tables only enforce primary keys and unique constraints that
+include the partition key, so the primary keys become (id, start_date) and
+(id, created_at). Ids still come from one sequence per table, and the models
+keep ``id`` as their primary key. ``payment.tx_ref`` keeps a plain index (0017
+makes it unique again), and ``payment.booking_id`` is no longer a database
+foreign key: Django's on_delete still removes a booking's payments.
+
+Migrating back to 0015 copies each table into a plain one again, holding a
+lock that blocks writes (not reads) for the whole copy. Only attached months
+come back: restore archived months first (listings/partitions.py), or they
+stay in their archives.
+"""
+import re
+from datetime import date, datetime
+
+from django.db import migrations, models, transaction
+
+COPY_BATCH = 50000
+MONTHS_AHEAD = 24
+LOCK_TIMEOUT = '10s'
+
+# Payments first: their foreign key to the old bookings table goes with them.
+PARTITIONED = [
+    ('listings_payment', 'created_at', 'payment'),
+    ('listings_booking', 'start_date', 'booking'),
+]
+
+INDEX_DEF = re.compile(r'^CREATE (UNIQUE )?INDEX (\S+) ON (?:ONLY )?\S+ (USING .*)$')
+
+LOG_TRIGGERS = """
+CREATE TRIGGER {table}_log_insert AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION listings_log_changes('{model}');
+CREATE TRIGGER {table}_log_update AFTER UPDATE ON {table}
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION listings_log_changes('{model}');
+CREATE TRIGGER {table}_log_delete AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION listings_log_changes('{model}');
+"""
+
+RECORD_FUNCTION = """
+CREATE OR REPLACE FUNCTION listings_partition_record() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format('INSERT INTO %I (id) VALUES ($1) ON CONFLICT DO NOTHING', TG_ARGV[0])
+    USING CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END;
+    RETURN NULL;
+END
+$$;
+"""
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_of(value):
+    return (value.date() if isinstance(value, datetime) else value).replace(day=1)
+
+
+def bound(month, key):
+    # Timestamps are partitioned on UTC month boundaries.
+    return f"'{month.isoformat()} 00:00:00+00'" if key == 'created_at' else f"'{month.isoformat()}'"
+
+
+def partition_table(cursor, schema_editor, table, key, model):
+    new, changed = f'{table}_partitioned', f'{table}_changed'
+    seq = f'{table}_id_partitioned_seq'
+
+    # Leftovers of an earlier attempt that failed before the swap.
+    cursor.execute(f'DROP TRIGGER IF EXISTS {table}_partition_record ON {table}')
+    cursor.execute(f'DROP TABLE IF EXISTS {new}, {changed}')
+    cursor.execute(f'DROP SEQUENCE IF EXISTS {seq}')
+
+    # 1. The partitioned table, its partitions and the write recorder.
+    cursor.execute(f'SELECT min({key}), max({key}), now() FROM {table}')
+    low, high, now = cursor.fetchone()
+    first = last = month_of(now)
+    if low is not None:
+        first, last = min(first, month_of(low)), max(last, month_of(high))
+    last = max(last, add_months(month_of(now), MONTHS_AHEAD))
+
+    # Unique indexes (the primary key, tx_ref) cannot carry over as they are.
+    cursor.execute('SELECT indexdef FROM pg_indexes WHERE tablename = %s', [table])
+    indexes = [
+        (name, definition)
+        for unique, name, definition in (INDEX_DEF.match(row[0]).groups() for row in cursor.fetchall())
+        if not unique
+    ]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f' AND confrelid <> ALL(%s::regclass[])",
+        [table, [name for name, _, _ in PARTITIONED]],
+    )
+    foreign_keys = cursor.fetchall()
+
+    with transaction.atomic(using=schema_editor.connection.alias):
+        cursor.execute(f'CREATE SEQUENCE {seq}')
+        cursor.execute(
+            f'CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ({key})'
+        )
+        cursor.execute(f"ALTER TABLE {new} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+        cursor.execute(f'ALTER TABLE {new} ADD CONSTRAINT {new}_pkey PRIMARY KEY (id, {key})')
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {new} ADD CONSTRAINT {name} {definition}')
+        month = first
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {new} '
+                f'FOR VALUES FROM ({bound(month, key)}) TO ({bound(add_months(month, 1), key)})'
+            )
+            month = add_months(month, 1)
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {new} DEFAULT')
+        cursor.execute(f'CREATE UNLOGGED TABLE {changed} (id bigint PRIMARY KEY)')
+        cursor.execute(RECORD_FUNCTION)
+        cursor.execute(
+            f'CREATE TRIGGER {table}_partition_record AFTER INSERT OR UPDATE OR DELETE ON {table} '
+            f"FOR EACH ROW EXECUTE FUNCTION listings_partition_record('{changed}')"
+        )
+
+    # 2. Copy in batches. Rows written meanwhile are recorded and re-copied.
+    cursor.execute(f'SELECT min(id), max(id) FROM {table}')
+    low_id, high_id = cursor.fetchone()
+    if low_id is not None:
+        for start in range(low_id, high_id + 1, COPY_BATCH):
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute(
+                    f'INSERT INTO {new} SELECT * FROM {table} WHERE id >= %s AND id < %s',
+                    [start, start + COPY_BATCH],
+                )
+
+    # The indexes are cheaper to build once than to maintain while copying.
+    for name, definition in indexes:
+        cursor.execute(f'CREATE INDEX {name}_p ON {new} {definition}')
+
+    # 3. Catch up and swap.
+    with transaction.atomic(using=schema_editor.connection.alias):
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        cursor.execute(f'DELETE FROM {new} WHERE id IN (SELECT id FROM {changed})')
+        cursor.execute(f'INSERT INTO {new} SELECT * FROM {table} WHERE id IN (SELECT id FROM {changed})')
+        cursor.execute(
+            f"SELECT GREATEST((SELECT max(id) FROM {table}), (SELECT last_value FROM pg_sequences "
+            f"WHERE schemaname || '.' || sequencename = pg_get_serial_sequence(%s, 'id')))",
+            [table],
+        )
+        (last_id,) = cursor.fetchone()
+        if last_id is not None:
+            cursor.execute('SELECT setval(%s, %s)', [seq, last_id])
+        cursor.execute(f'DROP TABLE {table}, {changed}')
+        cursor.execute(f'ALTER TABLE {new} RENAME TO {table}')
+        cursor.execute(f'ALTER TABLE {table} RENAME CONSTRAINT {new}_pkey TO {table}_pkey')
+        cursor.execute(f'ALTER SEQUENCE {seq} RENAME TO {table}_id_seq')
+        cursor.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {name}_p RENAME TO {name}')
+        cursor.execute(LOG_TRIGGERS.format(table=table, model=model))
+
+
+def unpartition_table(cursor, schema_editor, table, model):
+    plain = f'{table}_plain'
+    cursor.execute(f'DROP TABLE IF EXISTS {plain}')
+
+    cursor.execute('SELECT indexdef FROM pg_indexes WHERE tablename = %s', [table])
+    tx_ref_index = schema_editor._create_index_name('listings_payment', ['tx_ref'])
+    indexes = [
+        (name, definition)
+        for unique, name, definition in (INDEX_DEF.match(row[0]).groups() for row in cursor.fetchall())
+        if not unique and name != tx_ref_index
+    ]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+
+    with transaction.atomic(using=schema_editor.connection.alias):
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        cursor.execute(f'CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(f'INSERT INTO {plain} SELECT * FROM {table}')
+        cursor.execute(f'ALTER TABLE {plain} ADD CONSTRAINT {plain}_pkey PRIMARY KEY (id)')
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {plain} ADD CONSTRAINT {name} {definition}')
+        for name, definition in indexes:
+            cursor.execute(f'CREATE INDEX {name}_p ON {plain} {definition}')
+        # Keep the sequence (and the ids it has handed out) when the table goes.
+        cursor.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {plain}.id')
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {plain} RENAME TO {table}')
+        cursor.execute(f'ALTER TABLE {table} RENAME CONSTRAINT {plain}_pkey TO {table}_pkey')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {name}_p RENAME TO {name}')
+        cursor.execute(LOG_TRIGGERS.format(table=table, model=model))
+
+
+def unpartition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table, _, model in reversed(PARTITIONED):
+            unpartition_table(cursor, schema_editor, table, model)
+        # The unique tx_ref and the foreign key to bookings, as 0015 had them.
+        Payment = apps.get_model('listings', 'Payment')
+        cursor.execute('ALTER TABLE listings_payment ADD CONSTRAINT listings_payment_tx_ref_key UNIQUE (tx_ref)')
+        schema_editor.execute(
+            schema_editor._create_fk_sql(Payment, Payment._meta.get_field('booking'), '_fk_%(to_table)s_%(to_column)s')
+        )
+
+
+def partition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table, key, model in PARTITIONED:
+            partition_table(cursor, schema_editor, table, key, model)
+        cursor.execute('DROP FUNCTION listings_partition_record()')
+        # What AlterField(tx_ref, unique=False, db_index=True) would have built.
+        name = schema_editor._create_index_name('listings_payment', ['tx_ref'])
+        cursor.execute(f'CREATE INDEX {name} ON listings_payment (tx_ref)')
+
+
+class Migration(migrations.Migration):
+    # Each step commits on its own so no transaction locks a table for the whole copy.
+    atomic = False
+
+    dependencies = [
+        ('listings', '0015_listing_popularity_score'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_tables, unpartition_tables, elidable=False),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='payment',
+                    name='booking',
+                    field=models.ForeignKey(db_constraint=False, on_delete=models.deletion.CASCADE, related_name='payments', to='listings.booking'),
+                ),
+                migrations.AlterField(
+                    model_name='payment',
+                    name='tx_ref',
+                    field=models.CharField(db_index=True, max_length=128),
+                ),
+            ],
+        ),
+    ]
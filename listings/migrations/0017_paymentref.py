@@ -0,0 +1,113 @@
+# Generated by Django 5.2.9 on 2026-10-19 11:40
+"""
+Unique payment references again.
+
+The payments table is partitioned (0016) and can only enforce uniqueness
+together with created_at. A row trigger now records every tx_ref in the
+unpartitioned ``listings_paymentref`` table, in the same transaction as the
+payment, and raises a unique violation when the reference already belongs to
+another payment. The existing references are copied after the trigger is in
+place, outside any transaction that would block payment writes.
+
+A payment moved between partitions (an update of created_at, or rows moved
+by listings/partitions.py) keeps its reference.
+"""
+from django.db import migrations, models, transaction
+
+RESERVE_FUNCTION = """
+CREATE OR REPLACE FUNCTION listings_reserve_tx_ref() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.tx_ref = NEW.tx_ref THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO listings_paymentref (tx_ref, payment_id) VALUES (NEW.tx_ref, NEW.id)
+    ON CONFLICT (tx_ref) DO NOTHING;
+    IF NOT FOUND AND NOT EXISTS (
+        SELECT 1 FROM listings_paymentref WHERE tx_ref = NEW.tx_ref AND payment_id = NEW.id
+    ) THEN
+        RAISE EXCEPTION USING
+            ERRCODE = 'unique_violation',
+            MESSAGE = 'duplicate key value violates unique constraint "listings_paymentref_pkey"',
+            DETAIL = format('Key (tx_ref)=(%s) already exists.', NEW.tx_ref);
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM listings_paymentref WHERE tx_ref = OLD.tx_ref AND payment_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGER = """
+CREATE TRIGGER listings_payment_reserve_tx_ref AFTER INSERT OR UPDATE OF tx_ref ON listings_payment
+    FOR EACH ROW EXECUTE FUNCTION listings_reserve_tx_ref();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS listings_payment_reserve_tx_ref ON listings_payment;
+DROP FUNCTION IF EXISTS listings_reserve_tx_ref();
+"""
+
+
+def duplicates(cursor):
+    cursor.execute(
+        "SELECT tx_ref FROM listings_payment GROUP BY tx_ref HAVING count(*) > 1 ORDER BY tx_ref LIMIT 10"
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def check_unique(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        taken = duplicates(cursor)
+    if taken:
+        raise RuntimeError(f"Several payments share these tx_refs; make them unique and migrate again: {taken}")
+
+
+def reserve_tx_refs(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            cursor.execute(RESERVE_FUNCTION)
+            cursor.execute(TRIGGER)
+        # New payments reserve their own reference from here on.
+        cursor.execute(
+            "INSERT INTO listings_paymentref (tx_ref, payment_id) "
+            "SELECT tx_ref, id FROM listings_payment ON CONFLICT (tx_ref) DO NOTHING"
+        )
+        # Only possible if a duplicate was written after check_unique ran.
+        taken = duplicates(cursor)
+    if taken:
+        raise RuntimeError(f"Several payments share these tx_refs; make them unique and migrate again: {taken}")
+
+
+def release_tx_refs(apps, schema_editor):
+    schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+    # The references are copied without holding a lock that blocks payments.
+    atomic = False
+
+    dependencies = [
+        ('listings', '0016_partition_bookings_payments'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_unique, migrations.RunPython.noop, elidable=False),
+        migrations.CreateModel(
+            name='PaymentRef',
+            fields=[
+                ('tx_ref', models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ('payment_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(reserve_tx_refs, release_tx_refs, elidable=False),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='payment',
+                    name='tx_ref',
+                    field=models.CharField(max_length=128, unique=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-19 09:35
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Listings are large: build the index without locking out writes.
+    atomic = False
+
+    dependencies = [
+        ('listings', '0017_paymentref'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='listing_title_upper_idx'),
+        ),
+    ]
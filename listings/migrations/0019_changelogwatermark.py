@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-19 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0018_listing_title_upper_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.BigIntegerField(default=0)),
+                ('entry_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
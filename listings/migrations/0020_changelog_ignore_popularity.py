@@ -0,0 +1,79 @@
+# Generated by Django 5.2.9 on 2026-10-19 12:10
+
+from django.db import migrations
+
+# Trigger arguments after the model name are columns whose changes alone are
+# not logged. Popularity events rewrite Listing.popularity_score on every
+# booking and review (listings/popularity.py); without this each of them would
+# be an 'updated' entry in the change feed.
+LOG_FUNCTION = """
+CREATE OR REPLACE FUNCTION listings_log_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    ignored text[] := TG_ARGV[1:TG_NARGS - 1];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'created', clock_timestamp()
+        FROM new_rows n;
+    ELSIF TG_OP = 'UPDATE' AND TG_NARGS > 1 THEN
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'updated', clock_timestamp()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE to_jsonb(o) - ignored IS DISTINCT FROM to_jsonb(n) - ignored;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'updated', clock_timestamp()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE o IS DISTINCT FROM n;
+    ELSE
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], o.id, 'deleted', clock_timestamp()
+        FROM old_rows o;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+OLD_LOG_FUNCTION = """
+CREATE OR REPLACE FUNCTION listings_log_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'created', clock_timestamp()
+        FROM new_rows n;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'updated', clock_timestamp()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE o IS DISTINCT FROM n;
+    ELSE
+        INSERT INTO listings_changelogentry (txid, model, object_id, action, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], o.id, 'deleted', clock_timestamp()
+        FROM old_rows o;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+LISTING_UPDATE_TRIGGER = """
+DROP TRIGGER IF EXISTS listings_listing_log_update ON listings_listing;
+CREATE TRIGGER listings_listing_log_update AFTER UPDATE ON listings_listing
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION listings_log_changes({arguments});
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0019_changelogwatermark'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [LOG_FUNCTION, LISTING_UPDATE_TRIGGER.format(arguments="'listing', 'popularity_score'")],
+            [LISTING_UPDATE_TRIGGER.format(arguments="'listing'"), OLD_LOG_FUNCTION],
+        ),
+    ]
@@ -1,9 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Upper
 from django.utils import timezone
 from decimal import Decimal
 
+from .popularity import initial_score
+from .storage import listing_image_storage
+
 class Listing(models.Model):
     PROPERTY_TYPES = [
         ('apartment', 'Apartment'),
@@ -21,33 +28,90 @@ class Listing(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     is_available = models.BooleanField(default=True)
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     host = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Decayed booking/review/freshness score in log space (listings/popularity.py).
+    popularity_score = models.FloatField(default=initial_score)
 
     def __str__(self):
         return self.title
 
     @property
     def average_rating(self):
-        agg = self.reviews.aggregate(models.Avg('rating'))
-        return agg['rating__avg'] or 0
+        try:
+            return self.rating_stats.average_rating
+        except ListingRatingStats.DoesNotExist:
+            return 0
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='listing_created_at_idx'),
+            models.Index(fields=['-popularity_score', '-id'], name='listing_popularity_idx'),
+            # Admin search and autocomplete by title prefix (istartswith).
+            models.Index(OpClass(Upper('title'), name='text_pattern_ops'), name='listing_title_upper_idx'),
+        ]
+
+
+class ImageBlob(models.Model):
+    """
+    One stored image file, shared by every ListingImage with the same content.
+
+    ``ref_count`` is the number of ListingImage rows pointing at the blob; the
+    file is deleted when it drops to zero. ``phash`` is an optional 64-bit
+    difference hash, split into four 16-bit ``phash_bands`` so near-duplicate
+    candidates can be found through a GIN index instead of a full scan.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    phash = models.BigIntegerField(null=True, blank=True)
+    phash_bands = ArrayField(models.IntegerField(), size=4, null=True, blank=True)
+    near_duplicate_of = models.ForeignKey(
+        'self', related_name='near_duplicates', null=True, blank=True, on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['phash_bands'], name='imageblob_phash_bands_gin'),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
 
 
 class ListingImage(models.Model):
     listing = models.ForeignKey(Listing, related_name='images', on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='listing_images/')
+    image = models.ImageField(upload_to='listing_images/', storage=listing_image_storage)
+    blob = models.ForeignKey(ImageBlob, related_name='images', null=True, blank=True, on_delete=models.PROTECT)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
+    # Resized WebP/JPEG renditions, filled in by the generate_listing_image_variants task.
+    variants = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one primary image per listing; doubles as the index the
+            # listing cards subquery uses to fetch it.
+            models.UniqueConstraint(
+                fields=['listing'],
+                condition=models.Q(is_primary=True),
+                name='unique_primary_image_per_listing',
+            ),
+        ]
 
     def __str__(self):
         return f"Image for {self.listing.title}"
 
 
 class Booking(models.Model):
+    """
+    Stored in monthly partitions by ``start_date`` (see listings/partitions.py).
+    """
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -65,6 +129,9 @@ class Booking(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['listing', 'start_date', 'end_date']),
+            # Admin changelist ordering and its status / date filters.
+            models.Index(fields=['-created_at'], name='booking_created_at_idx'),
+            models.Index(fields=['status', '-created_at'], name='booking_status_created_idx'),
         ]
         ordering = ['-created_at']
 
@@ -93,12 +160,52 @@ class Review(models.Model):
     class Meta:
         unique_together = ('listing', 'user')
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a listing's reviews on (created_at, id).
+            models.Index(fields=['listing', '-created_at', '-id'], name='review_listing_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Review {self.rating}* by {self.user.username} for {self.listing.title}"
 
 
+class ListingRatingStats(models.Model):
+    """
+    Star histogram for a listing, kept in step with its reviews.
+
+    Updated incrementally by the Review save/delete hooks, so rating summaries
+    never aggregate the reviews table.
+    """
+    listing = models.OneToOneField(Listing, related_name='rating_stats', primary_key=True, on_delete=models.CASCADE)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    @property
+    def histogram(self):
+        return {str(stars): getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
+    @property
+    def review_count(self):
+        return sum(self.histogram.values())
+
+    @property
+    def average_rating(self):
+        count = self.review_count
+        if not count:
+            return 0
+        return sum(int(stars) * n for stars, n in self.histogram.items()) / count
+
+    def __str__(self):
+        return f"Ratings for listing {self.listing_id}"
+
+
 class Payment(models.Model):
+    """
+    Stored in monthly partitions by ``created_at`` (see listings/partitions.py).
+    """
     STATUS_PENDING = "Pending"
     STATUS_COMPLETED = "Completed"
     STATUS_FAILED = "Failed"
@@ -108,10 +215,16 @@ class Payment(models.Model):
         (STATUS_FAILED, "Failed"),
     ]
 
-    booking = models.ForeignKey('listings.Booking', on_delete=models.CASCADE, related_name='payments')
+    # Bookings are partitioned on (id, start_date), so there is no unique
+    # key on id alone for the database to reference; on_delete still applies.
+    booking = models.ForeignKey(
+        'listings.Booking', on_delete=models.CASCADE, related_name='payments', db_constraint=False
+    )
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=8, default="ETB")
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # A partitioned table can only enforce uniqueness together with
+    # created_at; a trigger enforces this through PaymentRef instead.
     tx_ref = models.CharField(max_length=128, unique=True)
     checkout_url = models.URLField(blank=True, null=True)
     chapa_transaction_id = models.CharField(max_length=128, blank=True, null=True)
@@ -119,5 +232,205 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Admin changelist status / date filters.
+            models.Index(fields=['-created_at'], name='payment_created_at_idx'),
+            models.Index(fields=['status', '-created_at'], name='payment_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.tx_ref} - {self.status}"
+
+
+class PaymentRef(models.Model):
+    """
+    Every ``Payment.tx_ref`` ever used, with the id of its payment.
+
+    Written by a Postgres trigger on payments (migration 0017), which turns a
+    second payment with a taken ``tx_ref`` into a unique violation however
+    the row is written. A reference outlives its payment (deleted or
+    archived), so it is never handed out twice.
+    """
+    tx_ref = models.CharField(max_length=128, primary_key=True)
+    payment_id = models.BigIntegerField()
+
+    def __str__(self):
+        return self.tx_ref
+
+
+class ListingImportJob(models.Model):
+    FORMAT_CSV = "csv"
+    FORMAT_JSONL = "jsonl"
+    FORMAT_CHOICES = [
+        (FORMAT_CSV, "CSV"),
+        (FORMAT_JSONL, "JSON Lines"),
+    ]
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    # Only the first MAX_ERRORS row errors are kept on the job; the counters stay exact.
+    MAX_ERRORS = 1000
+
+    source = models.FileField(upload_to='listing_imports/')
+    format = models.CharField(max_length=8, choices=FORMAT_CHOICES)
+    host = models.ForeignKey(User, related_name='listing_imports', on_delete=models.CASCADE)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    checkpoint = models.PositiveBigIntegerField(default=0)
+    rows_imported = models.PositiveBigIntegerField(default=0)
+    rows_failed = models.PositiveBigIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    detail = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status})"
+
+
+class ListingDailyStat(models.Model):
+    """
+    Per-listing, per-night rollup of booked nights and collected revenue.
+
+    Rows are sparse (nights with nothing booked have no row) and are rebuilt
+    for a date range from Booking/Payment by ``listings.rollups``; host
+    analytics read only from this table.
+    """
+    listing = models.ForeignKey(Listing, related_name='daily_stats', on_delete=models.CASCADE)
+    host = models.ForeignKey(User, related_name='listing_daily_stats', on_delete=models.CASCADE)
+    date = models.DateField()
+    booked_nights = models.PositiveSmallIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'date'], name='unique_listing_daily_stat'),
+        ]
+        indexes = [
+            models.Index(fields=['host', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} on {self.date}: {self.booked_nights} nights"
+
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task to publish, written in the same transaction as the change
+    that caused it.
+
+    ``manage.py relay_outbox`` publishes pending rows to the broker (see
+    ``listings.outbox``). ``idempotency_key`` is unique, so enqueueing the same
+    logical message twice is a no-op, and it doubles as the Celery task id so
+    consumers can recognise a redelivery.
+    """
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    task_name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The relay's queue: only the (few) unpublished rows are indexed.
+            models.Index(
+                fields=['id'],
+                name='outbox_pending_idx',
+                condition=models.Q(published_at__isnull=True),
+            ),
+            models.Index(fields=['published_at'], name='outbox_published_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} [{self.idempotency_key}]"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client-supplied ``Idempotency-Key`` and the response it produced.
+
+    ``scope`` is the caller plus the endpoint, so two users (or two endpoints)
+    may use the same key. Rows are written by ``listings.idempotency`` and
+    removed after ``expires_at`` by the ``purge_expired_idempotency_keys`` task.
+    """
+    scope = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} [{self.key}]"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One created/updated/deleted ``Listing``, ``Booking`` or ``Payment`` row.
+
+    Written by Postgres triggers (migration 0014), so bulk updates, raw SQL
+    and admin actions are captured as well as ORM saves. ``txid`` is the
+    writing transaction's id; the change feed reads in ``(txid, id)`` order
+    and only below the oldest transaction still running, so an entry never
+    becomes visible behind a cursor that has already passed it.
+    """
+    ACTION_CREATED = "created"
+    ACTION_UPDATED = "updated"
+    ACTION_DELETED = "deleted"
+    ACTION_CHOICES = [
+        (ACTION_CREATED, "Created"),
+        (ACTION_UPDATED, "Updated"),
+        (ACTION_DELETED, "Deleted"),
+    ]
+
+    txid = models.BigIntegerField()
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=8, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['txid', 'id'], name='changelog_position_idx'),
+            models.Index(fields=['changed_at'], name='changelog_changed_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} {self.action}"
+
+
+class ChangeLogWatermark(models.Model):
+    """
+    Feed position ``(txid, entry_id)`` of the newest ``ChangeLogEntry`` pruned
+    so far; a single row, moved forward by the ``prune_change_log`` task. A
+    change feed cursor behind it may have missed pruned entries.
+    """
+    txid = models.BigIntegerField(default=0)
+    entry_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.txid}|{self.entry_id}"
@@ -0,0 +1,117 @@
+"""
+Transactional outbox for Celery tasks.
+
+Views call ``enqueue`` inside the transaction that changes the row the task is
+about, so the message exists if and only if that change commits, and the
+request never waits on the broker. ``manage.py relay_outbox`` then publishes
+pending rows in batches (``relay_batch``).
+
+Delivery is at-least-once: a relay that crashes between publishing and
+committing will publish the same rows again. Each message is published with
+its idempotency key as the Celery task id; tasks with side effects check
+``already_processed`` first and call ``mark_processed`` when done.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, key, **kwargs):
+    """
+    Record ``task(**kwargs)`` for publishing. Call inside the transaction
+    that makes the change; a second call with the same ``key`` is a no-op.
+    """
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(idempotency_key=key, task_name=task.name, kwargs=kwargs)],
+        ignore_conflicts=True,
+    )
+
+
+def relay_batch(batch_size=100):
+    """
+    Publish up to ``batch_size`` pending messages, oldest first.
+
+    Rows are locked with SKIP LOCKED, so several relays can run side by side
+    without publishing the same row twice. Publishing stops at the first
+    broker error (the rest of the batch would fail the same way); the failed
+    row keeps its place and is retried on the next pass.
+
+    Returns (published, failed).
+    """
+    from alx_travel_app.celery import app
+    from alx_travel_app.metrics import OUTBOX_DELIVERY_LAG, OUTBOX_PUBLISHED, OUTBOX_PUBLISH_ERRORS
+
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        published, failed = [], []
+        for message in messages:
+            message.attempts += 1
+            try:
+                # The relay never waits on results, so don't subscribe to the result backend.
+                app.send_task(
+                    message.task_name,
+                    kwargs=message.kwargs,
+                    task_id=message.idempotency_key,
+                    ignore_result=True,
+                )
+            except Exception as e:
+                logger.warning("Could not publish outbox message %s: %s", message.pk, e)
+                message.last_error = str(e)
+                failed.append(message)
+                OUTBOX_PUBLISH_ERRORS.labels(message.task_name).inc()
+                break
+            published.append(message)
+
+        now = timezone.now()
+        for message in published:
+            message.published_at = now
+            message.last_error = ''
+            OUTBOX_PUBLISHED.labels(message.task_name).inc()
+            OUTBOX_DELIVERY_LAG.labels(message.task_name).observe((now - message.created_at).total_seconds())
+        if published or failed:
+            OutboxMessage.objects.bulk_update(published + failed, ['attempts', 'last_error', 'published_at'])
+    return len(published), len(failed)
+
+
+def update_lag_metrics():
+    """
+    Refresh the pending-count and oldest-pending-age gauges. Returns the age in seconds.
+    """
+    from django.db.models import Count, Min
+
+    from alx_travel_app.metrics import OUTBOX_OLDEST_PENDING_AGE, OUTBOX_PENDING
+
+    pending = OutboxMessage.objects.filter(published_at__isnull=True).aggregate(n=Count('id'), oldest=Min('created_at'))
+    age = (timezone.now() - pending['oldest']).total_seconds() if pending['oldest'] else 0
+    OUTBOX_PENDING.set(pending['n'])
+    OUTBOX_OLDEST_PENDING_AGE.set(age)
+    return age
+
+
+def purge_published(older_than=timedelta(days=7)):
+    """
+    Delete messages published more than ``older_than`` ago. Returns the number deleted.
+    """
+    deleted, _ = OutboxMessage.objects.filter(published_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+def already_processed(key):
+    """
+    True if the task for outbox message ``key`` has already run to completion.
+    """
+    return OutboxMessage.objects.filter(idempotency_key=key, processed_at__isnull=False).exists()
+
+
+def mark_processed(key):
+    OutboxMessage.objects.filter(idempotency_key=key, processed_at__isnull=True).update(processed_at=timezone.now())
@@ -0,0 +1,218 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import ChangeLogWatermark
+
+
+class NoCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that never runs ``COUNT(*)``.
+
+    Fetches one row more than the page size to know whether there is a next
+    page, so a page costs exactly one query whatever its size.
+    """
+    default_limit = 24
+    max_limit = 100
+    template = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'].pop('count', None)
+        return response_schema
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on ``(created_at, id)``, newest first.
+
+    The cursor encodes the last row of the previous page and each page is a
+    single indexed range scan: no ``COUNT(*)`` and no ``OFFSET``, so page N
+    costs the same as page 1 whatever the table size.
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        rows = list(queryset.order_by('-created_at', '-pk')[:self.size + 1])
+        self.next_position = None
+        if len(rows) > self.size:
+            last = rows[self.size - 1]
+            self.next_position = (last.created_at, last.pk)
+        return rows[:self.size]
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        created_at, pk = position
+        encoded = urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_position) if self.next_position else None
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CursorExpired(APIException):
+    status_code = 410
+    default_detail = 'Cursor is older than the change log retention; resync from the list endpoints.'
+    default_code = 'cursor_expired'
+
+
+class ChangeFeedPagination(BasePagination):
+    """
+    Resumable pagination over ``ChangeLogEntry`` in ``(txid, id)`` order.
+
+    ``since`` is the ``cursor`` returned by the previous page; each page is a
+    range scan of ``changelog_position_idx`` starting at that position, so a
+    sync costs as much as the number of changes since it, not the table size.
+    Only entries written by transactions older than every running one are
+    served: a transaction that commits later can never land behind a cursor
+    already handed out. ``since=now`` returns the current head and no
+    results, for a client that has just done a full pull.
+
+    A cursor behind ``ChangeLogWatermark``, the newest entry pruned so far,
+    may have missed entries and is rejected with 410.
+    """
+    page_size = 500
+    max_page_size = 5000
+    cursor_query_param = 'since'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.size = self.get_page_size(request)
+        visible = queryset.filter(txid__lt=RawSQL("pg_snapshot_xmin(pg_current_snapshot())::text::bigint", []))
+        if request.query_params.get(self.cursor_query_param) == 'now':
+            head = visible.order_by('-txid', '-id').first()
+            self.position = (head.txid, head.pk) if head else (0, 0)
+            self.has_more = False
+            return []
+        txid, pk = self.decode_cursor(request)
+        if request.query_params.get(self.cursor_query_param) and (txid, pk) < self.pruned_position():
+            raise CursorExpired()
+        self.position = (txid, pk)
+        rows = list(
+            visible.filter(Q(txid__gt=txid) | Q(txid=txid, pk__gt=pk)).order_by('txid', 'id')[:self.size + 1]
+        )
+        self.has_more = len(rows) > self.size
+        rows = rows[:self.size]
+        if rows:
+            last = rows[-1]
+            self.position = (last.txid, last.pk)
+        return rows
+
+    get_page_size = KeysetPagination.get_page_size
+
+    def pruned_position(self):
+        return ChangeLogWatermark.objects.filter(pk=1).values_list('txid', 'entry_id').first() or (0, 0)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return 0, 0
+        try:
+            # Cursors issued before the watermark carried a third, ignored field.
+            txid, pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')[:2]
+            return int(txid), int(pk)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        txid, pk = position
+        cursor = f"{txid}|{pk}"
+        return urlsafe_b64encode(cursor.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.cursor)
+
+    def get_paginated_response(self, data):
+        self.cursor = self.encode_cursor(self.position)
+        return Response({
+            'cursor': self.cursor,
+            'next': self.get_next_link(),
+            'has_more': self.has_more,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'cursor': {'type': 'string'},
+                'next': {'type': 'string', 'format': 'uri'},
+                'has_more': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
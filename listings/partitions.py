@@ -0,0 +1,286 @@
+"""
+Monthly partitions of bookings and payments.
+
+Bookings are partitioned by ``start_date`` and payments by ``created_at``
+(UTC months), one table per month named ``<table>_pYYYY_MM`` plus a
+``<table>_default`` partition that catches rows outside every month
+(migration 0016 did the conversion). Queries filtered on the key only touch
+the months they need, and an old month leaves the database by dropping a
+table instead of deleting millions of rows.
+
+- ``maintain`` (the daily ``maintain_partitions`` task) creates the
+  partitions for the next ``PARTITION_MONTHS_AHEAD`` months and moves rows
+  that landed in the default partition into months of their own.
+- ``archive`` (``manage.py archive_partitions``) detaches the months older
+  than ``PARTITION_RETENTION_MONTHS``, streams each to
+  ``PARTITION_ARCHIVE_DIR/<partition>.jsonl.gz`` and drops it.
+- ``restore`` (``manage.py restore_partition``) loads an archive back,
+  re-attaches it and renames the file to ``<partition>.jsonl.gz.restored``.
+
+Rows move in and out of partitions directly, never through the parent table,
+so none of this shows up in the change feed.
+"""
+import gzip
+import os
+import re
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Booking, Payment, PaymentRef
+
+# Partition key of each partitioned model, by its name on the command line.
+PARTITIONED = {
+    'booking': (Booking, 'start_date'),
+    'payment': (Payment, 'created_at'),
+}
+PARTITION_NAME = re.compile(r'^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$')
+ARCHIVE_SUFFIX = '.jsonl.gz'
+RESTORED_SUFFIX = '.restored'
+# Attaching and detaching lock the parent table: give up rather than queue
+# every query behind a long-running one.
+LOCK_TIMEOUT = '5s'
+RESTORE_BATCH = 5000
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month():
+    return timezone.now().date().replace(day=1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def parse_partition_name(name):
+    """
+    ``(table, month)`` for a partition name, or None.
+    """
+    match = PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return match['table'], date(int(match['year']), int(match['month']), 1)
+
+
+def bounds(key, month):
+    """
+    SQL literals for the range of ``month``.
+    """
+    start, end = month, add_months(month, 1)
+    if key == 'created_at':
+        return f"'{start.isoformat()} 00:00:00+00'", f"'{end.isoformat()} 00:00:00+00'"
+    return f"'{start.isoformat()}'", f"'{end.isoformat()}'"
+
+
+def table_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cursor.fetchone()[0]
+
+
+def attached(cursor, table):
+    """
+    Months with an attached partition of ``table``, mapped to its name.
+    """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+        [table],
+    )
+    months = {}
+    for (name,) in cursor.fetchall():
+        parsed = parse_partition_name(name)
+        if parsed is not None and parsed[0] == table:
+            months[parsed[1]] = name
+    return months
+
+
+def attach(cursor, table, key, month, name):
+    """
+    Attach the standalone table ``name`` as the partition for ``month``,
+    moving in any rows the default partition holds for that month.
+    """
+    start, end = bounds(key, month)
+    cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {table}_default WHERE {key} >= {start} AND {key} < {end} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})")
+    return moved
+
+
+def create_partition(cursor, table, key, month):
+    """
+    Create and attach the partition for ``month``. Returns the number of rows
+    moved into it from the default partition.
+    """
+    name = partition_name(table, month)
+    with transaction.atomic():
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        return attach(cursor, table, key, month, name)
+
+
+def maintain(months_ahead=None):
+    """
+    Make sure every month from now to ``months_ahead`` months out has a
+    partition, and give every month found in the default partitions one.
+    Returns ``{model: (partitions created, rows moved)}``.
+    """
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    this_month = current_month()
+    ahead = {add_months(this_month, n) for n in range(months_ahead + 1)}
+    report = {}
+    with connection.cursor() as cursor:
+        for label, (model, key) in PARTITIONED.items():
+            table = model._meta.db_table
+            cursor.execute(f"SELECT DISTINCT date_trunc('month', {key})::date FROM {table}_default")
+            stray = {row[0] for row in cursor.fetchall()}
+            existing = attached(cursor, table)
+            created = moved = 0
+            for month in sorted((ahead | stray) - existing.keys()):
+                moved += create_partition(cursor, table, key, month)
+                created += 1
+            report[label] = (created, moved)
+    return report
+
+
+def archive_path(directory, name):
+    return Path(directory) / f"{name}{ARCHIVE_SUFFIX}"
+
+
+def export(cursor, name, path):
+    """
+    Stream every row of table ``name`` to ``path`` as gzipped JSON Lines.
+    The file only appears under its final name once it is complete and
+    flushed to disk. Returns the number of rows written.
+    """
+    partial = path.with_name(path.name + '.partial')
+    rows = 0
+    with open(partial, 'wb') as raw:
+        with gzip.GzipFile(filename=path.name[: -len('.gz')], mode='wb', fileobj=raw) as out:
+            with cursor.copy(f"COPY (SELECT row_to_json(t)::text FROM {name} AS t ORDER BY id) TO STDOUT") as copy:
+                for (line,) in copy.rows():
+                    out.write(line.encode())
+                    out.write(b'\n')
+                    rows += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    return rows
+
+
+def archivable(cursor, table, before):
+    """
+    Names of ``table``'s partitions for months before ``before``, oldest first,
+    including ones detached by an archive run that stopped before dropping them.
+    """
+    months = attached(cursor, table)
+    cursor.execute(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE %s AND NOT relispartition",
+        [f"{table}\\_p%"],
+    )
+    for (name,) in cursor.fetchall():
+        parsed = parse_partition_name(name)
+        if parsed is not None and parsed[0] == table:
+            months.setdefault(parsed[1], name)
+    return [(month, months[month]) for month in sorted(months) if month < before]
+
+
+def archive(label, before=None, directory=None, dry_run=False):
+    """
+    Detach, export and drop the ``label`` partitions for months before
+    ``before`` (default: ``PARTITION_RETENTION_MONTHS`` ago). Yields
+    ``(partition, rows, path)`` as each one is done.
+    """
+    table = PARTITIONED[label][0]._meta.db_table
+    before = before or add_months(current_month(), -settings.PARTITION_RETENTION_MONTHS)
+    directory = Path(directory or settings.PARTITION_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    with connection.cursor() as cursor:
+        for month, name in archivable(cursor, table, before):
+            path = archive_path(directory, name)
+            if path.exists():
+                # The month was partly re-created after it was archived.
+                raise RuntimeError(f"{path} already exists; restore it before archiving {name} again.")
+            if dry_run:
+                yield name, None, path
+                continue
+            cursor.execute("SELECT relispartition FROM pg_class WHERE oid = %s::regclass", [name])
+            if cursor.fetchone()[0]:
+                with transaction.atomic():
+                    cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                    cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            # Detached, the table is invisible to the application and nothing
+            # writes to it while it is exported.
+            rows = export(cursor, name, path)
+            cursor.execute(f"SELECT count(*) FROM {name}")
+            if cursor.fetchone()[0] != rows:
+                raise RuntimeError(f"Exported {rows} rows of {name} but it has more; kept the table.")
+            cursor.execute(f"DROP TABLE {name}")
+            yield name, rows, path
+
+
+def restore(path):
+    """
+    Load an archive written by ``archive`` back into its partition and attach
+    it, then rename the archive to ``*.restored`` so the month can be archived
+    again. Returns ``(partition, rows)``.
+    """
+    path = Path(path)
+    if not path.name.endswith(ARCHIVE_SUFFIX):
+        raise ValueError(f"{path.name} is not a partition archive (*{ARCHIVE_SUFFIX}).")
+    name = path.name[: -len(ARCHIVE_SUFFIX)]
+    parsed = parse_partition_name(name)
+    keys = {model._meta.db_table: key for model, key in PARTITIONED.values()}
+    if parsed is None or parsed[0] not in keys:
+        raise ValueError(f"{path.name} does not name a booking or payment partition.")
+    table, month = parsed
+    rows = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        if table_exists(cursor, name):
+            raise ValueError(f"{name} already exists; archive or drop it first.")
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        with gzip.open(path, 'rt') as lines:
+            batch = []
+            for line in lines:
+                batch.append(line.rstrip('\n'))
+                if len(batch) == RESTORE_BATCH:
+                    rows += load(cursor, name, batch)
+                    batch = []
+            rows += load(cursor, name, batch)
+        if table == Payment._meta.db_table:
+            reserve_tx_refs(cursor, name)
+        attach(cursor, table, keys[table], month, name)
+    os.replace(path, path.with_name(path.name + RESTORED_SUFFIX))
+    return name, rows
+
+
+def reserve_tx_refs(cursor, name):
+    """
+    Record the references of restored payments. They normally are already:
+    archiving keeps them, so a restored payment never clashes with a newer one.
+    """
+    ref = PaymentRef._meta.db_table
+    cursor.execute(f"INSERT INTO {ref} (tx_ref, payment_id) SELECT tx_ref, id FROM {name} ON CONFLICT DO NOTHING")
+    cursor.execute(f"SELECT p.tx_ref FROM {name} AS p JOIN {ref} AS r USING (tx_ref) WHERE r.payment_id <> p.id")
+    taken = [row[0] for row in cursor.fetchmany(10)]
+    if taken:
+        raise ValueError(f"{name} has tx_refs used by other payments: {', '.join(taken)}")
+
+
+def load(cursor, name, lines):
+    if not lines:
+        return 0
+    cursor.execute(
+        f"INSERT INTO {name} SELECT * FROM json_populate_recordset(NULL::{name}, %s::json)",
+        ['[' + ','.join(lines) + ']'],
+    )
+    return cursor.rowcount
+
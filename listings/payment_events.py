@@ -0,0 +1,226 @@
+"""
+Push payment status changes to browsers over Server-Sent Events.
+
+``GET /api/payments/<tx_ref>/events/`` streams the payment's current status
+and then every change to it, so the checkout page no longer polls verify
+(a database read plus a Chapa round trip per poll).
+
+- ``publish`` is called from ``listings/payments.py`` once a transition has
+  committed; the webhook, verify and the callback page all go through there.
+  It publishes on the Redis channel ``payments:<tx_ref>``.
+- ``PaymentEventsApp`` is a plain ASGI app mounted in front of Django in
+  ``alx_travel_app/asgi.py``. An idle stream is one coroutine and one small
+  queue: no Django middleware, no thread and no database connection, so a
+  single uvicorn process holds tens of thousands of them.
+- ``PaymentEventHub`` keeps one pattern subscription per process and fans
+  messages out to the local streams. After a Redis reconnect every stream
+  re-reads its status from the database, since messages may have been missed.
+"""
+import asyncio
+import json
+import logging
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'payments:'
+PATH = re.compile(r'^/api/payments/(?P<tx_ref>[\w.-]{1,100})/events/$')
+FINAL_STATUSES = (Payment.STATUS_COMPLETED,)
+# Put on a stream's queue to make it re-read the status from the database.
+RESYNC = object()
+
+
+@cache
+def redis_client():
+    import redis
+
+    return redis.Redis.from_url(settings.PAYMENT_EVENTS_REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+
+
+def publish(tx_ref, status):
+    """
+    Tell every open stream for ``tx_ref`` about its new status. Best effort:
+    a stream that misses it still gets the status on reconnect.
+    """
+    try:
+        redis_client().publish(f"{CHANNEL_PREFIX}{tx_ref}", json.dumps({"tx_ref": tx_ref, "status": status}))
+    except Exception:
+        logger.warning("Could not publish payment event for %s", tx_ref, exc_info=True)
+
+
+def current_status(tx_ref):
+    """
+    The payment's status, or None. Hands the database connection straight
+    back so idle streams don't hold one.
+    """
+    try:
+        return Payment.objects.filter(tx_ref=tx_ref).values_list('status', flat=True).first()
+    finally:
+        connection.close()
+
+
+class PaymentEventHub:
+    """
+    One Redis pattern subscription per process, fanned out to local queues.
+    """
+
+    def __init__(self, redis_url):
+        self.redis_url = redis_url
+        self.subscribers = defaultdict(set)
+        self.listener = None
+
+    def subscribe(self, tx_ref):
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.get_running_loop().create_task(self.listen())
+        queue = asyncio.Queue(maxsize=16)
+        self.subscribers[tx_ref].add(queue)
+        return queue
+
+    def unsubscribe(self, tx_ref, queue):
+        queues = self.subscribers.get(tx_ref)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[tx_ref]
+
+    def deliver(self, tx_ref, event):
+        for queue in list(self.subscribers.get(tx_ref, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass  # a stuck client; it re-reads the status when it reconnects
+
+    async def listen(self):
+        import redis.asyncio as aioredis
+
+        delay = 0.5
+        connected_before = False
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                    if connected_before:
+                        for tx_ref in list(self.subscribers):
+                            self.deliver(tx_ref, RESYNC)
+                    connected_before = True
+                    delay = 0.5
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        try:
+                            event = json.loads(message['data'])
+                        except ValueError:
+                            continue
+                        self.deliver(event.get('tx_ref'), event)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Payment event subscription lost; reconnecting in %.1fs", delay, exc_info=True)
+            finally:
+                await client.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class PaymentEventsApp:
+    """
+    ASGI app serving the event streams; everything else goes to ``fallback``
+    (the Django application).
+    """
+
+    def __init__(self, fallback, hub=None):
+        self.fallback = fallback
+        self.hub = hub or PaymentEventHub(settings.PAYMENT_EVENTS_REDIS_URL)
+        # One thread per pooled connection: a burst of new streams queues
+        # for a thread instead of timing out waiting for a connection.
+        pool = settings.DATABASES['default'].get('OPTIONS', {}).get('pool') or {}
+        self.db_executor = ThreadPoolExecutor(pool.get('max_size', 4), thread_name_prefix='payment-events')
+
+    async def status(self, tx_ref):
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, current_status, tx_ref)
+
+    async def __call__(self, scope, receive, send):
+        match = PATH.match(scope.get('path', '')) if scope['type'] == 'http' else None
+        if match is None:
+            return await self.fallback(scope, receive, send)
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405, b'Method not allowed', [(b'allow', b'GET')])
+
+        tx_ref = match['tx_ref']
+        # Subscribe before reading the status so no change falls in between.
+        queue = self.hub.subscribe(tx_ref)
+        disconnected = asyncio.get_running_loop().create_task(self.wait_for_disconnect(receive))
+        try:
+            status = await self.status(tx_ref)
+            if status is None:
+                return await self.respond(send, 404, b'Payment not found')
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    # Tell nginx not to buffer the stream.
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await self.stream(send, queue, disconnected, tx_ref, status)
+        finally:
+            self.hub.unsubscribe(tx_ref, queue)
+            disconnected.cancel()
+
+    async def stream(self, send, queue, disconnected, tx_ref, status):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.PAYMENT_EVENTS_MAX_SECONDS
+        # `retry` is how long the browser's EventSource waits before reconnecting.
+        await self.send_chunk(send, b'retry: 3000\n' + sse('status', {"tx_ref": tx_ref, "status": status}))
+        while status not in FINAL_STATUSES:
+            timeout = min(settings.PAYMENT_EVENTS_HEARTBEAT_SECONDS, deadline - loop.time())
+            if timeout <= 0:
+                break
+            getter = loop.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                getter.cancel()
+                return
+            if getter not in done:
+                getter.cancel()
+                await self.send_chunk(send, b': keepalive\n\n')
+                continue
+            event = getter.result()
+            if event is RESYNC:
+                latest = await self.status(tx_ref)
+                if latest is None or latest == status:
+                    continue
+                event = {"tx_ref": tx_ref, "status": latest}
+            status = event.get('status')
+            await self.send_chunk(send, sse('status', event))
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def send_chunk(self, send, body):
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    async def respond(self, send, status, body, headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'text/plain'), (b'content-length', str(len(body)).encode()), *headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
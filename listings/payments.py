@@ -0,0 +1,121 @@
+"""
+Payment state machine.
+
+Verify, the Chapa webhook and the callback page can all report on the same
+payment at the same time. Each transition is therefore one conditional
+``UPDATE ... WHERE status IN (...) RETURNING``: Postgres serialises
+concurrent updates of the row, and only the one that actually moves the
+payment gets a row back. Side effects (confirmation email, rollups, the
+status push to open payment event streams) run only for that one.
+
+    Pending -> Completed, Failed
+    Failed  -> Completed    (Chapa reports success after an earlier failure)
+    Completed is final.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import outbox, payment_events
+from .models import Booking, Payment
+
+ALLOWED_FROM = {
+    Payment.STATUS_COMPLETED: (Payment.STATUS_PENDING, Payment.STATUS_FAILED),
+    Payment.STATUS_FAILED: (Payment.STATUS_PENDING,),
+}
+
+
+@dataclass(frozen=True)
+class Transition:
+    payment_id: int
+    booking_id: int
+    tx_ref: str
+    amount: Decimal
+    currency: str
+    status: str
+    guest_email: str
+    # False when the payment was already in (or past) the target state.
+    transitioned: bool
+
+
+def transition(tx_ref, to_status):
+    """
+    Move the payment ``tx_ref`` to ``to_status`` if its current status allows it.
+
+    Returns a ``Transition`` (``transitioned`` tells whether this call made
+    the change), or None if there is no such payment. Does not run side
+    effects; see ``complete`` and ``fail``.
+    """
+    payment, booking, user = Payment._meta.db_table, Booking._meta.db_table, User._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {payment} AS p SET status = %s, updated_at = %s
+            FROM {booking} AS b JOIN {user} AS u ON u.id = b.guest_id
+            WHERE p.tx_ref = %s AND p.status = ANY(%s) AND b.id = p.booking_id
+            RETURNING p.id, p.booking_id, p.tx_ref, p.amount, p.currency, p.status, u.email
+            """,
+            [to_status, timezone.now(), tx_ref, list(ALLOWED_FROM[to_status])],
+        )
+        row = cursor.fetchone()
+        if row is not None:
+            return Transition(*row, transitioned=True)
+        # No transition: report the payment as it stands now.
+        cursor.execute(
+            f"""
+            SELECT p.id, p.booking_id, p.tx_ref, p.amount, p.currency, p.status, u.email
+            FROM {payment} AS p
+            JOIN {booking} AS b ON b.id = p.booking_id
+            JOIN {user} AS u ON u.id = b.guest_id
+            WHERE p.tx_ref = %s
+            """,
+            [tx_ref],
+        )
+        row = cursor.fetchone()
+    return Transition(*row, transitioned=False) if row is not None else None
+
+
+def complete(tx_ref):
+    """
+    Mark the payment completed; on the transition, queue the confirmation
+    email (in the same transaction) and the booking's rollup refresh.
+    """
+    from .signals import dispatch
+    from .tasks import refresh_booking_rollups, send_payment_confirmation_email
+
+    with transaction.atomic():
+        result = transition(tx_ref, Payment.STATUS_COMPLETED)
+        if result is not None and result.transitioned:
+            outbox.enqueue(
+                send_payment_confirmation_email,
+                f"payment-confirmation:{result.tx_ref}",
+                to_email=result.guest_email,
+                booking_id=result.booking_id,
+                amount=str(result.amount),
+                tx_ref=result.tx_ref,
+            )
+            dispatch(refresh_booking_rollups, result.booking_id)
+            notify(result)
+    return result
+
+
+def fail(tx_ref):
+    """
+    Mark a pending payment failed. Never overrides a completed payment. The
+    only side effect is the status push: a failed payment adds no revenue.
+    """
+    with transaction.atomic():
+        result = transition(tx_ref, Payment.STATUS_FAILED)
+        if result is not None and result.transitioned:
+            notify(result)
+    return result
+
+
+def notify(result):
+    """
+    Push the new status to open payment event streams once it has committed.
+    """
+    transaction.on_commit(lambda: payment_events.publish(result.tx_ref, result.status))
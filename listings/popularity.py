@@ -0,0 +1,135 @@
+"""
+Stored popularity score for "sort by popular".
+
+A listing's popularity is a sum of events, each weighted and decayed
+exponentially with ``POPULARITY_HALF_LIFE_DAYS``:
+
+- the listing's creation (``POPULARITY_NEW_LISTING_WEIGHT``), so new
+  listings get a start;
+- each booking that is not cancelled (``POPULARITY_BOOKING_WEIGHT``), i.e.
+  booking velocity;
+- each review, weighted ``POPULARITY_REVIEW_WEIGHT * stars / 5``.
+
+Decay multiplies every listing's sum by the same factor, so it never
+changes the order. The stored ``Listing.popularity_score`` is therefore
+the log of the sum measured against a fixed epoch,
+``ln(sum(weight * exp((t - EPOCH) / tau)))``. Nothing is ever rewritten
+just because time passes. A new event is added in place with a log-add-exp
+(``record``), and ``?ordering=-popularity`` is a scan of
+``listing_popularity_idx``.
+
+``recompute`` rebuilds every score from the events. It runs on a schedule
+and picks up what the incremental path misses: cancellations, edited or
+deleted reviews, bulk imports and raw SQL.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+# Events older than this many half-lives weigh less than 0.1% and are
+# left out of the batch recompute.
+HORIZON_HALF_LIVES = 10
+
+
+def tau_seconds():
+    return settings.POPULARITY_HALF_LIFE_DAYS * 86400 / math.log(2)
+
+
+def log_weight(weight, at):
+    return math.log(weight) + (at - EPOCH).total_seconds() / tau_seconds()
+
+
+def initial_score():
+    """
+    Score of a listing created now (the ``Listing.popularity_score`` default).
+    """
+    return log_weight(settings.POPULARITY_NEW_LISTING_WEIGHT, timezone.now())
+
+
+def log_add_exp(a, b):
+    """
+    SQL for ln(exp(a) + exp(b)) that neither overflows nor underflows.
+    """
+    return f"GREATEST({a}, {b}) + CASE WHEN abs({a} - {b}) > 40 THEN 0 ELSE ln(1 + exp(-abs({a} - {b}))) END"
+
+
+def record(listing_id, weight, at):
+    """
+    Add an event of ``weight`` at ``at`` to the listing's score, once the
+    current transaction commits.
+    """
+    from .models import Listing
+
+    def apply():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Listing._meta.db_table} SET popularity_score = {log_add_exp('popularity_score', 'e.x')} "
+                f"FROM (SELECT %s::float8 AS x) AS e WHERE id = %s",
+                [log_weight(weight, at), listing_id],
+            )
+
+    transaction.on_commit(apply)
+
+
+def recompute(batch_size=10000):
+    """
+    Recompute every score from listings, bookings and reviews, a range of
+    listing ids per statement so no transaction holds many row locks for
+    long. Rows whose score is unchanged are not written. Returns the number
+    of listings updated.
+    """
+    from .models import Booking, Listing, Review
+
+    listing, booking, review = Listing._meta.db_table, Booking._meta.db_table, Review._meta.db_table
+    tau = tau_seconds()
+    horizon = timezone.now() - timedelta(days=settings.POPULARITY_HALF_LIFE_DAYS * HORIZON_HALF_LIVES)
+    params = {
+        'epoch': EPOCH,
+        'tau': tau,
+        'horizon': horizon,
+        'new_weight': math.log(settings.POPULARITY_NEW_LISTING_WEIGHT),
+        'booking_weight': math.log(settings.POPULARITY_BOOKING_WEIGHT),
+        'review_weight': settings.POPULARITY_REVIEW_WEIGHT / 5,
+    }
+    sql = f"""
+        WITH events AS (
+            SELECT id AS listing_id,
+                %(new_weight)s + extract(epoch FROM created_at - %(epoch)s) / %(tau)s AS x
+            FROM {listing} WHERE id >= %(low)s AND id < %(high)s
+            UNION ALL
+            SELECT listing_id, %(booking_weight)s + extract(epoch FROM created_at - %(epoch)s) / %(tau)s
+            FROM {booking}
+            WHERE listing_id >= %(low)s AND listing_id < %(high)s
+                AND created_at >= %(horizon)s AND status <> 'cancelled'
+            UNION ALL
+            SELECT listing_id, ln(%(review_weight)s * rating) + extract(epoch FROM created_at - %(epoch)s) / %(tau)s
+            FROM {review}
+            WHERE listing_id >= %(low)s AND listing_id < %(high)s
+                AND created_at >= %(horizon)s AND rating > 0
+        ),
+        peaks AS (
+            SELECT listing_id, x, max(x) OVER (PARTITION BY listing_id) AS m FROM events
+        ),
+        scores AS (
+            SELECT listing_id, m + ln(sum(exp(GREATEST(x - m, -700)))) AS score
+            FROM peaks GROUP BY listing_id, m
+        )
+        UPDATE {listing} AS l SET popularity_score = s.score
+        FROM scores AS s
+        WHERE l.id = s.listing_id AND abs(l.popularity_score - s.score) > 1e-9
+    """
+    bounds = Listing.objects.aggregate(low=Min('id'), high=Max('id'))
+    low, high = bounds['low'], bounds['high']
+    if low is None:
+        return 0
+    updated = 0
+    with connection.cursor() as cursor:
+        for start in range(low, high + 1, batch_size):
+            cursor.execute(sql, {**params, 'low': start, 'high': start + batch_size})
+            updated += cursor.rowcount
+    return updated
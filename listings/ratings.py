@@ -0,0 +1,45 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import ListingRatingStats
+
+
+def add_rating(listing_id, rating):
+    """
+    Count one more ``rating``-star review, creating the histogram row if needed.
+    """
+    table = ListingRatingStats._meta.db_table
+    column = f"stars_{int(rating)}"
+    values = [1 if stars == int(rating) else 0 for stars in range(1, 6)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (listing_id, stars_1, stars_2, stars_3, stars_4, stars_5)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (listing_id) DO UPDATE SET {column} = {table}.{column} + 1
+            """,
+            [listing_id, *values],
+        )
+
+
+def remove_rating(listing_id, rating):
+    """
+    Count one fewer ``rating``-star review. Never inserts, so it is safe while
+    the listing itself is being deleted.
+    """
+    column = f"stars_{int(rating)}"
+    ListingRatingStats.objects.filter(listing_id=listing_id).update(**{column: Greatest(F(column) - 1, 0)})
+
+
+def change_rating(stored, current):
+    """
+    Apply a review's move from ``stored`` to ``current`` ``(listing_id, rating)``.
+    """
+    if stored == current:
+        return
+    with transaction.atomic():
+        if stored:
+            remove_rating(*stored)
+        if current:
+            add_rating(*current)
@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from .models import Booking, Listing, ListingDailyStat, Payment
+
+
+def booking_nights(start_date, end_date):
+    """
+    Nights covered by a stay; the checkout day is not a night.
+    """
+    nights = max((end_date - start_date).days, 1)
+    return [start_date + timedelta(days=offset) for offset in range(nights)]
+
+
+def refresh_listing_stats(listing_id, start, end):
+    """
+    Recompute ``ListingDailyStat`` rows for one listing over ``[start, end]``.
+
+    A night counts as booked when a non-cancelled booking covering it is
+    confirmed or has a completed payment. Completed payment amounts are spread
+    evenly over the booking's nights as revenue. Reads only the bookings that
+    overlap the range (one query), then replaces the range's rows.
+    """
+    listing = Listing.objects.filter(pk=listing_id).values('host_id').first()
+    if listing is None:
+        return 0
+
+    bookings = (
+        Booking.objects.filter(listing_id=listing_id, start_date__lte=end, end_date__gt=start)
+        .exclude(status='cancelled')
+        .annotate(paid=Sum('payments__amount', filter=Q(payments__status=Payment.STATUS_COMPLETED)))
+        .values('start_date', 'end_date', 'status', 'paid')
+    )
+    nights = {}
+    revenue = {}
+    for booking in bookings:
+        if booking['status'] != 'confirmed' and not booking['paid']:
+            continue
+        days = booking_nights(booking['start_date'], booking['end_date'])
+        per_night = (booking['paid'] or Decimal('0')) / len(days)
+        for day in days:
+            if start <= day <= end:
+                nights[day] = nights.get(day, 0) + 1
+                revenue[day] = revenue.get(day, Decimal('0')) + per_night
+
+    rows = [
+        ListingDailyStat(
+            listing_id=listing_id,
+            host_id=listing['host_id'],
+            date=day,
+            booked_nights=count,
+            revenue=revenue[day].quantize(Decimal('0.01')),
+        )
+        for day, count in nights.items()
+    ]
+    with transaction.atomic():
+        ListingDailyStat.objects.filter(listing_id=listing_id, date__range=(start, end)).exclude(
+            date__in=list(nights)
+        ).delete()
+        ListingDailyStat.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['listing', 'date'],
+            update_fields=['host', 'booked_nights', 'revenue', 'updated_at'],
+        )
+    return len(rows)
+
+
+def refresh_booking_stats(booking_id):
+    """
+    Recompute the rollup rows covering one booking's stay.
+    """
+    booking = Booking.objects.filter(pk=booking_id).values('listing_id', 'start_date', 'end_date').first()
+    if booking is None:
+        return 0
+    nights = booking_nights(booking['start_date'], booking['end_date'])
+    return refresh_listing_stats(booking['listing_id'], nights[0], nights[-1])
+
+
+def month_bounds(value):
+    """
+    First and last day of the month of ``value``.
+    """
+    first = value.replace(day=1)
+    following = (first + timedelta(days=32)).replace(day=1)
+    return first, following - timedelta(days=1)
+
+
+def add_months(value, months):
+    """
+    First day of the month ``months`` away from ``value``'s month.
+    """
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(value):
+    year, month = value.split('-')[:2]
+    return date(int(year), int(month), 1)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Listing, Booking
+from django.core.files.storage import default_storage
+from .models import Listing, Booking, ChangeLogEntry, ListingImage, ListingImportJob, Review
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -42,14 +43,158 @@ class UserCreateUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
+class TokenRequestSerializer(serializers.Serializer):
+    """
+    Credentials exchanged for an API bearer token.
+    """
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True, style={'input_type': 'password'})
+
+
 class ListingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Listing
         fields = "__all__"
-        read_only_fields = ("id", "created_at", "updated_at")
+        read_only_fields = ("id", "created_at", "updated_at", "popularity_score")
+
+class ListingImageSerializer(serializers.ModelSerializer):
+    """
+    Listing image with its resized variants.
+
+    ``variants`` maps each format to ``{width: url}`` and ``srcset`` holds the
+    matching ``srcset`` attribute strings. Both are empty until the background
+    variant task has run.
+    """
+    variants = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ListingImage
+        fields = ['id', 'listing', 'image', 'caption', 'is_primary', 'variants', 'srcset']
+        read_only_fields = ['id', 'variants', 'srcset']
+
+    def validate(self, attrs):
+        # The one-primary-image-per-listing constraint is conditional, which
+        # DRF does not check; without this a second primary is an IntegrityError.
+        listing = attrs.get('listing', getattr(self.instance, 'listing', None))
+        is_primary = attrs.get('is_primary', getattr(self.instance, 'is_primary', False))
+        if listing is not None and is_primary:
+            others = ListingImage.objects.filter(listing=listing, is_primary=True)
+            if self.instance is not None:
+                others = others.exclude(pk=self.instance.pk)
+            if others.exists():
+                raise serializers.ValidationError({'is_primary': ["This listing already has a primary image."]})
+        return attrs
+
+    def variant_urls(self, obj):
+        request = self.context.get('request')
+        urls = {}
+        for key, names in obj.variants.items():
+            if not isinstance(names, dict):
+                continue
+            urls[key] = {}
+            for width, name in names.items():
+                url = default_storage.url(name)
+                urls[key][width] = request.build_absolute_uri(url) if request else url
+        return urls
+
+    def get_variants(self, obj):
+        return self.variant_urls(obj)
+
+    def get_srcset(self, obj):
+        return {
+            key: ", ".join(f"{url} {width}w" for width, url in sorted(urls.items(), key=lambda item: int(item[0])))
+            for key, urls in self.variant_urls(obj).items()
+        }
+
+
+class ListingCardSerializer(serializers.Serializer):
+    """
+    Compact listing summary for search result grids.
+
+    Reads the annotated values produced by ``ListingViewSet.cards``; it never
+    touches related objects, so serializing a page runs no extra queries.
+    """
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    location = serializers.CharField()
+    image = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    review_count = serializers.SerializerMethodField()
+
+    def absolute_url(self, name):
+        if not name:
+            return None
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_image(self, obj):
+        return self.absolute_url(obj['primary_image'])
+
+    def get_thumbnail(self, obj):
+        """
+        Smallest variant per format, e.g. ``{"webp": url, "jpeg": url}``.
+        """
+        thumbnails = {}
+        for key, names in (obj['primary_variants'] or {}).items():
+            if isinstance(names, dict) and names:
+                thumbnails[key] = self.absolute_url(names[min(names, key=int)])
+        return thumbnails
+
+    def rating_counts(self, obj):
+        return {stars: obj[f'rating_stats__stars_{stars}'] or 0 for stars in range(1, 6)}
+
+    def get_average_rating(self, obj):
+        counts = self.rating_counts(obj)
+        total = sum(counts.values())
+        return round(sum(stars * n for stars, n in counts.items()) / total, 2) if total else 0
+
+    def get_review_count(self, obj):
+        return sum(self.rating_counts(obj).values())
+
+
+class ReviewAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name']
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    user = ReviewAuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ['id', 'listing', 'user', 'rating', 'comment', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'listing', 'user', 'created_at', 'updated_at']
+
 
 class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = "__all__"
-        read_only_fields = ("id", "created_at", "updated_at")
\ No newline at end of file
+        read_only_fields = ("id", "created_at", "updated_at")
+
+
+class ListingImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ListingImportJob
+        fields = [
+            'id', 'source', 'format', 'host', 'status', 'checkpoint', 'rows_imported',
+            'rows_failed', 'errors', 'detail', 'created_at', 'updated_at',
+        ]
+        read_only_fields = [
+            'id', 'host', 'status', 'checkpoint', 'rows_imported', 'rows_failed',
+            'errors', 'detail', 'created_at', 'updated_at',
+        ]
+        extra_kwargs = {'format': {'required': False}}
+
+
+class ChangeLogEntrySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='object_id')
+
+    class Meta:
+        model = ChangeLogEntry
+        fields = ['model', 'id', 'action', 'changed_at']
@@ -0,0 +1,190 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Booking, ListingImage, Payment, Review
+
+logger = logging.getLogger(__name__)
+
+
+def dispatch(task, *args):
+    """
+    Queue a Celery task once the current transaction commits.
+
+    Broker errors are logged rather than raised: the write has already
+    committed, and the backfill commands pick up anything missed.
+    """
+    def send():
+        try:
+            task.delay(*args)
+        except Exception:
+            logger.exception("Could not queue %s%r", task.name, args)
+
+    transaction.on_commit(send)
+
+
+@receiver(post_save, sender=ListingImage)
+def track_listing_image_blob(sender, instance, **kwargs):
+    """
+    Keep ``ImageBlob`` reference counts in step with the stored file.
+
+    Runs after the file field has committed the upload, when ``image.name``
+    is the final content-addressed name.
+    """
+    from .blobs import acquire_blob, release_blob
+    from .storage import digest_from_name
+
+    digest = digest_from_name(instance.image.name)
+    previous = instance.blob_id
+    if digest == previous:
+        return
+    if digest:
+        acquire_blob(digest, instance.image.name, instance.image.size)
+    ListingImage.objects.filter(pk=instance.pk).update(blob_id=digest)
+    instance.blob_id = digest
+    if previous:
+        release_blob(previous)
+
+
+@receiver(post_save, sender=ListingImage)
+def queue_listing_image_variants(sender, instance, **kwargs):
+    """
+    Render variants in the background whenever a new image file is stored.
+    """
+    from .images import variants_needed
+    from .tasks import generate_listing_image_variants
+
+    if variants_needed(instance):
+        dispatch(generate_listing_image_variants, instance.pk)
+
+
+@receiver(post_delete, sender=ListingImage)
+def release_listing_image_files(sender, instance, **kwargs):
+    """
+    Release the image's blob; shared files are only deleted with the last reference.
+    """
+    from .blobs import release_blob
+    from .images import delete_variants
+
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+    elif instance.image:
+        name, variants = instance.image.name, instance.variants
+        transaction.on_commit(lambda: delete_variants(name, variants=variants))
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_stay(sender, instance, **kwargs):
+    """
+    Keep the stored listing/dates so a moved booking also refreshes its old nights.
+    """
+    instance._stored_stay = None
+    if instance.pk:
+        instance._stored_stay = (
+            Booking.objects.filter(pk=instance.pk).values_list('listing_id', 'start_date', 'end_date').first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def queue_booking_rollups(sender, instance, **kwargs):
+    from .tasks import refresh_booking_rollups, refresh_listing_rollups
+
+    dispatch(refresh_booking_rollups, instance.pk)
+    stored = getattr(instance, '_stored_stay', None)
+    if stored and stored != (instance.listing_id, instance.start_date, instance.end_date):
+        listing_id, start_date, end_date = stored
+        dispatch(refresh_listing_rollups, listing_id, start_date.isoformat(), end_date.isoformat())
+
+
+@receiver(post_delete, sender=Booking)
+def queue_deleted_booking_rollups(sender, instance, **kwargs):
+    from .tasks import refresh_listing_rollups
+
+    dispatch(refresh_listing_rollups, instance.listing_id, instance.start_date.isoformat(), instance.end_date.isoformat())
+
+
+@receiver(post_save, sender=Booking)
+def count_booking_popularity(sender, instance, created, **kwargs):
+    from . import popularity
+
+    if created and instance.status != 'cancelled':
+        popularity.record(instance.listing_id, settings.POPULARITY_BOOKING_WEIGHT, instance.created_at)
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_booking_calendar(sender, instance, **kwargs):
+    from .availability import invalidate
+
+    stored = getattr(instance, '_stored_stay', None)
+    invalidate(instance.listing_id, *([stored[0]] if stored else []))
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_deleted_booking_calendar(sender, instance, **kwargs):
+    from .availability import invalidate
+
+    invalidate(instance.listing_id)
+
+
+@receiver(post_save, sender=Payment)
+def queue_payment_rollups(sender, instance, created, **kwargs):
+    from .tasks import refresh_booking_rollups
+
+    if created and instance.status == Payment.STATUS_PENDING:
+        return
+    dispatch(refresh_booking_rollups, instance.booking_id)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._stored_rating = None
+    if instance.pk:
+        instance._stored_rating = Review.objects.filter(pk=instance.pk).values_list('listing_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_histogram(sender, instance, **kwargs):
+    """
+    Keep ``ListingRatingStats`` in step with review writes.
+    """
+    from .ratings import change_rating
+
+    change_rating(getattr(instance, '_stored_rating', None), (instance.listing_id, instance.rating))
+
+
+@receiver(post_save, sender=Review)
+def count_review_popularity(sender, instance, created, **kwargs):
+    from . import popularity
+
+    if created and instance.rating:
+        popularity.record(
+            instance.listing_id, settings.POPULARITY_REVIEW_WEIGHT * instance.rating / 5, instance.created_at
+        )
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_histogram(sender, instance, **kwargs):
+    from .ratings import remove_rating
+
+    remove_rating(instance.listing_id, instance.rating)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_auth_principal(sender, instance, **kwargs):
+    """
+    Drop the cached principal bearer tokens authenticate against, so a
+    password change or deactivation applies to them at once.
+
+    Done after commit: a request that missed the cache before then would
+    cache the old row again. ``queryset.update()`` on users (bulk admin
+    actions, raw SQL) sends no signal; call ``forget_principal`` after it.
+    """
+    from alx_travel_app.authentication import forget_principal
+
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_principal(user_id))
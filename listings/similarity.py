@@ -0,0 +1,311 @@
+"""
+"Similar places": nearest listings by feature vector.
+
+Each listing becomes a small float32 vector:
+
+- price (log scale), bedrooms and bathrooms, standardised with the mean and
+  standard deviation of the whole catalogue;
+- average rating, centred on 3 stars (0 for unreviewed listings);
+- property type, one-hot;
+- position as a point on the unit sphere, scaled so that
+  ``SIMILAR_LISTINGS_GEO_KM`` kilometres count as much as one standard
+  deviation of the other features. Listings without coordinates sit at the
+  origin, far from every located listing.
+
+The vectors of all listings form one matrix saved as ``.npy`` files in
+``SIMILAR_LISTINGS_DIR`` and described by ``index.json``. Web workers open
+them with ``mmap_mode='r'``, so every process on the host shares one copy in
+the page cache, and pick up a new version within
+``SIMILAR_LISTINGS_RELOAD_SECONDS`` of it being published. A top-k query is
+one matrix-vector product over the whole catalogue.
+
+``refresh`` (the ``refresh_similar_listings`` Celery task) re-encodes only the
+listings changed since the last build. Every ``SIMILAR_LISTINGS_REFIT_SECONDS``
+it rebuilds everything instead, re-fitting the scaling. New versions are
+written under new file names and published by atomically replacing
+``index.json``; readers never see a half-written matrix.
+"""
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Listing, ListingRatingStats, Review
+
+EARTH_RADIUS_KM = 6371.0
+PROPERTY_TYPES = [value for value, _ in Listing.PROPERTY_TYPES]
+# Columns of the rows returned by ``fetch``.
+ID, PRICE, BEDROOMS, BATHROOMS, PROPERTY_TYPE, LATITUDE, LONGITUDE, RATING, AVAILABLE = range(9)
+SCALED = {'price': PRICE, 'bedrooms': BEDROOMS, 'bathrooms': BATHROOMS}
+MANIFEST = 'index.json'
+
+
+@dataclass(frozen=True)
+class Index:
+    version: str
+    ids: np.ndarray  # int64, sorted
+    vectors: np.ndarray  # float32, one row per id
+    norms: np.ndarray  # float32, squared row norms
+    available: np.ndarray  # bool
+    scaling: dict
+
+
+def index_dir():
+    return Path(settings.SIMILAR_LISTINGS_DIR)
+
+
+def fetch(where='', params=()):
+    """
+    Raw features of the matching listings as a float64 array, ordered by id.
+
+    Postgres formats the whole result as one CSV text value: decoding a
+    handful of large values is far cheaper than decoding hundreds of
+    thousands of rows. Missing coordinates and ratings come back as NaN.
+    """
+    listing, stats = Listing._meta.db_table, ListingRatingStats._meta.db_table
+    stars = ' + '.join(f'r.stars_{n}' for n in range(1, 6))
+    weighted = ' + '.join(f'{n} * r.stars_{n}' for n in range(1, 6))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT string_agg(concat_ws(',',
+                l.id,
+                ln(1 + greatest(l.price, 0))::float8,
+                l.bedrooms,
+                l.bathrooms,
+                coalesce(array_position(%s::text[], l.property_type::text) - 1, -1),
+                coalesce(l.latitude::float8, 'NaN'),
+                coalesce(l.longitude::float8, 'NaN'),
+                coalesce(({weighted})::float8 / nullif({stars}, 0), 'NaN'),
+                l.is_available::int
+            ), E'\\n' ORDER BY l.id)
+            FROM {listing} AS l LEFT JOIN {stats} AS r ON r.listing_id = l.id
+            {where}
+            """,
+            [PROPERTY_TYPES, *params],
+        )
+        text = cursor.fetchone()[0]
+    if not text:
+        return np.empty((0, AVAILABLE + 1))
+    return np.loadtxt(io.StringIO(text), delimiter=',', ndmin=2)
+
+
+def fit_scaling(rows):
+    """
+    Per-feature mean and standard deviation over the whole catalogue.
+    """
+    scaling = {}
+    for name, column in SCALED.items():
+        values = rows[:, column] if len(rows) else np.zeros(1)
+        std = float(values.std())
+        scaling[name] = [float(values.mean()), std if std > 0 else 1.0]
+    scaling['geo_weight'] = EARTH_RADIUS_KM / settings.SIMILAR_LISTINGS_GEO_KM
+    return scaling
+
+
+def encode(rows, scaling):
+    """
+    The feature matrix (float32) for rows from ``fetch``.
+    """
+    vectors = np.zeros((len(rows), len(SCALED) + 1 + len(PROPERTY_TYPES) + 3), dtype=np.float32)
+    for j, (name, column) in enumerate(SCALED.items()):
+        mean, std = scaling[name]
+        vectors[:, j] = (rows[:, column] - mean) / std
+    rating = rows[:, RATING]
+    vectors[:, 3] = np.where(np.isnan(rating), 0, (rating - 3) / 2)
+    types = rows[:, PROPERTY_TYPE].astype(np.int64)
+    typed = types >= 0
+    vectors[np.flatnonzero(typed), 4 + types[typed]] = 1.0
+    lat, lon = np.radians(rows[:, LATITUDE]), np.radians(rows[:, LONGITUDE])
+    geo = scaling['geo_weight'] * np.column_stack(
+        (np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat))
+    )
+    vectors[:, -3:] = np.nan_to_num(geo, nan=0.0)
+    return vectors
+
+
+def read_manifest():
+    try:
+        with open(index_dir() / MANIFEST) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def open_index(manifest):
+    """
+    Memory-map the arrays of a published version.
+    """
+    directory = index_dir()
+    arrays = {
+        name: np.load(directory / f"{manifest['version']}.{name}.npy", mmap_mode='r')
+        for name in ('ids', 'vectors', 'norms', 'available')
+    }
+    return Index(version=manifest['version'], scaling=manifest['scaling'], **arrays)
+
+
+def publish(ids, vectors, available, scaling, built_at, fitted_at):
+    """
+    Write a new version and point ``index.json`` at it. Keeps the previous
+    version's files for workers still reading them.
+    """
+    directory = index_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    version = f"{built_at:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    arrays = {
+        'ids': np.ascontiguousarray(ids, dtype=np.int64),
+        'vectors': np.ascontiguousarray(vectors, dtype=np.float32),
+        'norms': np.einsum('ij,ij->i', vectors, vectors).astype(np.float32),
+        'available': np.ascontiguousarray(available, dtype=bool),
+    }
+    for name, array in arrays.items():
+        np.save(directory / f"{version}.{name}.npy", array)
+    previous = read_manifest()
+    manifest = {
+        'version': version,
+        'count': len(ids),
+        'built_at': built_at.isoformat(),
+        'fitted_at': fitted_at.isoformat(),
+        'scaling': scaling,
+    }
+    tmp = directory / f".{MANIFEST}.{version}"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, directory / MANIFEST)
+
+    keep = {version, previous['version'] if previous else None}
+    for path in directory.glob('*.npy'):
+        if path.name.split('.', 1)[0] not in keep:
+            path.unlink(missing_ok=True)
+    return manifest
+
+
+def rebuild():
+    """
+    Encode every listing with freshly fitted scaling.
+    """
+    built_at = timezone.now()
+    rows = fetch()
+    scaling = fit_scaling(rows)
+    return publish(
+        ids=rows[:, ID],
+        vectors=encode(rows, scaling),
+        available=rows[:, AVAILABLE] > 0,
+        scaling=scaling,
+        built_at=built_at,
+        fitted_at=built_at,
+    )
+
+
+def refresh(full=False):
+    """
+    Re-encode listings changed (or reviewed) since the last build, add new
+    ones and drop deleted ones; rebuild everything when there is no index
+    yet, when ``full`` is set, or when the scaling is older than
+    ``SIMILAR_LISTINGS_REFIT_SECONDS``. Returns the published manifest.
+    """
+    manifest = read_manifest()
+    if full or manifest is None:
+        return rebuild()
+    fitted_at = datetime.fromisoformat(manifest['fitted_at'])
+    if timezone.now() - fitted_at > timedelta(seconds=settings.SIMILAR_LISTINGS_REFIT_SECONDS):
+        return rebuild()
+
+    # Overlap the previous build a little: a listing saved while it ran may
+    # carry an updated_at from just before its built_at.
+    since = datetime.fromisoformat(manifest['built_at']) - timedelta(minutes=1)
+    built_at = timezone.now()
+    index = open_index(manifest)
+    changed = fetch(
+        f"WHERE l.updated_at >= %s OR l.id IN (SELECT listing_id FROM {Review._meta.db_table} WHERE updated_at >= %s)",
+        [since, since],
+    )
+    current_ids = np.fromiter(Listing.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+
+    ids = np.asarray(index.ids)
+    keep = np.isin(ids, current_ids, assume_unique=True)
+    ids, vectors, available = ids[keep], np.array(index.vectors[keep]), np.array(index.available[keep])
+    if len(changed):
+        changed_ids = changed[:, ID].astype(np.int64)
+        changed_vectors = encode(changed, manifest['scaling'])
+        changed_available = changed[:, AVAILABLE] > 0
+        existing = np.isin(changed_ids, ids, assume_unique=True)
+        positions = np.searchsorted(ids, changed_ids[existing])
+        vectors[positions] = changed_vectors[existing]
+        available[positions] = changed_available[existing]
+        ids = np.concatenate([ids, changed_ids[~existing]])
+        vectors = np.concatenate([vectors, changed_vectors[~existing]])
+        available = np.concatenate([available, changed_available[~existing]])
+        order = np.argsort(ids, kind='stable')
+        ids, vectors, available = ids[order], vectors[order], available[order]
+    return publish(ids, vectors, available, manifest['scaling'], built_at, fitted_at)
+
+
+_lock = threading.Lock()
+_loaded = {'index': None, 'mtime': None, 'checked': float('-inf')}
+
+
+def current_index():
+    """
+    The latest published index, memory-mapped, or None before the first
+    build. Checks for a new version at most every
+    ``SIMILAR_LISTINGS_RELOAD_SECONDS``.
+    """
+    now = time.monotonic()
+    if now - _loaded['checked'] < settings.SIMILAR_LISTINGS_RELOAD_SECONDS:
+        return _loaded['index']
+    with _lock:
+        if now - _loaded['checked'] >= settings.SIMILAR_LISTINGS_RELOAD_SECONDS:
+            try:
+                mtime = (index_dir() / MANIFEST).stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != _loaded['mtime']:
+                manifest = read_manifest() if mtime is not None else None
+                _loaded['index'] = open_index(manifest) if manifest else None
+                _loaded['mtime'] = mtime
+            _loaded['checked'] = now
+    return _loaded['index']
+
+
+def similar(listing_id, k):
+    """
+    Ids of the ``k`` available listings nearest to ``listing_id``, nearest
+    first. Returns None when there is no index yet or no such listing.
+    """
+    index = current_index()
+    if index is None:
+        return None
+    ids = index.ids
+    position = int(np.searchsorted(ids, listing_id))
+    indexed = position < len(ids) and ids[position] == listing_id
+    if indexed:
+        query = np.asarray(index.vectors[position])
+    else:
+        # Created since the last build: encode it on the fly.
+        rows = fetch("WHERE l.id = %s", [listing_id])
+        if not len(rows):
+            return None
+        query = encode(rows, index.scaling)[0]
+
+    # |a - b|^2 = |a|^2 - 2 a.b + |b|^2, with |a|^2 precomputed per row.
+    distances = index.norms - 2 * (index.vectors @ query) + query @ query
+    distances[~index.available] = np.inf
+    if indexed:
+        distances[position] = np.inf
+    k = min(k, len(ids))
+    if k <= 0:
+        return []
+    nearest = np.argpartition(distances, k - 1)[:k]
+    nearest = nearest[np.argsort(distances[nearest])]
+    return [int(ids[i]) for i in nearest if np.isfinite(distances[i])]
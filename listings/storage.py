@@ -0,0 +1,66 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+CAS_PREFIX = 'listing_images/sha256'
+
+
+def content_digest(content):
+    """
+    SHA-256 hex digest of a Django ``File``, read in chunks.
+    """
+    sha = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha.hexdigest()
+
+
+def content_addressed_name(digest, extension):
+    return f"{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+
+
+def digest_from_name(name):
+    """
+    Return the SHA-256 digest encoded in a content-addressed name, else ``None``.
+    """
+    if not name or not name.startswith(CAS_PREFIX + '/'):
+        return None
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files by the SHA-256 of their content.
+
+    Whatever name an upload arrives with, it is stored at
+    ``listing_images/sha256/ab/cd/<digest>.<ext>``. Uploading bytes that are
+    already stored writes nothing and returns the existing name, so every
+    ``ListingImage`` showing the same photo points at one file. Reference
+    counts for those shared files live on ``ImageBlob``.
+    """
+
+    def _save(self, name, content):
+        extension = posixpath.splitext(name)[1]
+        cas_name = content_addressed_name(content_digest(content), extension)
+        if self.exists(cas_name):
+            return cas_name
+
+        # Write under a unique temporary name, then atomically move it into
+        # place: concurrent uploads of the same bytes can both land safely.
+        tmp_name = super()._save(f"{posixpath.dirname(cas_name)}/.tmp-{uuid.uuid4().hex}", content)
+        os.replace(self.path(tmp_name), self.path(cas_name))
+        return cas_name
+
+
+def listing_image_storage():
+    return ContentAddressedStorage()
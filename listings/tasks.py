@@ -3,10 +3,15 @@ from django.core.mail import send_mail
 from django.conf import settings
 from .models import Payment
 
-@shared_task
-def send_payment_confirmation_email(to_email, booking_id, amount, tx_ref):
+@shared_task(bind=True, ignore_result=True, acks_late=True, max_retries=8)
+def send_payment_confirmation_email(self, to_email, booking_id, amount, tx_ref):
     """
     Send payment confirmation email to the guest.
+
+    Published through the outbox, so a redelivered message (same task id)
+    is skipped once the email has gone out. A failed send is retried with
+    exponential backoff (about four hours in all) and the message stays
+    unprocessed until one succeeds.
     
     Args:
         to_email (str): Email address of the recipient
@@ -14,6 +19,11 @@ def send_payment_confirmation_email(to_email, booking_id, amount, tx_ref):
         amount (str): Payment amount
         tx_ref (str): Transaction reference
     """
+    from .outbox import already_processed, mark_processed
+
+    if already_processed(self.request.id):
+        return f"Payment confirmation for {tx_ref} already sent"
+
     subject = f"Payment Confirmation - Booking #{booking_id}"
     
     message = f"""
@@ -61,11 +71,12 @@ def send_payment_confirmation_email(to_email, booking_id, amount, tx_ref):
             html_message=html_message,
             fail_silently=False,
         )
-        return f"Email sent successfully to {to_email}"
     except Exception as e:
-        return f"Failed to send email: {str(e)}"
+        raise self.retry(exc=e, countdown=60 * 2 ** self.request.retries)
+    mark_processed(self.request.id)
+    return f"Email sent successfully to {to_email}"
 
-@shared_task
+@shared_task(ignore_result=True)
 def send_booking_confirmation_email(to_email, booking_id, listing_title, start_date, end_date):
     """
     Send booking confirmation email to the guest.
@@ -127,3 +138,144 @@ def send_booking_confirmation_email(to_email, booking_id, listing_title, start_d
         return f"Booking confirmation email sent to {to_email}"
     except Exception as e:
         return f"Failed to send booking confirmation: {str(e)}"
+
+@shared_task(ignore_result=True, acks_late=True)
+def import_listings(job_id):
+    """
+    Run or resume a listing import job from its last checkpoint.
+    
+    Args:
+        job_id (int): ListingImportJob ID
+    """
+    from .importers import run_import_job
+    from .models import ListingImportJob
+
+    job = ListingImportJob.objects.get(pk=job_id)
+    if job.status == ListingImportJob.STATUS_COMPLETED:
+        return f"Import {job_id} already completed"
+    run_import_job(job)
+    return f"Import {job_id} completed: {job.rows_imported} imported, {job.rows_failed} failed"
+
+@shared_task(ignore_result=True, acks_late=True)
+def generate_listing_image_variants(image_id):
+    """
+    Generate resized WebP/JPEG variants for an uploaded listing image.
+    
+    Args:
+        image_id (int): ListingImage ID
+    """
+    from .images import generate_variants
+
+    variants = generate_variants(image_id)
+    if variants is None:
+        return f"ListingImage {image_id} not found"
+    return f"Generated variants for ListingImage {image_id}"
+
+@shared_task(ignore_result=True, acks_late=True)
+def refresh_listing_rollups(listing_id, start_date, end_date):
+    """
+    Recompute host analytics rollups for a listing over a date range.
+    
+    Args:
+        listing_id (int): Listing ID
+        start_date (str): First night, ISO format
+        end_date (str): Last night, ISO format
+    """
+    from datetime import date
+    from .rollups import refresh_listing_stats
+
+    rows = refresh_listing_stats(listing_id, date.fromisoformat(start_date), date.fromisoformat(end_date))
+    return f"Refreshed {rows} rollup rows for listing {listing_id}"
+
+@shared_task(ignore_result=True, acks_late=True)
+def refresh_booking_rollups(booking_id):
+    """
+    Recompute host analytics rollups for the nights of one booking.
+    
+    Args:
+        booking_id (int): Booking ID
+    """
+    from .rollups import refresh_booking_stats
+
+    rows = refresh_booking_stats(booking_id)
+    return f"Refreshed {rows} rollup rows for booking {booking_id}"
+
+@shared_task(ignore_result=True, acks_late=True)
+def purge_expired_idempotency_keys():
+    """
+    Delete Idempotency-Key records past their TTL. Scheduled by Celery beat.
+    """
+    from .idempotency import purge_expired
+
+    deleted = purge_expired()
+    return f"Purged {deleted} expired idempotency keys"
+
+
+@shared_task(ignore_result=True, acks_late=True)
+def prune_change_log(batch_size=5000):
+    """
+    Delete change feed entries older than CHANGE_LOG_RETENTION_DAYS, in
+    batches, moving the ``ChangeLogWatermark`` past each batch. Scheduled by
+    Celery beat.
+    """
+    from datetime import timedelta
+
+    from django.conf import settings
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import ChangeLogEntry, ChangeLogWatermark
+
+    cutoff = timezone.now() - timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+    total = 0
+    while True:
+        rows = list(ChangeLogEntry.objects.filter(changed_at__lt=cutoff).values_list('txid', 'id')[:batch_size])
+        if not rows:
+            return f"Pruned {total} change log entries"
+        with transaction.atomic():
+            watermark, _ = ChangeLogWatermark.objects.select_for_update().get_or_create(pk=1)
+            position = max(rows + [(watermark.txid, watermark.entry_id)])
+            watermark.txid, watermark.entry_id = position
+            watermark.save()
+            deleted, _ = ChangeLogEntry.objects.filter(id__in=[pk for _, pk in rows]).delete()
+        total += deleted
+
+
+@shared_task(ignore_result=True, acks_late=True)
+def refresh_similar_listings(full=False):
+    """
+    Bring the similar-listings vector index up to date. Scheduled by Celery beat.
+
+    Args:
+        full (bool): Re-encode every listing and re-fit the feature scaling
+    """
+    from .similarity import refresh
+
+    manifest = refresh(full=full)
+    return f"Published similar-listings index {manifest['version']} with {manifest['count']} listings"
+
+
+@shared_task(ignore_result=True, acks_late=True)
+def recompute_popularity():
+    """
+    Rebuild every listing's popularity score from its bookings and reviews.
+    Scheduled by Celery beat.
+    """
+    from .popularity import recompute
+
+    updated = recompute()
+    return f"Recomputed popularity for {updated} listings"
+
+
+@shared_task(ignore_result=True, acks_late=True)
+def maintain_partitions():
+    """
+    Create the booking and payment partitions for the months ahead and move
+    stray rows out of the default partitions. Scheduled by Celery beat.
+    """
+    from .partitions import maintain
+
+    report = maintain()
+    return "; ".join(
+        f"{label}: created {created} partitions, moved {moved} rows" for label, (created, moved) in report.items()
+    )
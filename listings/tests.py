@@ -1,3 +1,314 @@
-from django.test import TestCase
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from alx_travel_app.db_routing import PIN_COOKIE
+
+from . import partitions, payments
+from .idempotency import REPLAYED_HEADER, claim
+from .models import Booking, IdempotencyKey, Listing, OutboxMessage, Payment, PaymentRef
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "Set DB_REPLICA_URLS to run the replica routing tests.")
+class ReplicaRoutingTests(TestCase):
+    """
+    Each test replica is its own empty database that the primary never
+    replicates to, which simulates a replica lagging indefinitely behind.
+    """
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.host = User.objects.create_user(username='host', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def create_listing(self):
+        response = self.client.post('/api/listings/', {
+            'title': 'Loft', 'description': 'Bright', 'price': '80.00', 'property_type': 'apartment',
+            'bedrooms': 1, 'bathrooms': 1, 'location': 'Addis Ababa', 'host': self.host.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_write_pins_client_to_primary(self):
+        listing_id = self.create_listing()
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+
+        response = self.client.get(f'/api/listings/{listing_id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unpinned_reads_go_to_lagging_replica(self):
+        listing_id = self.create_listing()
+
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get(f'/api/listings/{listing_id}/').status_code, 404)
+        self.assertEqual(anonymous.get('/api/listings/').data, [])
+
+    def test_user_stays_pinned_without_cookie(self):
+        listing_id = self.create_listing()
+
+        other_device = APIClient()
+        other_device.force_authenticate(self.host)
+        self.assertEqual(other_device.get(f'/api/listings/{listing_id}/').status_code, 200)
+
+    def test_reads_return_to_replica_when_pin_expires(self):
+        listing_id = self.create_listing()
+        self.client.cookies.pop(PIN_COOKIE)
+        cache.clear()
+
+        self.assertEqual(self.client.get(f'/api/listings/{listing_id}/').status_code, 404)
+
+    def test_unsafe_actions_always_use_primary(self):
+        listing_id = self.create_listing()
+        self.client.cookies.pop(PIN_COOKIE)
+        cache.clear()
+
+        response = self.client.patch(f'/api/listings/{listing_id}/', {'price': '90.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class PaymentTransitionConcurrencyTests(TransactionTestCase):
+    """
+    Many threads report on one tx_ref at once, each on its own connection,
+    the way verify, the webhook and the callback page race in production.
+    """
+    THREADS = 16
+
+    def setUp(self):
+        if connection.pool:
+            # One connection per thread, or the threads would just take turns.
+            connection.pool.resize(min_size=1, max_size=self.THREADS + 1)
+        host = User.objects.create_user(username='host')
+        guest = User.objects.create_user(username='guest', email='guest@example.com')
+        listing = Listing.objects.create(
+            title='Loft', description='Bright', price='80.00', property_type='apartment',
+            bedrooms=1, bathrooms=1, location='Addis Ababa', host=host,
+        )
+        booking = Booking.objects.create(
+            listing=listing, guest=guest, guests=1, start_date=date(2030, 1, 1), end_date=date(2030, 1, 3),
+            total_price='160.00',
+        )
+        self.payment = Payment.objects.create(booking=booking, amount='160.00', tx_ref='race-1')
+
+    def tearDown(self):
+        if connection.pool:
+            size = settings.DATABASES['default']['OPTIONS']['pool']
+            connection.pool.resize(min_size=size['min_size'], max_size=size['max_size'])
+
+    def hammer(self, calls):
+        barrier = threading.Barrier(len(calls))
+        results, errors = [], []
+
+        def run(call):
+            try:
+                barrier.wait()
+                results.append(call(self.payment.tx_ref))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(call,)) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_completions_transition_once(self):
+        results = self.hammer([payments.complete] * self.THREADS)
+
+        self.assertEqual(sum(result.transitioned for result in results), 1)
+        self.assertTrue(all(result.status == Payment.STATUS_COMPLETED for result in results))
+        self.assertEqual(OutboxMessage.objects.filter(idempotency_key='payment-confirmation:race-1').count(), 1)
+
+    def test_failure_never_overrides_completion(self):
+        results = self.hammer([payments.complete, payments.fail] * (self.THREADS // 2))
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_COMPLETED)
+        completed = [r for r in results if r.transitioned and r.status == Payment.STATUS_COMPLETED]
+        failed = [r for r in results if r.transitioned and r.status == Payment.STATUS_FAILED]
+        self.assertEqual(len(completed), 1)
+        self.assertLessEqual(len(failed), 1)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_unknown_tx_ref(self):
+        self.assertIsNone(payments.complete('missing'))
+        self.assertIsNone(payments.fail('missing'))
+
+
+
+@override_settings(CHAPA_SECRET_KEY='')
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        host = User.objects.create_user(username='host')
+        self.guest = User.objects.create_user(username='guest', email='guest@example.com')
+        self.listing = Listing.objects.create(
+            title='Loft', description='Bright', price='80.00', property_type='apartment',
+            bedrooms=1, bathrooms=1, location='Addis Ababa', host=host,
+        )
+        self.client = APIClient()
+
+    def book(self, key, guests=1):
+        return self.client.post('/api/bookings/', {
+            'listing': self.listing.pk, 'guest': self.guest.pk, 'guests': guests,
+            'start_date': '2030-01-01', 'end_date': '2030-01-03', 'total_price': '160.00',
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_stored_response(self):
+        first = self.book('key-1')
+        second = self.book('key-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second[REPLAYED_HEADER], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_key_reused_with_different_body(self):
+        self.assertEqual(self.book('key-1').status_code, 201)
+
+        response = self.book('key-1', guests=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_key_in_progress(self):
+        self.assertEqual(self.book('key-1').status_code, 201)
+        # As if the first request were still running.
+        IdempotencyKey.objects.update(response_status=None, response_body=None)
+
+        response = self.book('key-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_abandoned_claim_is_taken_over(self):
+        self.assertIsNotNone(claim('anon POST /api/bookings/', 'key-1', 'stale'))
+
+        with override_settings(IDEMPOTENCY_LEASE_SECONDS=0):
+            response = self.book('key-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().response_status, 201)
+
+    def test_server_error_releases_key(self):
+        booking = Booking.objects.create(
+            listing=self.listing, guest=self.guest, guests=1, start_date=date(2030, 1, 1),
+            end_date=date(2030, 1, 3), total_price='160.00',
+        )
+        body = {'booking_id': booking.pk, 'amount': '160.00', 'email': 'guest@example.com'}
+
+        first = self.client.post('/api/payments/initiate/', body, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(first.status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        retry = self.client.post('/api/payments/initiate/', body, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(retry.status_code, 500)
+        self.assertNotIn(REPLAYED_HEADER, retry)
+
+
+class PartitionTests(TransactionTestCase):
+    """
+    Runs the partition maintenance against real partitions, in months long
+    before any the application creates; each test drops the ones it made.
+    """
+    MONTH = date(1991, 3, 1)
+
+    def setUp(self):
+        host = User.objects.create_user(username='host')
+        self.guest = User.objects.create_user(username='guest')
+        self.listing = Listing.objects.create(
+            title='Loft', description='Bright', price='80.00', property_type='apartment',
+            bedrooms=1, bathrooms=1, location='Addis Ababa', host=host,
+        )
+        self.booking = self.book(partitions.current_month())
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            for table in ('listings_booking', 'listings_payment'):
+                cursor.execute(
+                    "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE %s", [f"{table}\\_p19%"]
+                )
+                for (name,) in cursor.fetchall():
+                    cursor.execute(f"DROP TABLE {name}")
+
+    def book(self, start_date):
+        return Booking.objects.create(
+            listing=self.listing, guest=self.guest, guests=1, start_date=start_date,
+            end_date=start_date + timedelta(days=2), total_price='160.00',
+        )
+
+    def pay(self, tx_ref, created_at=None):
+        payment = Payment.objects.create(booking=self.booking, amount='160.00', tx_ref=tx_ref)
+        if created_at is not None:
+            Payment.objects.filter(pk=payment.pk).update(created_at=created_at)
+        return payment
+
+    def count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            return cursor.fetchone()[0]
+
+    def test_maintain_moves_rows_out_of_default_partition(self):
+        booking = self.book(date(1990, 5, 10))
+        self.assertEqual(self.count('listings_booking_default'), 1)
+
+        report = partitions.maintain(months_ahead=0)
+
+        self.assertEqual(report['booking'], (1, 1))
+        self.assertEqual(self.count('listings_booking_default'), 0)
+        self.assertEqual(self.count('listings_booking_p1990_05'), 1)
+        self.assertTrue(Booking.objects.filter(pk=booking.pk).exists())
+
+    def test_archive_restore_archive_again(self):
+        with connection.cursor() as cursor:
+            partitions.create_partition(cursor, 'listings_payment', 'created_at', self.MONTH)
+        for n in range(3):
+            self.pay(f'old-{n}', datetime(1991, 3, 10 + n, tzinfo=timezone.utc))
+        before = partitions.add_months(self.MONTH, 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            archived = list(partitions.archive('payment', before=before, directory=directory))
+            self.assertEqual([(name, rows) for name, rows, path in archived], [('listings_payment_p1991_03', 3)])
+            self.assertEqual(Payment.objects.count(), 0)
+            self.assertEqual(PaymentRef.objects.count(), 3)
+
+            path = archived[0][2]
+            self.assertEqual(partitions.restore(path), ('listings_payment_p1991_03', 3))
+            self.assertEqual(Payment.objects.count(), 3)
+            self.assertFalse(path.exists())
+            self.assertTrue(Path(f'{path}{partitions.RESTORED_SUFFIX}').exists())
+
+            archived = list(partitions.archive('payment', before=before, directory=directory))
+            self.assertEqual([(name, rows) for name, rows, path in archived], [('listings_payment_p1991_03', 3)])
+            self.assertEqual(Payment.objects.count(), 0)
+
+    def test_duplicate_tx_ref_across_partitions(self):
+        self.pay('dup-1')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.pay('dup-1', datetime(1991, 3, 10, tzinfo=timezone.utc))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(booking=self.booking, amount='160.00', tx_ref='dup-1')
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_created_at_update_keeps_tx_ref(self):
+        payment = self.pay('move-1')
+
+        Payment.objects.filter(pk=payment.pk).update(created_at=datetime(1991, 3, 10, tzinfo=timezone.utc))
+
+        self.assertEqual(self.count('listings_payment_default'), 1)
+        self.assertEqual(PaymentRef.objects.get(tx_ref='move-1').payment_id, payment.pk)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(booking=self.booking, amount='160.00', tx_ref='move-1')
@@ -3,20 +3,32 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet,
     ListingViewSet,
+    ListingImageViewSet,
+    ListingImportJobViewSet,
     BookingViewSet,
+    HostAnalyticsView,
+    HostCalendarView,
     InitiatePaymentView,
     VerifyPaymentView,
     ChapaWebhookView,
     PaymentCallbackView,
+    ChangeFeedView,
+    AuthTokenView,
 )
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'listings', ListingViewSet, basename='listing')
+router.register(r'listing-images', ListingImageViewSet, basename='listing-image')
+router.register(r'listing-imports', ListingImportJobViewSet, basename='listing-import')
 router.register(r'bookings', BookingViewSet, basename='booking')
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('api/auth/token/', AuthTokenView.as_view(), name='auth-token'),
+    path('api/changes/', ChangeFeedView.as_view(), name='change-feed'),
+    path('api/host/analytics/', HostAnalyticsView.as_view(), name='host-analytics'),
+    path('api/host/calendar/', HostCalendarView.as_view(), name='host-calendar'),
     path('api/payments/initiate/', InitiatePaymentView.as_view(), name='payment-initiate'),
     path('api/payments/verify/', VerifyPaymentView.as_view(), name='payment-verify'),
     path('api/payments/chapa/webhook/', ChapaWebhookView.as_view(), name='payment-chapa-webhook'),
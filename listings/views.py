@@ -1,27 +1,49 @@
 from django.shortcuts import render
-from rest_framework import viewsets, permissions
+from rest_framework import generics, viewsets, permissions, mixins
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status as drf_status
+from rest_framework.exceptions import ValidationError
 from django.conf import settings
 from django.views.generic import TemplateView
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-import requests
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import TruncMonth
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 import uuid
 
-from .models import Listing, Booking, Payment
-from .serializers import ListingSerializer, BookingSerializer, UserSerializer, UserCreateUpdateSerializer
+from .models import (
+    Listing, Booking, Payment, ListingImage, ListingImportJob, Review, ListingDailyStat, ChangeLogEntry,
+)
+from .serializers import (
+    ListingSerializer,
+    ListingCardSerializer,
+    ListingImageSerializer,
+    BookingSerializer,
+    UserSerializer,
+    UserCreateUpdateSerializer,
+    ListingImportJobSerializer,
+    ReviewSerializer,
+    ChangeLogEntrySerializer,
+    TokenRequestSerializer,
+)
+from . import availability, chapa, payments
+from .idempotency import idempotent
+from .importers import detect_format
+from .pagination import ChangeFeedPagination, KeysetPagination, NoCountPagination
+from .rollups import add_months, month_bounds, parse_month
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-
-# Try to import a Celery task for sending confirmation emails if available
-try:
-    from .tasks import send_payment_confirmation_email  # define in your app if not present
-except Exception:
-    send_payment_confirmation_email = None
+from alx_travel_app import authentication
+from alx_travel_app.db_routing import ReplicaReadMixin
 
 # Create your views here.
 
@@ -117,16 +139,245 @@ class UserViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class ListingViewSet(viewsets.ModelViewSet):
+RATING_STATS_FIELDS = [f'rating_stats__stars_{stars}' for stars in range(1, 6)]
+
+
+def rating_summary(row):
+    """
+    Average, count and histogram from a row carrying ``RATING_STATS_FIELDS``.
+    """
+    histogram = {str(stars): row[f'rating_stats__stars_{stars}'] or 0 for stars in range(1, 6)}
+    count = sum(histogram.values())
+    average = sum(int(stars) * n for stars, n in histogram.items()) / count if count else 0
+    return {"average_rating": round(average, 2), "review_count": count, "histogram": histogram}
+
+
+class ListingViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
     permission_classes = [permissions.AllowAny]  # adjust as needed
+    replica_actions = ('list', 'retrieve', 'cards', 'reviews', 'similar')
+    # ?ordering= values for list and cards, each backed by an index.
+    orderings = {
+        'popularity': ('popularity_score', 'id'),
+        '-popularity': ('-popularity_score', '-id'),
+    }
+
+    def get_queryset(self):
+        return self.ordered(super().get_queryset())
+
+    def ordered(self, queryset):
+        request = getattr(self, 'request', None)
+        ordering = self.orderings.get(request.query_params.get('ordering', '')) if request else None
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    def get_card_queryset(self):
+        """
+        Listings annotated with everything a result card needs.
+
+        The primary image comes from the partial unique index on
+        ``ListingImage(listing) WHERE is_primary`` and ratings from a join to
+        the precomputed star histogram, so the whole page is a single SELECT.
+        """
+        primary = ListingImage.objects.filter(listing=OuterRef('pk'), is_primary=True)
+        return (
+            Listing.objects.annotate(
+                primary_image=Subquery(primary.values('image')[:1]),
+                primary_variants=Subquery(primary.values('variants')[:1]),
+            )
+            .values(
+                'id', 'title', 'price', 'location', 'primary_image', 'primary_variants',
+                *RATING_STATS_FIELDS,
+            )
+        )
+
+    @swagger_auto_schema(
+        operation_description="Listing cards for search result grids: title, price, location, primary "
+                              "image thumbnail, average rating and review count in one query per page.",
+        manual_parameters=[
+            openapi.Parameter(name="ordering", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=["-popularity", "popularity"],
+                              description="`-popularity` for most popular first (default: newest first)"),
+        ],
+        responses={200: ListingCardSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], pagination_class=NoCountPagination)
+    def cards(self, request):
+        page = self.paginate_queryset(self.ordered(self.get_card_queryset()))
+        serializer = ListingCardSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Reviews of a listing, newest first, with the listing's 1-5 star histogram. "
+                              "Keyset-paginated: follow `next` (a `cursor` URL) for older reviews.",
+        responses={200: ReviewSerializer(many=True)}
+    )
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Review a listing as the authenticated user (one review per user per listing).",
+        request_body=ReviewSerializer,
+        responses={201: ReviewSerializer, 400: "Invalid rating or listing already reviewed"}
+    )
+    @action(
+        detail=True,
+        methods=['get', 'post'],
+        permission_classes=[permissions.IsAuthenticatedOrReadOnly],
+        pagination_class=KeysetPagination,
+    )
+    def reviews(self, request, pk=None):
+        if request.method == 'POST':
+            listing = get_object_or_404(Listing.objects.only('id'), pk=pk)
+            serializer = ReviewSerializer(data=request.data, context=self.get_serializer_context())
+            serializer.is_valid(raise_exception=True)
+            try:
+                with transaction.atomic():
+                    serializer.save(listing=listing, user=request.user)
+            except IntegrityError:
+                return Response({"detail": "You have already reviewed this listing."}, status=drf_status.HTTP_400_BAD_REQUEST)
+            return Response(serializer.data, status=drf_status.HTTP_201_CREATED)
+
+        stats = get_object_or_404(Listing.objects.values('id', *RATING_STATS_FIELDS), pk=pk)
+        page = self.paginate_queryset(Review.objects.filter(listing_id=pk).select_related('user'))
+        serializer = ReviewSerializer(page, many=True, context=self.get_serializer_context())
+        response = self.get_paginated_response(serializer.data)
+        response.data['rating'] = rating_summary(stats)
+        return response
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Listing cards for the available listings most like this one (price, bedrooms, "
+                              "bathrooms, property type, location and rating), nearest first. Served from an "
+                              "in-memory vector index refreshed every few minutes.",
+        manual_parameters=[
+            openapi.Parameter(name="limit", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of listings (default 12, max 50)"),
+        ],
+        responses={200: ListingCardSerializer(many=True), 503: "Index not built yet"},
+    )
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        # numpy is the heaviest import in the app; load it on first use.
+        from . import similarity
+
+        try:
+            listing_id = int(pk)
+        except ValueError:
+            return Response({"detail": "Not found."}, status=drf_status.HTTP_404_NOT_FOUND)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 12)), 1), 50)
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=drf_status.HTTP_400_BAD_REQUEST)
+        ids = similarity.similar(listing_id, limit)
+        if ids is None:
+            if not Listing.objects.filter(pk=listing_id).exists():
+                return Response({"detail": "Not found."}, status=drf_status.HTTP_404_NOT_FOUND)
+            return Response({"detail": "Similar listings are not available yet."},
+                            status=drf_status.HTTP_503_SERVICE_UNAVAILABLE)
+        cards = {card['id']: card for card in self.get_card_queryset().filter(id__in=ids)}
+        serializer = ListingCardSerializer(
+            [cards[i] for i in ids if i in cards], many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Booked and free nights of a listing as a base64 bitmap: bit i (most significant "
+                              "bit first) is set when night `from + i` is taken. Defaults to a year from today.",
+        manual_parameters=[
+            openapi.Parameter(name="from", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="First night, YYYY-MM-DD (default: today)"),
+            openapi.Parameter(name="to", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Last night, YYYY-MM-DD (default: 364 days after `from`)"),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Availability bitmap",
+                examples={"application/json": {"listing": 7, "from": "2026-01-01", "to": "2026-01-10",
+                                               "nights": 10, "bitmap": "MMA="}},
+            ),
+            400: openapi.Response(description="Invalid range"),
+        },
+    )
+    @action(detail=True, methods=['get'])
+    def calendar(self, request, pk=None):
+        try:
+            start, end = availability.parse_range(request.query_params, timezone.localdate())
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=drf_status.HTTP_400_BAD_REQUEST)
+        listing = get_object_or_404(Listing.objects.only('id'), pk=pk)
+        bitmap = availability.calendars([listing.pk], start, end)[listing.pk]
+        return Response({
+            "listing": listing.pk,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "nights": availability.night_count(start, end),
+            "bitmap": bitmap,
+        })
+
+class ListingImageViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    """
+    Listing images. Uploads are resized to WebP/JPEG variants in the background.
+
+    Filter by listing with ``?listing=<id>``.
+    """
+    serializer_class = ListingImageSerializer
+    permission_classes = [permissions.AllowAny]  # adjust as needed
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def get_queryset(self):
+        queryset = ListingImage.objects.all().order_by('id')
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset  # schema generation has no request
+        listing_id = self.request.query_params.get('listing')
+        if listing_id:
+            try:
+                queryset = queryset.filter(listing_id=int(listing_id))
+            except ValueError:
+                raise ValidationError({"listing": ["A listing id must be an integer."]})
+        return queryset
+
+
+class ListingImportJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Bulk listing imports.
+
+    Upload a CSV or JSONL file of listings; it is imported in the background,
+    upserting on ``external_id``. Poll the job for progress and per-row errors.
+    """
+    serializer_class = ListingImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ListingImportJob.objects.none()  # schema generation has no request
+        return ListingImportJob.objects.filter(host=self.request.user)
+
+    @swagger_auto_schema(
+        operation_description="Upload a CSV or JSONL listings file for background import",
+        responses={202: ListingImportJobSerializer}
+    )
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = drf_status.HTTP_202_ACCEPTED
+        return response
 
-class BookingViewSet(viewsets.ModelViewSet):
+    def perform_create(self, serializer):
+        from .tasks import import_listings
+
+        source = serializer.validated_data['source']
+        fmt = serializer.validated_data.get('format') or detect_format(source.name)
+        job = serializer.save(host=self.request.user, format=fmt)
+        transaction.on_commit(lambda: import_listings.delay(job.id))
+
+
+class BookingViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [permissions.AllowAny]  # adjust as needed
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         # Create the booking first
         response = super().create(request, *args, **kwargs)
@@ -166,18 +417,21 @@ class BookingViewSet(viewsets.ModelViewSet):
                 "description": f"Payment for booking id {booking_id}",
             },
         }
-        headers = {
-            "Authorization": f"Bearer {getattr(settings, 'CHAPA_SECRET_KEY', '')}",
-            "Content-Type": "application/json",
-        }
-        if not headers["Authorization"].strip():
+        if not chapa.is_configured():
             response.data["payment_initiation"] = {"status": "failed", "detail": "Chapa secret key not configured."}
             return response
 
         try:
-            chapa_resp = requests.post("https://api.chapa.co/v1/transaction/initialize", json=payload, headers=headers, timeout=20)
-            data = chapa_resp.json() if chapa_resp.headers.get("Content-Type", "").startswith("application/json") else {"status": "failed"}
-        except requests.RequestException as e:
+            data = chapa.initialize_transaction(payload)
+        except chapa.GatewayUnavailable as e:
+            # Keep the booking; the client starts payment later via /api/payments/initiate/.
+            response.data["payment_initiation"] = {
+                "status": "deferred",
+                "detail": "Payment gateway temporarily unavailable; initiate payment later.",
+                "retry_after": e.retry_after,
+            }
+            return response
+        except chapa.ChapaError as e:
             response.data["payment_initiation"] = {"status": "failed", "detail": f"Payment initialization failed: {e}"}
             return response
 
@@ -210,6 +464,188 @@ class BookingViewSet(viewsets.ModelViewSet):
         }
         return response
 
+class HostAnalyticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Host analytics",
+        operation_description="Booked nights, revenue and occupancy rate per listing per month for the "
+                              "authenticated host. Served from daily rollups, never from raw bookings.",
+        manual_parameters=[
+            openapi.Parameter(name="from", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="First month, YYYY-MM (default: 11 months before `to`)"),
+            openapi.Parameter(name="to", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Last month, YYYY-MM (default: current month)"),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Monthly rollups",
+                examples={
+                    "application/json": {
+                        "from": "2026-01",
+                        "to": "2026-03",
+                        "results": [
+                            {"listing": 7, "title": "Beachfront Bungalow", "month": "2026-01",
+                             "booked_nights": 12, "revenue": "1800.00", "occupancy_rate": 0.3871},
+                        ],
+                    }
+                },
+            ),
+            400: openapi.Response(description="Invalid month"),
+        },
+        tags=["Analytics"],
+    )
+    def get(self, request):
+        try:
+            last = parse_month(request.query_params["to"]) if request.query_params.get("to") else timezone.now().date().replace(day=1)
+            first = parse_month(request.query_params["from"]) if request.query_params.get("from") else add_months(last, -11)
+        except ValueError:
+            return Response({"detail": "from/to must be months formatted as YYYY-MM."}, status=drf_status.HTTP_400_BAD_REQUEST)
+        if first > last:
+            return Response({"detail": "from must not be after to."}, status=drf_status.HTTP_400_BAD_REQUEST)
+
+        rows = (
+            ListingDailyStat.objects.filter(host=request.user, date__range=(first, month_bounds(last)[1]))
+            .annotate(month=TruncMonth('date'))
+            .values('listing_id', 'listing__title', 'month')
+            .annotate(booked_nights=Sum('booked_nights'), revenue=Sum('revenue'))
+            .order_by('month', 'listing_id')
+        )
+        results = []
+        for row in rows:
+            month_start, month_end = month_bounds(row['month'])
+            days = (month_end - month_start).days + 1
+            results.append({
+                "listing": row['listing_id'],
+                "title": row['listing__title'],
+                "month": row['month'].strftime("%Y-%m"),
+                "booked_nights": row['booked_nights'],
+                "revenue": str(row['revenue']),
+                "occupancy_rate": round(min(row['booked_nights'] / days, 1), 4),
+            })
+        return Response({"from": first.strftime("%Y-%m"), "to": last.strftime("%Y-%m"), "results": results})
+
+
+class HostCalendarView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Host availability calendars",
+        operation_description="Availability bitmaps (see `/api/listings/{id}/calendar/`) for every listing of the "
+                              "authenticated host in one call.",
+        manual_parameters=[
+            openapi.Parameter(name="from", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="First night, YYYY-MM-DD (default: today)"),
+            openapi.Parameter(name="to", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Last night, YYYY-MM-DD (default: 364 days after `from`)"),
+        ],
+        responses={
+            200: openapi.Response(
+                description="One bitmap per listing",
+                examples={"application/json": {"from": "2026-01-01", "to": "2026-01-10", "nights": 10,
+                                               "results": [{"listing": 7, "bitmap": "MMA="}]}},
+            ),
+            400: openapi.Response(description="Invalid range"),
+        },
+        tags=["Analytics"],
+    )
+    def get(self, request):
+        try:
+            start, end = availability.parse_range(request.query_params, timezone.localdate())
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=drf_status.HTTP_400_BAD_REQUEST)
+        listing_ids = list(Listing.objects.filter(host=request.user).order_by('id').values_list('id', flat=True))
+        bitmaps = availability.calendars(listing_ids, start, end) if listing_ids else {}
+        return Response({
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "nights": availability.night_count(start, end),
+            "results": [{"listing": listing_id, "bitmap": bitmaps[listing_id]} for listing_id in listing_ids],
+        })
+
+class AuthTokenView(APIView):
+    """
+    Exchange a username and password for a signed bearer token.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(
+        operation_summary="Get an API token",
+        operation_description="Returns a bearer token for `Authorization: Bearer <token>`. It expires after "
+                              "`expires_in` seconds and is revoked when the user's password changes.",
+        request_body=TokenRequestSerializer,
+        responses={
+            200: openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+                "token": openapi.Schema(type=openapi.TYPE_STRING),
+                "token_type": openapi.Schema(type=openapi.TYPE_STRING, example="Bearer"),
+                "expires_in": openapi.Schema(type=openapi.TYPE_INTEGER),
+            }),
+            400: openapi.Response(description="Invalid credentials"),
+        },
+        security=[],
+        tags=["Auth"],
+    )
+    def post(self, request):
+        serializer = TokenRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = authenticate(request, **serializer.validated_data)
+        if user is None:
+            return Response({"detail": "Invalid username or password."}, status=drf_status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "token": authentication.make_token(user),
+            "token_type": authentication.KEYWORD,
+            "expires_in": settings.API_TOKEN_MAX_AGE,
+        })
+
+
+class ChangeFeedView(generics.ListAPIView):
+    """
+    Created, updated and deleted listing, booking and payment ids, oldest
+    first, for incremental sync. Deletes appear as tombstones
+    (``action: deleted``). Staff see every model; other users only listings.
+    """
+    serializer_class = ChangeLogEntrySerializer
+    pagination_class = ChangeFeedPagination
+    permission_classes = [permissions.IsAuthenticated]
+    models = ('listing', 'booking', 'payment')
+
+    def get_queryset(self):
+        allowed = self.models if self.request.user.is_staff else ('listing',)
+        requested = self.request.query_params.get('models')
+        if requested:
+            allowed = [name for name in requested.split(',') if name in allowed]
+        return ChangeLogEntry.objects.filter(model__in=allowed)
+
+    @swagger_auto_schema(
+        operation_summary="Change feed",
+        operation_description="Ids of created, updated and deleted records since a cursor, in commit order. "
+                              "Start with `since=now` after a full pull (or omit it to read the whole retained "
+                              "log), then pass back the returned `cursor` until `has_more` is false. A cursor "
+                              "older than the log retention gets 410: resync from the list endpoints.",
+        manual_parameters=[
+            openapi.Parameter(name="since", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Cursor from the previous response, or `now`"),
+            openapi.Parameter(name="models", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Comma-separated subset of listing,booking,payment"),
+            openapi.Parameter(name="page_size", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Entries per page (default 500, max 5000)"),
+        ],
+        responses={410: openapi.Response(description="Cursor expired")},
+        tags=["Sync"],
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+def gateway_unavailable_response(exc):
+    return Response(
+        {"detail": "Payment gateway temporarily unavailable. Please retry later.", "retry_after": exc.retry_after},
+        status=drf_status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 class InitiatePaymentView(APIView):
     permission_classes = [permissions.AllowAny]  # adjust as needed
 
@@ -242,6 +678,15 @@ class InitiatePaymentView(APIView):
                 "callback_url": "https://yourapp.com/api/payments/chapa/callback",
             },
         ),
+        manual_parameters=[
+            openapi.Parameter(
+                name="Idempotency-Key",
+                in_=openapi.IN_HEADER,
+                required=False,
+                type=openapi.TYPE_STRING,
+                description="Client-generated key; retries with the same key return the original response",
+            )
+        ],
         responses={
             200: openapi.Response(
                 description="Payment initialized",
@@ -259,11 +704,15 @@ class InitiatePaymentView(APIView):
             ),
             400: openapi.Response(description="Validation error or Chapa init failed"),
             404: openapi.Response(description="Booking not found"),
+            409: openapi.Response(description="A request with this Idempotency-Key is still in progress"),
+            422: openapi.Response(description="Idempotency-Key reused with a different request body"),
             500: openapi.Response(description="Server misconfiguration (missing CHAPA_SECRET_KEY)"),
             502: openapi.Response(description="Chapa unreachable"),
+            503: openapi.Response(description="Chapa circuit breaker open; see Retry-After"),
         },
         tags=["Payments"],
     )
+    @idempotent
     def post(self, request):
         booking_id = request.data.get("booking_id")
         amount = request.data.get("amount")
@@ -298,20 +747,16 @@ class InitiatePaymentView(APIView):
                 "description": f"Payment for booking id {booking_id}",
             },
         }
-        headers = {
-            "Authorization": f"Bearer {getattr(settings, 'CHAPA_SECRET_KEY', '')}",
-            "Content-Type": "application/json",
-        }
-
-        if not headers["Authorization"].strip():
+        if not chapa.is_configured():
             return Response({"detail": "Chapa secret key not configured."}, status=drf_status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         try:
-            chapa_resp = requests.post("https://api.chapa.co/v1/transaction/initialize", json=payload, headers=headers, timeout=20)
-        except requests.RequestException as e:
+            data = chapa.initialize_transaction(payload)
+        except chapa.GatewayUnavailable as e:
+            return gateway_unavailable_response(e)
+        except chapa.ChapaError as e:
             return Response({"detail": f"Payment initialization failed: {e}"}, status=drf_status.HTTP_502_BAD_GATEWAY)
 
-        data = chapa_resp.json() if chapa_resp.headers.get("Content-Type", "").startswith("application/json") else {"status": "failed"}
         if data.get("status") != "success":
             return Response({"detail": data.get("message", "Failed to initialize payment"), "data": data.get("data")}, status=drf_status.HTTP_400_BAD_REQUEST)
 
@@ -375,6 +820,7 @@ class VerifyPaymentView(APIView):
             404: openapi.Response(description="Payment not found"),
             500: openapi.Response(description="Server misconfiguration (missing CHAPA_SECRET_KEY)"),
             502: openapi.Response(description="Chapa unreachable"),
+            503: openapi.Response(description="Chapa circuit breaker open; see Retry-After"),
         },
         tags=["Payments"],
     )
@@ -388,46 +834,26 @@ class VerifyPaymentView(APIView):
         except Payment.DoesNotExist:
             return Response({"detail": "Payment not found."}, status=drf_status.HTTP_404_NOT_FOUND)
 
-        headers = {
-            "Authorization": f"Bearer {getattr(settings, 'CHAPA_SECRET_KEY', '')}",
-            "Content-Type": "application/json",
-        }
-        if not headers["Authorization"].strip():
+        if not chapa.is_configured():
             return Response({"detail": "Chapa secret key not configured."}, status=drf_status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Chapa verification typically uses /v1/transaction/verify/{tx_ref}
-        url = f"https://api.chapa.co/v1/transaction/verify/{tx_ref}"
         try:
-            chapa_resp = requests.get(url, headers=headers, timeout=20)
-        except requests.RequestException as e:
+            data = chapa.verify_transaction(tx_ref)
+        except chapa.GatewayUnavailable as e:
+            return gateway_unavailable_response(e)
+        except chapa.ChapaError as e:
             return Response({"detail": f"Verification failed: {e}"}, status=drf_status.HTTP_502_BAD_GATEWAY)
 
-        data = chapa_resp.json() if chapa_resp.headers.get("Content-Type", "").startswith("application/json") else {"status": "failed"}
         chapa_status = data.get("status")
-
         if chapa_status == "success":
-            payment.status = Payment.STATUS_COMPLETED
-            payment.save(update_fields=["status", "updated_at"])
-            # Send confirmation email via Celery if available
-            if send_payment_confirmation_email:
-                try:
-                    send_payment_confirmation_email.delay(
-                        to_email=payment.booking.guest.email,
-                        booking_id=payment.booking_id,
-                        amount=str(payment.amount),
-                        tx_ref=payment.tx_ref,
-                    )
-                except Exception:
-                    # Gracefully ignore email errors
-                    pass
+            result = payments.complete(tx_ref)
         else:
-            payment.status = Payment.STATUS_FAILED
-            payment.save(update_fields=["status", "updated_at"])
+            result = payments.fail(tx_ref)
 
         return Response(
             {
                 "status": "success" if chapa_status == "success" else "failed",
-                "payment_status": payment.status,
+                "payment_status": result.status,
                 "data": data.get("data"),
             },
             status=drf_status.HTTP_200_OK if chapa_status == "success" else drf_status.HTTP_400_BAD_REQUEST,
@@ -464,31 +890,15 @@ class ChapaWebhookView(APIView):
         if not tx_ref:
             return Response({"detail": "tx_ref is required"}, status=drf_status.HTTP_400_BAD_REQUEST)
 
-        try:
-            payment = Payment.objects.get(tx_ref=tx_ref)
-        except Payment.DoesNotExist:
-            return Response({"detail": "Payment not found"}, status=drf_status.HTTP_404_NOT_FOUND)
-
-        # If webhook indicates success, mark completed; else failed.
+        # If webhook indicates success, mark completed; else failed (unless already completed).
         if str(status_value).lower() == "success":
-            payment.status = Payment.STATUS_COMPLETED
+            result = payments.complete(tx_ref)
         else:
-            payment.status = Payment.STATUS_FAILED
-        payment.save(update_fields=["status", "updated_at"])
-
-        # Optionally send confirmation email
-        if payment.status == Payment.STATUS_COMPLETED and send_payment_confirmation_email:
-            try:
-                send_payment_confirmation_email.delay(
-                    to_email=payment.booking.guest.email,
-                    booking_id=payment.booking_id,
-                    amount=str(payment.amount),
-                    tx_ref=payment.tx_ref,
-                )
-            except Exception:
-                pass
+            result = payments.fail(tx_ref)
+        if result is None:
+            return Response({"detail": "Payment not found"}, status=drf_status.HTTP_404_NOT_FOUND)
 
-        return Response({"status": "ok", "payment_status": payment.status})
+        return Response({"status": "ok", "payment_status": result.status})
 
 class PaymentCallbackView(TemplateView):
     template_name = "listings/callback.html"
@@ -523,43 +933,33 @@ class PaymentCallbackView(TemplateView):
             context["message"] = "Payment not found"
             return render(request, self.template_name, context)
 
-        headers = {
-            "Authorization": f"Bearer {getattr(settings, 'CHAPA_SECRET_KEY', '')}",
-            "Content-Type": "application/json",
-        }
-        if not headers["Authorization"].strip():
+        if not chapa.is_configured():
             context["status"] = "error"
             context["message"] = "Payment verification unavailable (missing CHAPA_SECRET_KEY)"
             return render(request, self.template_name, context)
 
-        verify_url = f"https://api.chapa.co/v1/transaction/verify/{tx_ref}"
         try:
-            chapa_resp = requests.get(verify_url, headers=headers, timeout=20)
-            data = chapa_resp.json() if chapa_resp.headers.get("Content-Type", "").startswith("application/json") else {"status": "failed"}
-        except requests.RequestException:
-            data = {"status": "failed"}
+            data = chapa.verify_transaction(tx_ref)
+        except chapa.ChapaError:
+            # Chapa is unreachable, which says nothing about the payment: leave it pending.
+            context["status"] = "pending"
+            context["message"] = "We could not confirm your payment right now. Please check again in a few minutes."
+            context["booking"] = payment.booking
+            context["amount"] = payment.amount
+            context["currency"] = payment.currency
+            return render(request, self.template_name, context)
 
         if data.get("status") == "success":
-            payment.status = Payment.STATUS_COMPLETED
+            result = payments.complete(tx_ref)
+        else:
+            result = payments.fail(tx_ref)
+
+        if result.status == Payment.STATUS_COMPLETED:
             context["status"] = "success"
             context["message"] = "Payment completed successfully."
-            # send email if available
-            if send_payment_confirmation_email:
-                try:
-                    send_payment_confirmation_email.delay(
-                        to_email=payment.booking.guest.email,
-                        booking_id=payment.booking_id,
-                        amount=str(payment.amount),
-                        tx_ref=payment.tx_ref,
-                    )
-                except Exception:
-                    pass
         else:
-            payment.status = Payment.STATUS_FAILED
             context["status"] = "failed"
             context["message"] = data.get("message", "Payment verification failed.")
-
-        payment.save(update_fields=["status", "updated_at"])
         context["booking"] = payment.booking
         context["amount"] = payment.amount
         context["currency"] = payment.currency